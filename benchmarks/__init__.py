@@ -0,0 +1,10 @@
+"""
+ __init__.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+
+----------------------------------------------------------------------------
+
+Benchmarks of the processing stages, run from the root of the repository with python -m benchmarks.<name>.
+"""
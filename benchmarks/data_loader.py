@@ -0,0 +1,138 @@
+"""
+ data_loader.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Measure the throughput, in samples per second, of the loaders of a generated dataset: the glob and np.load of every
+stack, and src.modules.loader on the .npy stacks and on the shards, with and without worker processes.
+
+    python -m benchmarks.data_loader --resolution cif --frames 512 --workers 4
+    python -m benchmarks.data_loader --root /media/zoueinj/local_dataset/motion_estimation --layers mv mv_proj
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.forward_warp import RESOLUTIONS
+from src.modules.dataset import DatasetLayout
+from src.modules.dataset import ShardedDataset
+from src.modules.loader import DataLoader
+from src.modules.loader import MotionDataset
+
+
+SYNTHETIC_LAYERS = ["curr_frame", "og_frame", "mv", "mv_proj"]
+
+
+def synthetic_dataset(root: str, height: int, width: int, frames: int, shard_size: int, seed: int = 0) -> None:
+    """
+    Write the same synthetic video as a dataset of .npy stacks and as a sharded dataset.
+    :param root: directory of the datasets
+    :param height: height of the frames
+    :param width: width of the frames
+    :param frames: number of stacks
+    :param shard_size: number of stacks per shard
+    :param seed: seed of the random generator
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    layout = DatasetLayout(SYNTHETIC_LAYERS, height, width)
+    name = "_".join(["preset", "1", "16"] + SYNTHETIC_LAYERS)
+
+    npy_path = os.path.join(root, "npy", name, "video")
+    os.makedirs(npy_path)
+    shards = ShardedDataset(os.path.join(root, "shards", name, "video"), layout, frames, shard_size)
+
+    for position in range(frames):
+        stack = rng.normal(0, 3, layout.shape).astype(layout.dtype)
+        np.save(os.path.join(npy_path, f"{position + 1}_stack.npy"), stack)
+        shards.slot(position)[:] = stack
+
+    shards.close("video", list(range(1, frames + 1)))
+
+
+def naive_loader(root: str, batch_size: int, layers: list, seed: int = 0):
+    """
+    Loader of the training jobs: glob the stacks, then np.load every stack of a shuffled batch.
+    :param root: directory of the .npy stacks
+    :param batch_size: number of samples per batch
+    :param layers: names of the layers to keep, all the layers if None
+    :param seed: seed of the shuffling
+    :return: iterator over the batches
+    """
+    files = sorted(glob.glob(os.path.join(root, "**", "*_stack.npy"), recursive=True))
+    files = [files[index] for index in np.random.default_rng(seed).permutation(len(files))]
+
+    channels = None
+    if layers is not None:
+        offsets = DatasetLayout(SYNTHETIC_LAYERS, 0, 0).offsets
+        channels = np.concatenate([np.arange(*offsets[layer]) for layer in layers])
+
+    for start in range(0, len(files), batch_size):
+        batch = np.stack([np.load(file) for file in files[start:start + batch_size]])
+        yield batch if channels is None else batch[..., channels]
+
+
+def throughput(batches, epochs: int = 1) -> float:
+    """
+    Consume the batches of a loader.
+    :param batches: function returning an iterator over the batches of an epoch
+    :param epochs: number of epochs
+    :return: samples per second
+    """
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch in batches():
+            samples += len(batch)
+    return samples / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", type=str, default=None, help="generated dataset to read, a synthetic one if None")
+    parser.add_argument("--resolution", type=str, default="cif", choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=512)
+    parser.add_argument("--shard_size", type=int, default=256)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--layers", nargs="+", type=str, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        loaders = {}
+        opened = []
+
+        if args.root is None:
+            synthetic_dataset(directory, *RESOLUTIONS[args.resolution], args.frames, args.shard_size)
+            npy_root = os.path.join(directory, "npy")
+            loaders["glob + np.load"] = lambda: naive_loader(npy_root, args.batch_size, args.layers)
+            roots = {"npy": npy_root, "shards": os.path.join(directory, "shards")}
+        else:
+            roots = {"dataset": args.root}
+
+        for name, root in roots.items():
+            start = time.perf_counter()
+            dataset = MotionDataset(root, args.layers)
+            print(f"index {name}: {len(dataset)} samples in {time.perf_counter() - start:.3f} s")
+
+            for workers in (0, args.workers):
+                loader = DataLoader(dataset, args.batch_size, shuffle=True, workers=workers)
+                loaders[f"{name}, {workers} workers"] = loader.__iter__
+                opened.append(loader)
+
+        print(f"\n{'loader':>24} {'samples/s':>10}")
+        for name, batches in loaders.items():
+            print(f"{name:>24} {throughput(batches, args.epochs):>10.1f}")
+
+        for loader in opened:
+            loader.close()
@@ -0,0 +1,86 @@
+"""
+ metrics_backends.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Compare the numpy and tensorflow backends of the metrics: startup time, time per frame and results.
+
+    python -m benchmarks.metrics_backends --resolutions cif 1080p
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.forward_warp import RESOLUTIONS
+from benchmarks.forward_warp import timed
+
+
+def startup_time(statement: str) -> float:
+    """
+    Measure the time taken by a fresh interpreter to run a statement.
+    :param statement: python statement to run
+    :return: time in seconds
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def synthetic_inputs(height: int, width: int, seed: int = 0) -> dict:
+    """
+    Generate the inputs of the metrics.
+    :param height: height of the frames
+    :param width: width of the frames
+    :param seed: seed of the random generator
+    :return: dictionary of the arguments of each metric
+    """
+    rng = np.random.default_rng(seed)
+
+    original = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    encoded = np.clip(original.astype(np.int16) + rng.integers(-8, 9, original.shape), 0, 255).astype(np.uint8)
+    ground_truth = rng.normal(0, 3, (height, width, 2)).astype(np.float32)
+    motion_vectors = (ground_truth + rng.normal(0, 1, ground_truth.shape)).astype(np.float32)
+
+    return {
+        "psnr": (original, encoded),
+        "total_variation": (original,),
+        "end_point_error": (motion_vectors, ground_truth),
+        "cosine_similarity": (motion_vectors, ground_truth),
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", nargs="+", default=["cif", "1080p"], choices=list(RESOLUTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"import src.modules.metrics: {startup_time('import src.modules.metrics'):.2f} s")
+    print(f"import tensorflow:          {startup_time('import tensorflow'):.2f} s")
+
+    from src.modules import metrics
+
+    print(f"\n{'resolution':>10} {'metric':>18} {'numpy (ms)':>11} {'tf (ms)':>9}  results (numpy / tensorflow)")
+
+    for resolution in args.resolutions:
+        for metric, inputs in synthetic_inputs(*RESOLUTIONS[resolution]).items():
+            function = getattr(metrics, metric)
+
+            # The first call of each tensorflow op builds it, it is not measured.
+            function(*inputs, backend="tensorflow")
+
+            numpy_value, numpy_time = timed(function, *inputs, backend="numpy", repeat=args.repeat)
+            tf_value, tf_time = timed(function, *inputs, backend="tensorflow", repeat=args.repeat)
+
+            print(
+                f"{resolution:>10} {metric:>18} {numpy_time * 1000:>11.2f} {tf_time * 1000:>9.2f}  "
+                f"{np.round(numpy_value, 6)} / {np.round(tf_value, 6)}"
+            )
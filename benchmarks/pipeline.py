@@ -0,0 +1,285 @@
+"""
+ pipeline.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Time the stages of main.main on synthetic videos, without the encoder nor the inspector.
+
+For every resolution and GOP size, a synthetic video is generated: the inspector json file, the frames as a frame
+store, the .flo ground truth and a VP9 stand-in for the encoded video, only decoded by the metrics. Each stage of the
+frame loop is then timed on its own, its peak memory measured with tracemalloc, and main.main is run end to end in a
+fresh process to measure its time and peak RSS. The results can be saved as a baseline, and compared to it.
+
+    python -m benchmarks.pipeline --resolutions cif 720p --gops 16 32 --save baseline.json
+    python -m benchmarks.pipeline --resolutions cif 720p --gops 16 32 --baseline baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import av
+import numpy as np
+
+from benchmarks.forward_warp import RESOLUTIONS
+from benchmarks.forward_warp import synthetic_pair
+from benchmarks.forward_warp import timed
+from src.json_processing import block_motion_vectors
+from src.json_processing import frame_block_arrays
+from src.json_processing import get_frame_motion_vectors
+from src.json_processing import iter_json_frames
+from src.modules.block_field import block_fields
+from src.modules.flow_color import field_to_rgb
+from src.modules.flow_io import read_flo
+from src.modules.flow_io import write_flo
+from src.modules.frame_type import reference_schedule
+from src.modules.metrics import MetricsBatch
+from src.third_party.flowpy import flow_to_rgb
+from src.third_party.flowpy import forward_warp
+
+
+METRICS = {
+    "complexity_metrics": ["total_variation"],
+    "iqa": ["psnr"],
+    "motion_metrics": ["end_point_error", "cosine_similarity", "interpolation_error"],
+}
+
+
+def synthetic_video(directory: str, height: int, width: int, frames: int, seed: int = 0) -> None:
+    """
+    Generate the inputs of main.main for a video named "video" in a directory.
+    :param directory: working directory of the run
+    :param height: height of the frames
+    :param width: width of the frames
+    :param frames: number of frames
+    :param seed: seed of the random generator
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    for folder in ("output/json", "output/ivf", "ground_truth"):
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    frame, flow = synthetic_pair(height, width)
+
+    # The inspector gives the blocks of 4x4 pixels of a frame padded to a multiple of 8 pixels.
+    rows, cols = 2 * -(-height // 8), 2 * -(-width // 8)
+    block_flow = flow[::4, ::4][:rows, :cols]
+    block_flow = np.pad(block_flow, ((0, rows - block_flow.shape[0]), (0, cols - block_flow.shape[1]), (0, 0)))
+
+    with open(os.path.join(directory, "output/json/video.json"), "w") as file:
+        file.write("[")
+        for number in range(frames):
+            # The motion vectors are (row, col) in 1/8 of pixel, the references are the inter references 1 to 7.
+            vectors = np.round(8 * block_flow[..., ::-1] + rng.normal(0, 2, block_flow.shape)).astype(int)
+            references = rng.integers(1, 8, (rows, cols))
+            frame_data = {
+                "frame": number,
+                "frameType": 0 if number == 0 else 1,
+                "motionVectors": np.concatenate((vectors, vectors), axis=-1).tolist(),
+                "referenceFrame": np.stack((references, np.full_like(references, -1)), axis=-1).tolist(),
+            }
+            file.write(json.dumps(frame_data) + ",")
+        file.write("null]")
+
+    with open(os.path.join(directory, "video.bgr"), "wb") as file:
+        for number in range(frames):
+            np.roll(frame, number, axis=1).tofile(file)
+
+    for number in range(frames):
+        write_flo(os.path.join(directory, f"ground_truth/{str(number).zfill(6)}.flo"), flow)
+
+    # Stand-in for the encoded video, it is only decoded by the metrics.
+    with av.open(os.path.join(directory, "output/ivf/video.ivf"), "w", format="ivf") as container:
+        stream = container.add_stream("libvpx-vp9", rate=30, options={"deadline": "realtime", "cpu-used": "8"})
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+        for number in range(frames):
+            video_frame = av.VideoFrame.from_ndarray(np.roll(frame, number, axis=1)[..., ::-1].copy(), format="rgb24")
+            container.mux(stream.encode(video_frame))
+        container.mux(stream.encode())
+
+
+def frame_stages(directory: str, height: int, width: int, gop: int) -> dict:
+    """
+    Build the stages of the frame loop of main.main, each one running over all the frames.
+    :param directory: working directory of the synthetic video
+    :param height: height of the frames
+    :param width: width of the frames
+    :param gop: GOP size
+    :return: dictionary of the functions running each stage
+    """
+    json_path = os.path.join(directory, "output/json/video.json")
+    frames_data = [frame_data for frame_data in iter_json_frames(json_path) if frame_data is not None]
+    arrays = [frame_block_arrays(frame_data) for frame_data in frames_data]
+    references, _ = reference_schedule(gop, len(frames_data))
+    reference_dicts = [dict(enumerate(row.tolist())) for row in references]
+
+    fields = [
+        block_fields(*block_motion_vectors(*arrays[number], reference_dicts[number], number), height, width)
+        for number in range(1, len(arrays))
+    ]
+    frame, flow = synthetic_pair(height, width)
+    flo_path = os.path.join(directory, "ground_truth/000000.flo")
+
+    def metrics():
+        batch = MetricsBatch(sum(METRICS.values(), []), batch_size=4)
+        rows = []
+        for _, projection, _ in fields:
+            rows += batch.add(0, frame, frame, frame, flow, projection.to_pixels())
+        return rows + batch.flush()
+
+    return {
+        "json": lambda: sum(1 for _ in iter_json_frames(json_path)),
+        "block_arrays": lambda: [frame_block_arrays(frame_data) for frame_data in frames_data],
+        "reference_mapping": lambda: reference_schedule(gop, len(frames_data)),
+        "motion_vectors": lambda: [
+            block_fields(*block_motion_vectors(*arrays[number], reference_dicts[number], number), height, width)
+            for number in range(1, len(arrays))
+        ],
+        "get_frame_motion_vectors": lambda: [
+            get_frame_motion_vectors(frames_data[number], reference_dicts[number], number)
+            for number in range(1, len(arrays))
+        ],
+        "flow_to_rgb": lambda: [field_to_rgb(field) for field, _, _ in fields],
+        "flowpy_flow_to_rgb": lambda: [flow_to_rgb(field.to_pixels().copy()) for field, _, _ in fields],
+        "forward_warp": lambda: [forward_warp(frame, flow, method="bilinear") for _ in fields],
+        "metrics": metrics,
+        "read_flo": lambda: [np.array(read_flo(flo_path)) for _ in fields],
+    }
+
+
+def peak_memory(function) -> int:
+    """
+    Measure the peak of the memory allocated by a function, numpy arrays included.
+    :param function: function to run
+    :return: peak in bytes
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_main(directory: str, height: int, width: int, gop: int) -> tuple:
+    """
+    Run main.main on the synthetic video, in a fresh process.
+    :param directory: working directory of the synthetic video
+    :param height: height of the frames
+    :param width: width of the frames
+    :param gop: GOP size
+    :return: time in seconds and peak RSS of the process in bytes
+    """
+    os.chdir(directory)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import main
+
+    start = time.perf_counter()
+    main(
+        str(gop), "video", "video.bgr", width, height, False, False, [], 1, "benchmark", False,
+        METRICS["iqa"], METRICS["motion_metrics"], METRICS["complexity_metrics"], "ground_truth",
+    )
+    # ru_maxrss is in kilobytes on linux.
+    return time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def benchmark(resolution: str, gop: int, frames: int, repeat: int) -> dict:
+    """
+    Time every stage of a synthetic video.
+    :param resolution: name of the resolution
+    :param gop: GOP size
+    :param frames: number of frames
+    :param repeat: number of runs of each stage, the best time is kept
+    :return: dictionary of the time per frame, in seconds, and of the peak memory, in bytes, of each stage
+    """
+    height, width = RESOLUTIONS[resolution]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_video(directory, height, width, frames)
+
+        for stage, function in frame_stages(directory, height, width, gop).items():
+            _, best = timed(function, repeat=repeat)
+            results[stage] = {"time": best / (frames - 1), "memory": peak_memory(function)}
+
+        # A spawned process does not share the memory of this one, its peak RSS is the one of main.main.
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            main_time, main_memory = executor.submit(run_main, directory, height, width, gop).result()
+        results["main"] = {"time": main_time / (frames - 2), "memory": main_memory}
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare results to a baseline.
+    :param results: results of the benchmark, by configuration and stage
+    :param baseline: results of a previous run
+    :param tolerance: relative increase of time or memory reported as a regression
+    :return: list of the regressions, as (configuration, stage, measure, ratio)
+    """
+    regressions = []
+    for configuration, stages in results.items():
+        for stage, measures in stages.items():
+            reference = baseline.get(configuration, {}).get(stage)
+            if reference is None:
+                continue
+            for measure, value in measures.items():
+                ratio = value / reference[measure] if reference[measure] else 1
+                if ratio > 1 + tolerance:
+                    regressions.append((configuration, stage, measure, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", nargs="+", default=["cif", "720p", "1080p"], choices=list(RESOLUTIONS))
+    parser.add_argument("--gops", nargs="+", type=int, default=[16])
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=str, default=None, help="json file to save the results to")
+    parser.add_argument("--baseline", type=str, default=None, help="json file of results to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative increase reported as a regression")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+
+    results = {}
+    print(f"{'configuration':>14} {'stage':>25} {'ms/frame':>9} {'peak MB':>8} {'vs baseline':>12}")
+
+    for resolution in args.resolutions:
+        for gop in args.gops:
+            configuration = f"{resolution}_{gop}"
+            results[configuration] = benchmark(resolution, gop, args.frames, args.repeat)
+
+            for stage, measures in results[configuration].items():
+                reference = baseline.get(configuration, {}).get(stage)
+                change = f"{measures['time'] / reference['time']:>11.2f}x" if reference else f"{'-':>12}"
+                print(
+                    f"{configuration:>14} {stage:>25} {measures['time'] * 1e3:>9.2f} "
+                    f"{measures['memory'] / 1e6:>8.1f} {change}"
+                )
+
+    if args.save is not None:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for configuration, stage, measure, ratio in regressions:
+        print(f"regression: {configuration} {stage} {measure} x{ratio:.2f}")
+
+    sys.exit(1 if regressions else 0)
@@ -9,175 +9,537 @@
 Main python file calling all the functions.
 """
 
+import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 import cv2
-import imageio.v3 as iio
 import numpy as np
 from tqdm import tqdm
 
-from src.json_processing import get_frame_data
-from src.json_processing import get_frame_motion_vectors
-from src.json_processing import read_json_file
-from src.modules.frame_type import reference_mapping
-from src.modules.metrics import compute_metrics
+from src.json_processing import block_motion_vectors
+from src.json_processing import count_json_frames
+from src.json_processing import iter_json_frames
+from src.json_processing import stream_inspector
+from src.modules.block_field import block_fields
+from src.modules.dataset import DatasetLayout
+from src.modules.dataset import ShardedDataset
+from src.modules.flow_color import field_to_rgb
+from src.modules.flow_io import flow_paths
+from src.modules.flow_io import iter_flows
+from src.modules.frame_source import iter_encoded_frames
+from src.modules.frame_source import open_video
+from src.modules.metrics import MetricsBatch
+from src.modules.profiling import Profiler
+from src.modules.trajectories import TrajectoryAccumulator
+from src.modules.utils import frame_range
 from src.modules.utils import init_csv
-from src.modules.utils import get_paths
-from src.modules.utils import read_flo
-from src.modules.utils import update_stack
+from src.modules.utils import range_suffix
 from src.modules.utils import write_csv
-from src.third_party import flowpy
+from src.modules.writer import AsyncOutputWriter
+from src.modules.writer import OUTPUTS
+from src.modules.writer import OutputWriter
+from src.motion_container import MotionContainer
+from src.motion_fields import block_motion
 
 
-def main(
-    gop,
-    file,
-    video,
-    width,
-    height,
-    forward,
-    dataset,
-    layers,
-    step,
-    encoding_preset,
-    display,
-    iqa,
-    motion_metrics,
-    complexity_metrics,
-    original_motion
-):
+# Number of frames between two saves of the progress of a run.
+CHECKPOINT_FRAMES = 32
 
-    os.makedirs(f"output/results/{file}", exist_ok=True)
-    os.makedirs(f"output/results/{file}/pngs", exist_ok=True)
-    os.makedirs(f"output/results/{file}/pngs/projection", exist_ok=True)
-    os.makedirs(f"output/results/{file}/pngs/reference", exist_ok=True)
-    os.makedirs(f"output/results/{file}/pngs/mv", exist_ok=True)
-    os.makedirs(f"output/results/{file}/npy", exist_ok=True)
-    os.makedirs(f"output/results/{file}/npy/mv", exist_ok=True)
-    os.makedirs(f"output/results/{file}/npy/mv_proj", exist_ok=True)
-    os.makedirs(f"output/results/{file}/stack", exist_ok=True)
 
-    if dataset:
-        name = f"{encoding_preset}_{step}_{gop}"
-        for layer in layers:
-            name += f"_{layer}"
-        os.makedirs(f"/media/zoueinj/local_dataset/motion_estimation/{name}", exist_ok=True)
-        os.makedirs(f"/media/zoueinj/local_dataset/motion_estimation/{name}/{file}", exist_ok=True)
+def _save_progress(path, next_cursor, csv_path, writer):
+    """
+    Save the progress of a run, once the outputs of the frames before next_cursor are all written.
+    :param path: path of the progress file
+    :param next_cursor: first frame not fully written
+    :param csv_path: path of the csv file of the metrics, its size is saved to drop the rows written after
+    :param writer: writer of the outputs
+    :return: None
+    """
+    writer.flush()
 
-    cap = cv2.VideoCapture(video)
-    if not cap.isOpened():
-        print("Error opening video stream or file")
+    progress = {"next": next_cursor, "csv_size": os.path.getsize(csv_path) if os.path.exists(csv_path) else 0}
 
-    json_file = read_json_file(f"output/json/{file}.json")
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(progress, file)
+    os.replace(f"{path}.tmp", path)
 
-    if iqa or motion_metrics or complexity_metrics:
 
-        init_csv(f"output/results/{file}", complexity_metrics, iqa, motion_metrics)
-        encoded_video = f"output/ivf/{file}.ivf"
-        originals_motion = get_paths(original_motion)
-        if forward:
-            originals_motion.reverse()
+def read_frames(
+    cap,
+    json_frames,
+    container,
+    encoded_frames,
+    ground_truth,
+    gop,
+    total_frames,
+    profiler=None,
+    first=1,
+    stop=None
+):
+    """
+    Producer of the frame loop: read the video and the motion data in order and resolve the reference frames.
+
+    Everything that depends on the previous frames is read here, so that the frames can then be processed
+    independently. The motion of the frames is read by motion_fields.block_motion.
+    :param cap: opened video capture or frame store
+    :param json_frames: iterator over the frames of the json file
+    :param container: motion vector container, used instead of the json file when not None
+    :param encoded_frames: iterator over the frames of the encoded video, None if they are not needed
+    :param ground_truth: iterator over the ground truth motion of the frames read, None if it is not needed
+    :param gop: gop size used during encoding
+    :param total_frames: number of frames in the json file
+    :param profiler: profiler measuring the reads, none if None
+    :param first: first frame to read, the frames before it are skipped
+    :param stop: frame after the last one to read, the end of the video if None
+    :return: iterator of (cursor, frame, previous frame, encoded frame, ground truth motion, motion vectors, reference
+    frames, reference dictionary)
+    """
+    if profiler is None:
+        profiler = Profiler()
+    if stop is None:
+        stop = total_frames - 1
+
+    motion = block_motion(json_frames if container is None else container, gop, total_frames, first)
+
+    # The frame before the first one is read as its previous frame.
+    for _ in range(first - 1):
+        cap.grab()
+    ret, prev_frame = cap.read()
+    prev_frame = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2YCrCb)
 
-    total_frames = len(json_file)
+    encoded_frame = None
+    original_motion = None
+    if encoded_frames is not None:
+        for _ in range(first):
+            next(encoded_frames)
 
-    reference_dict, golden_frames = reference_mapping(0, gop, 0, [])
+    for cursor in range(first, stop):
 
-    ret, prev_frame = cap.read()
-    prev_frame = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2YCrCb)
+        with profiler.stage("read_video"):
+            ret, frame = cap.read()
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)
 
-    for cursor in tqdm(range(1, total_frames-1)):
+        with profiler.stage("read_motion"):
+            _, motion_vectors, reference_frames, reference_dict = next(motion)
 
-        ret, frame = cap.read()
+        if encoded_frames is not None:
+            with profiler.stage("read_encoded_video"):
+                encoded_frame = next(encoded_frames)
 
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)
-        reference_dict, golden_frames = reference_mapping(cursor, int(gop), 0, golden_frames)
+        if ground_truth is not None:
+            with profiler.stage("read_ground_truth"):
+                original_motion = next(ground_truth)
 
-        frame_data = get_frame_data(json_file, cursor)
-        motion_field, motion_field_projection, reference_map = get_frame_motion_vectors(
-            frame_data,
-            reference_dict,
-            cursor
+        yield (
+            cursor, frame, prev_frame, encoded_frame, original_motion, motion_vectors, reference_frames, reference_dict
         )
 
-        motion_field = motion_field[0:height, 0:width]
-        motion_field_projection = motion_field_projection[0:height, 0:width]
-        reference_map = reference_map[0:height, 0:width]
-
-        mv_rgb = flowpy.flow_to_rgb(motion_field)
-        proj_rgb = flowpy.flow_to_rgb(motion_field_projection)
-
-        if dataset:
-
-            dataset_stack = None
-            for layer in layers:
-
-                if layer == "curr_frame":
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_YCrCb2RGB)
-                    dataset_stack = update_stack(dataset_stack, frame_rgb)
-                elif layer == "og_frame":
-                    frame_rgb = cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB)
-                    dataset_stack = update_stack(dataset_stack, frame_rgb)
-                elif layer == "curr_frame_y":
-                    dataset_stack = update_stack(dataset_stack, frame[:, :, 0])
-                elif layer == "og_frame_y":
-                    dataset_stack = update_stack(dataset_stack, prev_frame[:, :, 0])
-                elif layer == "mv":
-                    dataset_stack = update_stack(dataset_stack, motion_field)
-                elif layer == "mv_proj":
-                    dataset_stack = update_stack(dataset_stack, motion_field_projection)
-                elif layer == "ref":
-                    dataset_stack = update_stack(dataset_stack, reference_map)
+        prev_frame = frame
 
+
+def process_frame(
+    cursor,
+    frame,
+    prev_frame,
+    encoded_frame,
+    original_motion,
+    motion_vectors,
+    reference_frames,
+    reference_dict,
+    settings,
+    writer
+):
+    """
+    Compute and save all the outputs of a frame.
+
+    :param cursor: frame number
+    :param frame: current frame, in YCrCb
+    :param prev_frame: previous frame, in YCrCb
+    :param encoded_frame: frame of the encoded video, in RGB (None if no metric is computed)
+    :param original_motion: (h, w, 2) ground truth motion of the frame (None if no metric is computed)
+    :param motion_vectors: (h, w, 2) motion vectors of the blocks
+    :param reference_frames: (h, w) reference frames of the blocks
+    :param reference_dict: dictionary containing the mapping of the reference frames
+    :param settings: dictionary of the options of the run, shared by all the frames
+    :param writer: writer of the outputs
+    :return: the inputs of the metrics (None if no metric is computed), the RGB projection to display and the
+    projected motion field to accumulate (None if the trajectories are not accumulated)
+    """
+    results_path = settings["results_path"]
+    height = settings["height"]
+    width = settings["width"]
+    profiler = settings["profiler"]
+
+    with profiler.stage("motion_vectors"):
+        blocks = block_motion_vectors(motion_vectors, reference_frames, reference_dict, cursor)
+        motion_field, motion_field_projection, reference_map = block_fields(*blocks, height, width)
+
+    if writer.enabled("png") or settings["display"]:
+        with profiler.stage("render"):
+            mv_rgb = field_to_rgb(motion_field, settings["flow_max_radius"])
+            proj_rgb = field_to_rgb(motion_field_projection, settings["flow_max_radius"])
+
+    dataset_stack = None
+    if settings["dataset"] and writer.enabled("dataset"):
+
+        layout = settings["dataset_layout"]
+        layers = (frame, prev_frame, motion_field, motion_field_projection, reference_map)
+
+        with profiler.stage("dataset"):
+            if settings["dataset_shards"] is not None:
+                # The stack is assembled directly in its place in the shard.
+                layout.assemble(*layers, out=settings["dataset_shards"].slot(cursor - settings["first"]))
+            else:
+                dataset_stack = layout.assemble(*layers)
+                if len(layout.layers) == 1 and layout.channels == 1 and layout.layers[0].endswith("_y"):
+                    dataset_stack = dataset_stack[:, :, 0]
+
+    with profiler.stage("stack"):
         stack = np.zeros((height, width, 3), dtype=np.float32)
 
         stack[:, :, 0] = frame[:, :, 0]/255.
         stack[:, :, 1] = motion_field_projection[:, :, 0]
         stack[:, :, 2] = motion_field_projection[:, :, 1]
 
-        if iqa or motion_metrics or complexity_metrics:
+    metric_inputs = None
 
-            row = [cursor]
+    if settings["metrics"]:
 
-            original_frame = cv2.cvtColor(frame, cv2.COLOR_YCrCb2RGB)
-            previous_frame = cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB)
-            encoded_frame = iio.imread(encoded_video, index=cursor, plugin="pyav")
+        original_frame = cv2.cvtColor(frame, cv2.COLOR_YCrCb2RGB)
+        previous_frame = cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB)
 
-            metrics = complexity_metrics + iqa + motion_metrics
-            original_motion = read_flo(originals_motion[cursor-1])
+        metric_inputs = (
+            cursor,
+            original_frame,
+            previous_frame,
+            encoded_frame,
+            original_motion,
+            motion_field_projection.to_pixels()
+        )
 
+    if settings["forward"]:
+        frame_id = settings["total_frames"] - 1 - cursor
 
-            row = compute_metrics(
-                metrics,
-                original_frame,
-                previous_frame,
-                encoded_frame,
-                original_motion,
-                motion_field_projection,
-                row
-            )
+    else:
+        frame_id = cursor
 
-            write_csv(f"output/results/{file}", row)
+    if writer.enabled("png"):
+        writer.imwrite("png", f"{results_path}/pngs/projection/{str(frame_id).zfill(6)}_motion_projection.png", proj_rgb)
+        writer.imwrite("png", f"{results_path}/pngs/reference/{str(frame_id).zfill(6)}_reference_map.png", reference_map.to_pixels())
+        writer.imwrite("png", f"{results_path}/pngs/mv/{str(frame_id).zfill(6)}_motion_field.png", mv_rgb)
 
-        if display:
-            cv2.imshow(file, proj_rgb)
-            cv2.waitKey(10)
+    # The trajectories are accumulated by the frame loop, in the order of the frames.
+    projection = motion_field_projection.to_pixels() if settings["trajectory_window"] > 0 else None
 
-        if forward:
-            frame_id = total_frames - 1 - cursor
+    if settings["block_resolution"]:
+        motion_field, motion_field_projection = motion_field.blocks, motion_field_projection.blocks
+    else:
+        motion_field, motion_field_projection = motion_field.to_pixels(), motion_field_projection.to_pixels()
 
-        else:
-            frame_id = cursor
+    writer.save("npy", f"{results_path}/npy/mv/{str(frame_id).zfill(6)}_motion_field.npy", motion_field)
+    writer.save("npy", f"{results_path}/npy/mv_proj/{str(frame_id).zfill(6)}_motion_field_projection.npy", motion_field_projection)
+    writer.save("stack", f"{results_path}/stack/{str(frame_id).zfill(6)}_reference_map.npy", stack)
+
+    if dataset_stack is not None:
+        writer.save("dataset", f"{settings['dataset_path']}/{str(frame_id).zfill(6)}_stack.npy", dataset_stack)
+
+    if not settings["display"]:
+        proj_rgb = None
+
+    return metric_inputs, proj_rgb, projection
+
+
+def _with_rows(result, metrics_batch, profiler):
+    """
+    Add the inputs of the metrics of a frame to a batch.
+    :param result: result of process_frame
+    :param metrics_batch: batch of metrics receiving the inputs
+    :param profiler: profiler measuring the metrics
+    :return: the csv rows ready to be written (the whole batch once it is full), the RGB projection to display and the
+    projected motion field to accumulate
+    """
+    metric_inputs, proj_rgb, projection = result
 
-        cv2.imwrite(f"output/results/{file}/pngs/projection/{str(frame_id).zfill(6)}_motion_projection.png", proj_rgb)
-        cv2.imwrite(f"output/results/{file}/pngs/reference/{str(frame_id).zfill(6)}_reference_map.png", reference_map)
-        cv2.imwrite(f"output/results/{file}/pngs/mv/{str(frame_id).zfill(6)}_motion_field.png", mv_rgb)
-        np.save(f"output/results/{file}/npy/mv/{str(frame_id).zfill(6)}_motion_field.npy", motion_field)
-        np.save(f"output/results/{file}/npy/mv_proj/{str(frame_id).zfill(6)}_motion_field_projection.npy", motion_field_projection)
-        np.save(f"output/results/{file}/stack/{str(frame_id).zfill(6)}_reference_map.npy", stack)
+    rows = []
+    if metric_inputs is not None:
+        with profiler.stage("metrics"):
+            rows = metrics_batch.add(*metric_inputs)
 
-        if dataset:
-            np.save(f"/media/zoueinj/local_dataset/motion_estimation/{name}/{file}/{str(frame_id).zfill(6)}_stack.npy", dataset_stack)
+    return rows, proj_rgb, projection
 
-        prev_frame = frame.copy()
 
-    cv2.destroyAllWindows()
+def _process_task(task, settings):
+    # The metrics are evaluated in the worker, one frame at a time, so that only the rows are sent back. The profiler
+    # of the worker starts empty for every task, its measures are sent back with the rows.
+    profiler = settings["profiler"]
+    metrics_batch = MetricsBatch(settings["metrics"], 1, settings["warp_method"], settings["metrics_backend"])
+    writer = OutputWriter(settings["outputs"], profiler)
+    return _with_rows(process_frame(*task, settings, writer), metrics_batch, profiler) + (profiler.snapshot(),)
+
+
+def _parallel_results(tasks, settings, workers):
+    """
+    Process the frames in a pool of processes and yield the results in the order of the frames.
+
+    The number of frames in flight is bounded, so the producer does not read the whole video ahead of the workers.
+    :param tasks: iterator over the frames to process, as produced by read_frames
+    :param settings: dictionary of the options of the run
+    :param workers: number of processes
+    :return: iterator over the csv rows, the RGB projection and the projected motion field of each frame
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        pending = deque()
+        def result(future):
+            rows, proj_rgb, projection, snapshot = future.result()
+            settings["profiler"].merge(snapshot)
+            return rows, proj_rgb, projection
+
+        for task in tasks:
+            pending.append(executor.submit(_process_task, task, settings))
+            if len(pending) >= 2 * workers:
+                yield result(pending.popleft())
+
+        while pending:
+            yield result(pending.popleft())
+
+
+def main(
+    gop,
+    file,
+    video,
+    width,
+    height,
+    forward,
+    dataset,
+    layers,
+    step,
+    encoding_preset,
+    display,
+    iqa,
+    motion_metrics,
+    complexity_metrics,
+    original_motion,
+    block_resolution=False,
+    workers=0,
+    outputs=OUTPUTS,
+    writer_threads=4,
+    prefetch=4,
+    warp_method="kdtree",
+    metrics_backend="tensorflow",
+    metrics_batch=4,
+    dataset_shard_size=256,
+    dataset_compression="none",
+    flow_max_radius=0,
+    profile="off",
+    inspector=None,
+    inspector_tee=True,
+    start=0,
+    end=None,
+    shard=None,
+    resume=False,
+    trajectory_window=0
+):
+
+    cap = open_video(video, width, height)
+    if not cap.isOpened():
+        print("Error opening video stream or file")
+
+    container = None
+    if inspector is None and os.path.exists(f"output/mvc/{file}.mvc"):
+        container = MotionContainer(f"output/mvc/{file}.mvc")
+        if container.header["gop"] != int(gop):
+            print(f"output/mvc/{file}.mvc was built for another GOP size, using the json file instead.")
+            container = None
+
+    json_frames = None
+    if inspector is not None:
+        # The inspector gives one frame per frame of the video, followed by null.
+        json_frames = stream_inspector(inspector, f"output/json/{file}.json" if inspector_tee else None)
+        total_frames = (len(cap) if hasattr(cap, "__len__") else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) + 1
+    elif container is None:
+        json_frames = iter_json_frames(f"output/json/{file}.json")
+        total_frames = count_json_frames(f"output/json/{file}.json")
+    else:
+        total_frames = len(container)
+
+    first, stop = frame_range(total_frames, start, end, shard, forward)
+
+    # A part of the video gets its own results and profile, named after its first and last frame ids.
+    suffix = range_suffix(total_frames, first, stop, forward)
+    results_path = f"output/results/{file}{suffix}"
+
+    os.makedirs(results_path, exist_ok=True)
+    os.makedirs(f"{results_path}/pngs", exist_ok=True)
+    os.makedirs(f"{results_path}/pngs/projection", exist_ok=True)
+    os.makedirs(f"{results_path}/pngs/reference", exist_ok=True)
+    os.makedirs(f"{results_path}/pngs/mv", exist_ok=True)
+    os.makedirs(f"{results_path}/npy", exist_ok=True)
+    os.makedirs(f"{results_path}/npy/mv", exist_ok=True)
+    os.makedirs(f"{results_path}/npy/mv_proj", exist_ok=True)
+    if trajectory_window > 0:
+        os.makedirs(f"{results_path}/npy/trajectory", exist_ok=True)
+    os.makedirs(f"{results_path}/stack", exist_ok=True)
+
+    # The progress of a range is saved regularly, an interrupted run restarts after the last frame fully written. It is
+    # kept out of the outputs, in a hidden directory, and records the ranges already processed once they are complete.
+    os.makedirs(f"{results_path}/.progress", exist_ok=True)
+    progress_path = f"{results_path}/.progress/{first}_{stop}.json"
+    csv_path = f"{results_path}/log_metrics.csv"
+    resumed = resume and os.path.exists(progress_path)
+    next_cursor = first
+    if resumed:
+        with open(progress_path, "r") as progress_file:
+            progress = json.load(progress_file)
+        next_cursor = progress["next"]
+        if os.path.exists(csv_path):
+            os.truncate(csv_path, progress["csv_size"])
+
+    if next_cursor >= stop:
+        print(f"{file}: frames {first} to {stop - 1} already processed.")
+        return
+
+    dataset_path = None
+    if dataset:
+        name = f"{encoding_preset}_{step}_{gop}"
+        for layer in layers:
+            name += f"_{layer}"
+        dataset_path = f"/media/zoueinj/local_dataset/motion_estimation/{name}/{file}"
+        dataset_path += suffix
+        os.makedirs(f"/media/zoueinj/local_dataset/motion_estimation/{name}", exist_ok=True)
+        os.makedirs(dataset_path, exist_ok=True)
+
+    settings = {
+        "file": file,
+        "results_path": results_path,
+        "width": width,
+        "height": height,
+        "forward": forward,
+        "total_frames": total_frames,
+        "first": first,
+        "dataset": dataset,
+        "dataset_path": dataset_path,
+        "dataset_layout": DatasetLayout(layers, height, width),
+        "dataset_shards": None,
+        "layers": layers,
+        "block_resolution": block_resolution,
+        "display": display,
+        "metrics": complexity_metrics + iqa + motion_metrics,
+        "outputs": outputs,
+        "warp_method": warp_method,
+        "metrics_backend": metrics_backend,
+        "flow_max_radius": flow_max_radius,
+        "trajectory_window": trajectory_window,
+        "profiler": Profiler(profile),
+    }
+    profiler = settings["profiler"]
+
+    encoded_frames = None
+    ground_truth = None
+    if settings["metrics"]:
+
+        if not resumed:
+            init_csv(results_path, complexity_metrics, iqa, motion_metrics)
+        encoded_frames = iter_encoded_frames(f"output/ivf/{file}.ivf", prefetch)
+        originals_motion = list(flow_paths(original_motion))
+        if forward:
+            originals_motion.reverse()
+        ground_truth = iter_flows(originals_motion[next_cursor-1:stop-1], prefetch)
+
+    if dataset and dataset_shard_size > 0 and "dataset" in outputs:
+        settings["dataset_shards"] = ShardedDataset(
+            dataset_path,
+            settings["dataset_layout"],
+            stop - first,
+            dataset_shard_size,
+            dataset_compression,
+            resumed
+        )
+
+    tasks = read_frames(
+        cap, json_frames, container, encoded_frames, ground_truth, gop, total_frames, profiler, next_cursor, stop
+    )
+
+    batch = MetricsBatch(settings["metrics"], metrics_batch, warp_method, metrics_backend)
+
+    if workers > 1:
+        writer = OutputWriter(outputs, profiler)
+        results = _parallel_results(tasks, settings, workers)
+    else:
+        if writer_threads > 0:
+            writer = AsyncOutputWriter(outputs, workers=writer_threads, profiler=profiler)
+        else:
+            writer = OutputWriter(outputs, profiler)
+        results = (_with_rows(process_frame(*task, settings, writer), batch, profiler) for task in tasks)
+
+    # The trajectories restart at the first frame of the run, or of the resumed part of it.
+    accumulator = TrajectoryAccumulator(height, width, trajectory_window) if trajectory_window > 0 else None
+
+    profiler.start()
+    try:
+        if not resumed:
+            _save_progress(progress_path, next_cursor, csv_path, writer)
+        saved = next_cursor
+
+        with profiler.stage("frame_loop"):
+            for cursor, (rows, proj_rgb, projection) in enumerate(tqdm(results, total=stop - next_cursor), next_cursor):
+                profiler.count("frames")
+
+                if accumulator is not None:
+                    with profiler.stage("trajectories"):
+                        accumulator.update(projection)
+                    if writer.enabled("npy"):
+                        frame_id = total_frames - 1 - cursor if forward else cursor
+                        writer.save(
+                            "npy",
+                            f"{results_path}/npy/trajectory/{str(frame_id).zfill(6)}_trajectory.npy",
+                            accumulator.field()
+                        )
+
+                with profiler.stage("csv"):
+                    for row in rows:
+                        write_csv(results_path, row)
+
+                if display:
+                    cv2.imshow(file, proj_rgb)
+                    cv2.waitKey(10)
+
+                # The frames waiting in the batch of metrics are not fully written yet.
+                if cursor + 1 - saved >= CHECKPOINT_FRAMES and len(batch) == 0:
+                    with profiler.stage("checkpoint"):
+                        _save_progress(progress_path, cursor + 1, csv_path, writer)
+                    saved = cursor + 1
+
+            with profiler.stage("metrics"):
+                rows = batch.flush()
+            with profiler.stage("csv"):
+                for row in rows:
+                    write_csv(results_path, row)
+
+        if json_frames is not None:
+            # The end of the output of the inspector is read, so that its copy is complete.
+            deque(json_frames, maxlen=0)
+
+        if settings["dataset_shards"] is not None:
+            frame_ids = range(first, stop)
+            if forward:
+                frame_ids = [total_frames - 1 - cursor for cursor in frame_ids]
+            settings["dataset_shards"].close(file, list(frame_ids))
+
+        _save_progress(progress_path, stop, csv_path, writer)
+
+    finally:
+        writer.close()
+        # The decoders are closed, and their prefetching threads stopped, when the run ends before their last frame.
+        for source in (json_frames, encoded_frames, ground_truth):
+            if source is not None:
+                source.close()
+        profiler.stop()
+        profiler.write(f"output/profile/{file}", f"main{suffix}")
+
+    # Without display no window was opened, and headless builds of OpenCV have no window support.
+    if display:
+        cv2.destroyAllWindows()
+
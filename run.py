@@ -10,14 +10,14 @@ File used to start the process.
 """
 
 import os
-import shutil
-import subprocess
 
 import configargparse
-import cv2
 
-from src.modules.utils import get_paths
 from main import main
+from src.modules.profiling import PROFILE_MODES
+from src.pipeline import DEFAULT_ENCODER
+from src.pipeline import DEFAULT_INSPECTOR
+from src.pipeline import run_batch
 
 
 parser = configargparse.ArgParser()
@@ -27,6 +27,13 @@ parser.add(
     is_config_file=True,
     help="Config file path."
 )
+parser.add(
+    "--analysis_jobs",
+    required=False,
+    type=int,
+    default=0,
+    help="Maximum number of videos analysed at once. (0 for the number of cores divided by the workers)",
+)
 parser.add(
     "--batch",
     required=False,
@@ -34,6 +41,27 @@ parser.add(
     action="store_true",
     help="If you want to process a batch of videos.",
 )
+parser.add(
+    "--block_resolution",
+    required=False,
+    default=False,
+    action="store_true",
+    help="Save the motion fields at block resolution (4x4 blocks) instead of pixel resolution.",
+)
+parser.add(
+    "--cache_dir",
+    required=False,
+    type=str,
+    default="./output/cache",
+    help="Directory of the cache of the outputs of the stages.",
+)
+parser.add(
+    "--cache_size",
+    required=False,
+    type=float,
+    default=20,
+    help="Maximum size of the cache, in GB. (0 to disable the cache)",
+)
 parser.add(
     "--complexity_metrics",
     required=False,
@@ -55,6 +83,21 @@ parser.add(
     action="store_true",
     help="Whether you want to regroup the images in a specific folder to be used as a dataset.",
 )
+parser.add(
+    "--dataset_compression",
+    required=False,
+    type=str,
+    default="none",
+    choices=["none", "zlib"],
+    help="Compression of the dataset shards.",
+)
+parser.add(
+    "--dataset_shard_size",
+    required=False,
+    type=int,
+    default=256,
+    help="Number of frames per dataset shard. (0 to write one .npy file per frame)",
+)
 parser.add(
     "--display",
     required=False,
@@ -62,6 +105,22 @@ parser.add(
     action="store_true",
     help="Whether to display the generated motion vectors or not.",
 )
+parser.add(
+    "--encode_jobs",
+    required=False,
+    type=int,
+    default=0,
+    help="Maximum number of videos encoded at once. (0 for the number of cores)",
+)
+parser.add(
+    "--encoder",
+    required=False,
+    type=str,
+    default=DEFAULT_ENCODER,
+    help="Encoder command, formatted with {encoding_preset}, {input}, {name}, {width}, {height}, {fps}, {gop} and "
+         "{cpu}. It has to write ./output/ivf/{name}.ivf. The y4m video is piped to its standard input and never "
+         "written to a file: {input} is \"-\", a command expecting the path of a y4m file has to read it from stdin.",
+)
 parser.add(
     "--encoding_preset",
     required=False,
@@ -69,12 +128,36 @@ parser.add(
     default="s3-scc-01",
     help="Encoding preset.",
 )
+parser.add(
+    "--end",
+    required=False,
+    type=int,
+    default=None,
+    help="Frame after the last frame to analyse, in the frames encoded. (the end of the video by default)",
+)
+parser.add(
+    "--flow_max_radius",
+    required=False,
+    type=float,
+    default=0,
+    help="Motion radius rendered with the full colour intensity in the pngs, shared by all the frames. "
+         "(0 for the largest radius of each frame)",
+)
 parser.add(
     "--forward",
     required=False,
     action="store_true",
     help="Get the forward motion vectors.",
 )
+parser.add(
+    "--forward_warp",
+    required=False,
+    type=str,
+    default="kdtree",
+    choices=["kdtree", "bilinear", "gaussian"],
+    help="Forward warp method used by the interpolation error. The bilinear and gaussian splatting are faster, but "
+         "give slightly different values than the default k-nearest neighbors.",
+)
 parser.add(
     "--fps",
     required=False,
@@ -96,6 +179,20 @@ parser.add(
     default="16",
     help="GOP size.",
 )
+parser.add(
+    "--inspect_jobs",
+    required=False,
+    type=int,
+    default=0,
+    help="Maximum number of videos inspected at once. (0 for the number of cores)",
+)
+parser.add(
+    "--inspector",
+    required=False,
+    type=str,
+    default=DEFAULT_INSPECTOR,
+    help="Inspector command, formatted with {ivf} and {name}. Its standard output is saved as the json file.",
+)
 parser.add(
     "--input",
     required=True,
@@ -108,6 +205,13 @@ parser.add(
     action="append",
     help="Which Quality metrics to use. (PSNR, MS-SSIM)",
 )
+parser.add(
+    "--jobs",
+    required=False,
+    type=int,
+    default=1,
+    help="Number of videos processed at once in batch mode.",
+)
 parser.add(
     "--layers",
     required=False,
@@ -116,6 +220,23 @@ parser.add(
     action="append",
     default=['og_frame', 'curr_frame', 'mv_proj'],
 )
+parser.add(
+    "--metrics_backend",
+    required=False,
+    type=str,
+    default="tensorflow",
+    choices=["numpy", "tensorflow"],
+    help="Backend of the metrics. numpy does not import tensorflow, unless ms_ssim is computed, and gives the same "
+         "values except for total_variation, computed on the pixel values instead of their int8 cast. (ms_ssim always "
+         "uses tensorflow)",
+)
+parser.add(
+    "--metrics_batch",
+    required=False,
+    type=int,
+    default=4,
+    help="Number of frames evaluated at once by the metrics.",
+)
 parser.add(
     "--motion_metrics",
     required=False,
@@ -123,12 +244,90 @@ parser.add(
     action="append",
     help="Which Motion metrics to use. (epe, interpolation)",
 )
+parser.add(
+    "--no_inspector_tee",
+    required=False,
+    action="store_true",
+    help="With --stream_inspector, do not save the output of the inspector, it is then not cached.",
+)
 parser.add(
     "--original_mv",
     required=False,
     help="Path to the folder with original motion vectors.",
     default="None"
 )
+parser.add(
+    "--prefetch",
+    required=False,
+    type=int,
+    default=4,
+    help="Number of frames of the encoded video decoded ahead when computing metrics. (0 to decode on demand)",
+)
+parser.add(
+    "--profile",
+    required=False,
+    type=str,
+    default="off",
+    choices=PROFILE_MODES,
+    help="Profile the stages of each video, reports written in output/profile. "
+         "(off, time, cprofile for the python functions, tracemalloc for the allocations)",
+)
+parser.add(
+    "--resume",
+    required=False,
+    action="store_true",
+    help="Restart the analysis of each video after the last frame fully written by a previous run.",
+)
+parser.add(
+    "--shard",
+    required=False,
+    type=str,
+    default=None,
+    help="Only analyse the i-th of N equal parts of the frames of each video, given as i/N with i from 0.",
+)
+parser.add(
+    "--writer_threads",
+    required=False,
+    type=int,
+    default=4,
+    help="Number of threads writing the outputs in the background. (0 to write them in the frame loop)",
+)
+parser.add(
+    "--workers",
+    required=False,
+    type=int,
+    default=0,
+    help="Number of processes used to process the frames of a video. (0 to process them in the main process)",
+)
+parser.add(
+    "--skip_output",
+    required=False,
+    default=[],
+    action="append",
+    help="Outputs not to write. (png, npy, stack, dataset)",
+)
+parser.add(
+    "--start",
+    required=False,
+    type=int,
+    default=0,
+    help="First frame to analyse, in the frames encoded. (the first frame has no motion and is never analysed)",
+)
+parser.add(
+    "--stream_inspector",
+    required=False,
+    action="store_true",
+    help="Analyse the output of the inspector while it is written, instead of waiting for the whole json file. The "
+         "inspector then runs within the analysis of the video, bounded by --analysis_jobs and not by --inspect_jobs.",
+)
+parser.add(
+    "--trajectory_window",
+    required=False,
+    type=int,
+    default=0,
+    help="Number of frames the projected fields are accumulated over, the field of each frame leading back to the "
+         "furthest of them is saved in npy/trajectory. (0 not to accumulate them)",
+)
 parser.add(
     "--version",
     required=False,
@@ -154,90 +353,13 @@ if __name__ == "__main__":
 
     if arg_flags.batch:
 
-        files = os.listdir(arg_flags.input)
+        files = [os.path.join(arg_flags.input, file) for file in os.listdir(arg_flags.input)]
 
     else:
 
         files = [arg_flags.input]
 
-    tmp = f"tmp_{arg_flags.gop}_{arg_flags.frame_step}"
-    tmp += f"_{arg_flags.encoding_preset}_{arg_flags.cpu}"
-
-    os.mkdir(tmp)
-
-    for file in files:
-
-        if arg_flags.batch:
-            file_path = os.path.join(arg_flags.input, file)
-        else:
-            file_path = file
-
-        if arg_flags.forward:
-            direction = -1
-            start = -1
-        else:
-            direction = 1
-            start = 0
-
-        frame_list = get_paths(file_path)
-
-        for cursor in range(0, len(frame_list), arg_flags.frame_step):
-
-            frame_id = start + (cursor * direction)
-
-            shutil.copyfile(frame_list[frame_id], f"./{tmp}/frame_{str(cursor).zfill(6)}.png")
-
-        name = file_path.split("/")[-1]
-        if not name:
-            name = file_path.split("/")[-2]
-
-        if arg_flags.forward:
-            name += "_forward"
-
-        else:
-            name += "_backward"
-
-        name += f"_{arg_flags.gop}"
-        name += f"_{arg_flags.frame_step}"
-        name += f"_{arg_flags.encoding_preset}"
-        name += f"_{arg_flags.cpu}"
-
-        image = cv2.imread(f"./{tmp}/frame_000000.png")
-        h, w, _ = image.shape
-
-        if not os.path.exists(f"./output/ivf/{name}.ivf"):
-
-            command = f"ffmpeg -framerate {arg_flags.fps} -pattern_type glob -i './{tmp}/*.png' -pix_fmt yuv444p " \
-                      f"{tmp}/{name}.y4m"
-
-            subprocess.run(command, shell=True)
-
-            command = f"./src/enc_scenario/{arg_flags.encoding_preset}.sh ./{tmp}/{name}.y4m {name} {w} {h} " \
-                      f"{arg_flags.fps*1000} {arg_flags.gop} {arg_flags.cpu}"
-            a = subprocess.run(command, shell=True)
-
-        if not os.path.exists(f"./output/json/{name}.json"):
-            command = f"./aom_build/examples/inspect ./output/ivf/{name}.ivf -mv -r > ./output/json/{name}.json"
-            subprocess.run(command, shell=True)
-
-        main(
-            arg_flags.gop,
-            name,
-            f"./{tmp}/{name}.y4m",
-            w,
-            h,
-            arg_flags.forward,
-            arg_flags.dataset,
-            arg_flags.layers,
-            arg_flags.frame_step,
-            arg_flags.encoding_preset,
-            arg_flags.display,
-            arg_flags.iqa,
-            arg_flags.motion_metrics,
-            arg_flags.complexity_metrics,
-            arg_flags.original_mv
-        )
-
-        subprocess.run(f"rm -rf ./{tmp}/*", shell=True)
+    failures = run_batch(files, arg_flags, main)
 
-    subprocess.run(f"rm -rf ./{tmp}", shell=True)
+    for file, error in failures:
+        print(f"Processing of {file} failed:\n{error}")
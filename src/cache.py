@@ -0,0 +1,286 @@
+"""
+ cache.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Persistent cache of the outputs of the stages of the pipeline.
+
+Every entry is stored under output/cache/{stage}/{key}, where the key is a hash of everything the stage depends on: the
+content of the input frames, the commands and scripts used, their parameters and the key of the previous stage. A
+changed input therefore gives a new key, an entry is never reused for other inputs. The files are hard-linked in and
+out of the cache when possible, so storing and restoring an entry does not copy the data: the restored files must be
+replaced, not modified in place. The least recently used entries are removed once the cache exceeds its size.
+
+The size of every entry is kept in an index, so the cache is only walked when entries must be evicted. The index and
+the entries are changed under a file lock, the processes of several runs can share a cache.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+
+def hash_file(path: str, digest=None, chunk_size: int = 1 << 20):
+    """
+    Hash the content of a file.
+    :param path: path of the file
+    :param digest: hashlib object to update, a new sha256 if None
+    :return: the updated hashlib object
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+
+    return digest
+
+
+def hash_files(paths: list) -> str:
+    """
+    Hash the content of a list of files, in order.
+    :param paths: paths of the files
+    :return: hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"{os.path.basename(path)}\0".encode("utf-8"))
+        hash_file(path, digest)
+    return digest.hexdigest()
+
+
+def hash_command(command: str) -> str:
+    """
+    Hash a command line and the content of the files it calls, such as the encoding scenario scripts.
+    :param command: command line
+    :return: hexadecimal digest
+    """
+    digest = hashlib.sha256(command.encode("utf-8"))
+    for token in shlex.split(command):
+        if os.path.isfile(token):
+            hash_file(token, digest)
+    return digest.hexdigest()
+
+
+def hash_sources(paths: list) -> str:
+    """
+    Hash the python sources of the project, so that a change of the code invalidates the derived outputs.
+    :param paths: files and directories containing the sources
+    :return: hexadecimal digest
+    """
+    sources = []
+    for path in paths:
+        if os.path.isfile(path):
+            sources.append(path)
+        for directory_path, _, filenames in os.walk(path):
+            sources += [os.path.join(directory_path, file) for file in filenames if file.endswith(".py")]
+
+    return hash_files(sorted(sources))
+
+
+def cache_key(*parts) -> str:
+    """
+    Build the key of an entry from the values it depends on.
+    :param parts: values, converted to strings
+    :return: hexadecimal digest
+    """
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def _link(source: str, destination: str) -> None:
+    """
+    Hard-link a file, or a directory tree, falling back on a copy across file systems.
+    :param source: existing file or directory
+    :param destination: path to create, replaced if it exists
+    :return: None
+    """
+    if os.path.isdir(source):
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination, copy_function=_link)
+        return
+
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def copy_links(directory: str) -> None:
+    """
+    Replace the hard-linked files of a directory tree by their own copies, so that they can be modified in place
+    without changing the entries of the cache they were restored from.
+    :param directory: directory tree, nothing is done if it does not exist
+    :return: None
+    """
+    for directory_path, _, filenames in os.walk(directory):
+        for file in filenames:
+            path = os.path.join(directory_path, file)
+            if os.path.isfile(path) and os.stat(path).st_nlink > 1:
+                shutil.copy2(path, f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+
+
+def _entry_size(entry: str) -> int:
+    size = 0
+    for directory_path, _, filenames in os.walk(entry):
+        size += sum(os.path.getsize(os.path.join(directory_path, file)) for file in filenames)
+    return size
+
+
+class StageCache:
+    """
+    Size-bounded cache of the outputs of the stages, with least recently used eviction.
+
+    A cache with a size of 0 is disabled: nothing is found and nothing is stored.
+    """
+
+    def __init__(self, root: str = "./output/cache", max_size: float = 20):
+        """
+        :param root: directory of the cache
+        :param max_size: maximum size of the cache, in GB
+        """
+        self.root = root
+        self.max_bytes = int(max_size * 1e9)
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entry(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, key)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the lock of the cache, shared by the threads of this process and by the other processes.
+        """
+        with self.lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _entries(self) -> list:
+        """
+        :return: paths of the complete entries of the cache, relative to its root
+        """
+        entries = []
+        for stage in os.listdir(self.root):
+            stage_directory = os.path.join(self.root, stage)
+            if os.path.isdir(stage_directory):
+                entries += [os.path.join(stage, key) for key in os.listdir(stage_directory) if ".tmp-" not in key]
+        return entries
+
+    def _read_index(self) -> dict:
+        """
+        Read the size of every entry, the index is rebuilt from the entries if it is missing.
+        :return: dictionary of the size of each entry, relative to the root of the cache
+        """
+        try:
+            with open(os.path.join(self.root, "index.json")) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {entry: _entry_size(os.path.join(self.root, entry)) for entry in self._entries()}
+
+    def _write_index(self, index: dict) -> None:
+        path = os.path.join(self.root, "index.json")
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(index, file)
+        os.replace(f"{path}.tmp", path)
+
+    def fetch(self, stage: str, key: str, files: dict) -> bool:
+        """
+        Restore the files of an entry.
+        :param stage: name of the stage
+        :param key: key of the entry
+        :param files: dictionary of the destination of each file of the entry
+        :return: whether the entry was found and restored
+        """
+        if not self.enabled:
+            return False
+
+        with self._locked():
+            entry = self._entry(stage, key)
+            if not os.path.isdir(entry):
+                return False
+
+            if not all(os.path.lexists(os.path.join(entry, name)) for name in files):
+                return False
+
+            for name, destination in files.items():
+                _link(os.path.join(entry, name), destination)
+
+            os.utime(entry)
+
+        return True
+
+    def store(self, stage: str, key: str, files: dict) -> None:
+        """
+        Add the outputs of a stage to the cache, then evict the least recently used entries.
+        :param stage: name of the stage
+        :param key: key of the entry
+        :param files: dictionary of the file, or directory, to store under each name of the entry
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        entry = self._entry(stage, key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        # The entry is filled under a temporary name, an interrupted store never leaves a partial entry.
+        tmp_entry = f"{entry}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp_entry)
+        for name, source in files.items():
+            _link(source, os.path.join(tmp_entry, name))
+
+        with self._locked():
+            if os.path.isdir(entry):
+                shutil.rmtree(tmp_entry)
+            else:
+                os.rename(tmp_entry, entry)
+            os.utime(entry)
+
+            index = self._read_index()
+            index[os.path.join(stage, key)] = _entry_size(entry)
+            if sum(index.values()) > self.max_bytes:
+                self._evict(index, keep=os.path.join(stage, key))
+            self._write_index(index)
+
+    def _evict(self, index: dict, keep: str) -> None:
+        """
+        Remove the least recently used entries until the cache fits in its size.
+        :param index: size of every entry, updated in place
+        :param keep: entry that must not be removed
+        :return: None
+        """
+        # The entries removed by hand are forgotten.
+        for entry in list(index):
+            if not os.path.isdir(os.path.join(self.root, entry)):
+                del index[entry]
+
+        total = sum(index.values())
+
+        for _, entry in sorted((os.path.getmtime(os.path.join(self.root, entry)), entry) for entry in index):
+            if total <= self.max_bytes:
+                break
+            if entry != keep:
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+                total -= index.pop(entry)
@@ -7,7 +7,16 @@
 ----------------------------------------------------------------------------
 
 Define all the functions needed to process the json files generated by AOM inspection tool.
+
+When the inspector writes the order hints of the frames, the reference frames are read from them. Otherwise, they are
+simulated from the GOP structure by frame_type.reference_schedule.
 """
+import os
+import re
+import subprocess
+from contextlib import nullcontext
+from typing import Iterator
+from typing import Optional
 from typing import Tuple
 
 import cv2
@@ -15,6 +24,12 @@ import numpy as np
 
 import json
 
+from .modules.frame_type import reference_schedule
+
+
+_SEPARATORS = re.compile(r"[\s,]*")
+_WHITESPACES = np.frombuffer(b" \t\r\n", dtype=np.uint8)
+
 
 def read_json_file(json_file: str) -> dict:
     """
@@ -27,6 +42,169 @@ def read_json_file(json_file: str) -> dict:
     return data
 
 
+def iter_json_frames(json_file, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Stream the frames of the json file, one at a time, without loading the whole document.
+
+    Only the frame being decoded is held in memory: the file is read by chunks and every element of the top-level
+    array is decoded as soon as it is complete. When a frame does not fit in the buffer, the reads grow geometrically
+    so that the decoding stays linear in the size of the file. The file can also be a stream still being written, such
+    as the output of the inspector, the elements are then decoded as they arrive.
+    :param json_file: json file to read, or text stream opened for reading
+    :param chunk_size: size of the first reads, in characters
+    :return: iterator over the elements of the top-level array
+    """
+    decoder = json.JSONDecoder()
+    read_size = chunk_size
+
+    # A stream is left open, it belongs to the caller.
+    with open(json_file, "r") if isinstance(json_file, str) else nullcontext(json_file) as file:
+        # The whitespaces before the array may fill the first reads.
+        buffer = ""
+        while not buffer and (chunk := file.read(read_size)):
+            buffer = chunk.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{json_file} does not contain a json array")
+        position = 1
+        end_of_file = False
+
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    frame, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise ValueError(f"{json_file} is truncated")
+                    read_size *= 2
+                else:
+                    # A value reaching the end of the buffer, such as a number, may go on in the next chunk.
+                    if end < len(buffer) or end_of_file:
+                        position = end
+                        read_size = chunk_size
+                        yield frame
+                        continue
+            elif end_of_file:
+                return
+
+            chunk = file.read(read_size)
+            if not chunk:
+                end_of_file = True
+                continue
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+class _Tee:
+    """
+    Text stream copying what is read from another stream to a file.
+    """
+
+    def __init__(self, stream, file):
+        self.stream = stream
+        self.file = file
+
+    def read(self, size: int = -1) -> str:
+        data = self.stream.read(size)
+        self.file.write(data)
+        return data
+
+
+def stream_inspector(command: str, tee: str = None, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Run the inspector and stream the frames of its output, each frame being decoded as soon as it is written.
+
+    The output can be saved at the same time, it is written to a temporary file renamed once the inspector succeeded.
+    When the iteration stops early, the inspector is killed and the partial output is removed.
+    :param command: inspector command, writing the json array to its standard output
+    :param tee: path of the file receiving a copy of the output, None not to save it
+    :param chunk_size: size of the first reads, in characters
+    :return: iterator over the elements of the top-level array
+    """
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, text=True)
+    tee_file = open(f"{tee}.tmp", "w") if tee is not None else None
+    stream = _Tee(process.stdout, tee_file) if tee_file is not None else process.stdout
+    complete = False
+
+    try:
+        yield from iter_json_frames(stream, chunk_size)
+
+        # The end of the output, after the array, still goes to the copy.
+        stream.read()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+        complete = True
+
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+        if tee_file is not None:
+            tee_file.close()
+            if complete:
+                os.replace(f"{tee}.tmp", tee)
+            else:
+                os.remove(f"{tee}.tmp")
+
+
+def count_json_frames(json_file: str, chunk_size: int = 1 << 24) -> int:
+    """
+    Count the elements of the top-level array of the json file without decoding it.
+
+    The file is scanned by chunks and the bracket depth is tracked with numpy, the elements are delimited by the commas
+    found at depth one. The brackets and commas inside strings are skipped: a quote opens or closes a string unless it
+    follows an odd number of backslashes.
+    :param json_file: json file to scan
+    :param chunk_size: size of the chunks, in bytes
+    :return: number of elements in the top-level array
+    """
+    depth = 0
+    separators = 0
+    has_element = False
+    # Whether the previous chunk ended inside a string, and with how many backslashes.
+    in_string = 0
+    backslashes = 0
+
+    with open(json_file, "rb") as file:
+        while chunk := file.read(chunk_size):
+            data = np.frombuffer(chunk, dtype=np.uint8)
+
+            quotes = data == ord('"')
+            backslash = data == ord("\\")
+            if backslashes or backslash.any():
+                # Number of backslashes right before every byte, the run ending the previous chunk included.
+                index = np.arange(len(data))
+                last_other = np.maximum.accumulate(np.where(backslash, -1, index))
+                run = np.empty(len(data), dtype=np.int64)
+                run[0] = backslashes
+                run[1:] = index[:-1] - last_other[:-1] + np.where(last_other[:-1] < 0, backslashes, 0)
+                quotes &= run % 2 == 0
+                backslashes = len(data) - 1 - int(last_other[-1]) + (backslashes if last_other[-1] < 0 else 0)
+
+            # Only the parity of the number of quotes matters, it survives the wrap around of uint8.
+            strings = ((np.cumsum(quotes, dtype=np.uint8) + in_string) & 1).astype(bool)
+            in_string = int(strings[-1])
+
+            opening = ((data == ord("[")) | (data == ord("{"))) & ~strings
+            closing = ((data == ord("]")) | (data == ord("}"))) & ~strings
+            levels = depth + np.cumsum(opening.astype(np.int64) - closing)
+
+            separators += int(np.count_nonzero((data == ord(",")) & ~strings & (levels == 1)))
+            if not has_element:
+                has_element = bool(np.any(
+                    (levels >= 1) & ~np.isin(data, _WHITESPACES) & ~(opening & (levels == 1))
+                ))
+
+            depth = int(levels[-1])
+
+    return separators + 1 if has_element else 0
+
+
 def get_frame_data(data: dict, frame_number: int) -> dict:
     """
     Get the data of a specific frame
@@ -37,51 +215,204 @@ def get_frame_data(data: dict, frame_number: int) -> dict:
     return data[frame_number]
 
 
-def get_frame_motion_vectors(
-        frame_data: dict,
+def frame_block_arrays(frame_data: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert the per-block lists of a frame into numpy arrays, once.
+    :param frame_data: dictionary containing the data of the frame
+    :return: the motion vectors (h, w, 2) as (row, col) and the first reference frame of each block (h, w)
+    """
+    motion_vectors = np.asarray(frame_data["motionVectors"])
+    reference_frames = np.asarray(frame_data["referenceFrame"])
+
+    return motion_vectors[..., 0:2], reference_frames[..., 0]
+
+
+KEY_FRAME = 0
+ORDER_HINT_BITS = 7
+
+
+def bitstream_references(frame_data: dict, frame_number: int, keyframe: int = 0) -> Optional[np.ndarray]:
+    """
+    Read the frame numbers of the reference frames of a frame from the order hints written by the inspector.
+
+    The keys follow the names of the AV1 specification: "orderHint" is the order hint of the frame, "refFrameIdx" the
+    buffer slot used by each of the references LAST to ALTREF and "refOrderHint" the order hint of the frame held by
+    each of the 8 slots. The order hints wrap around after 2**orderHintBits frames, so the references are placed from
+    their signed distance to the frame. The intra reference (0) points to the last keyframe, as in reference_mapping.
+    :param frame_data: dictionary containing the data of the frame
+    :param frame_number: Frame number
+    :param keyframe: Number of the last keyframe
+    :return: (8,) array of frame number for the reference frames, None if the frame has no order hints
+    """
+    if "orderHint" not in frame_data:
+        return None
+
+    if frame_data.get("frameType") == KEY_FRAME:
+        return np.full(8, frame_number, dtype=np.int32)
+
+    if "refFrameIdx" not in frame_data or "refOrderHint" not in frame_data:
+        return None
+
+    modulo = 1 << frame_data.get("orderHintBits", ORDER_HINT_BITS)
+
+    reference_hints = np.asarray(frame_data["refOrderHint"], dtype=np.int64)[frame_data["refFrameIdx"]]
+    distances = (frame_data["orderHint"] - reference_hints) % modulo
+    distances[distances >= modulo // 2] -= modulo
+
+    references = np.empty(8, dtype=np.int32)
+    references[0] = keyframe
+    references[1:] = frame_number - distances
+
+    return references
+
+
+class FrameReferences:
+    """
+    Frame numbers of the reference frames of the frames of a video.
+
+    The references are read from the bitstream when the inspector gives them, and taken from the schedule simulated
+    from the GOP structure otherwise. The schedule is only computed if a frame needs it. The frames must be resolved in
+    order, so that the last keyframe is known.
+    """
+
+    def __init__(self, gop_size: int, n_frames: int):
+        """
+        :param gop_size: The gop size used during encoding.
+        :param n_frames: Number of frames of the video.
+        """
+        self.gop_size = int(gop_size)
+        self.n_frames = n_frames
+        self.keyframe = 0
+        self.schedule = None
+
+    def resolve(self, frame_data: Optional[dict], frame_number: int) -> np.ndarray:
+        """
+        Get the reference frames of a frame.
+        :param frame_data: dictionary containing the data of the frame, None if the frame has no data
+        :param frame_number: Frame number
+        :return: (8,) array of frame number for the reference frames
+        """
+        references = None
+        if frame_data is not None:
+            if frame_data.get("frameType") == KEY_FRAME:
+                self.keyframe = frame_number
+            references = bitstream_references(frame_data, frame_number, self.keyframe)
+
+        if references is None:
+            if self.schedule is None:
+                self.schedule, _ = reference_schedule(self.gop_size, self.n_frames)
+            references = self.schedule[frame_number]
+
+        return references
+
+
+def reference_distance_table(reference_dict: dict, frame_number: int) -> np.ndarray:
+    """
+    Build a lookup table giving, for each reference frame type, the distance to the current frame.
+    :param reference_dict: dictionary containing the mapping of the reference frames
+    :param frame_number: Frame number
+    :return: numpy array indexed by reference frame type
+    """
+    table = np.zeros(max(reference_dict) + 1, dtype=np.int64)
+    for reference_frame, reference_frame_number in reference_dict.items():
+        table[reference_frame] = frame_number - reference_frame_number
+    return table
+
+
+def upsample_blocks(blocks: np.ndarray, block_size: int = 4) -> np.ndarray:
+    """
+    Expand a block-level map to pixel resolution, every block covering block_size x block_size pixels.
+    :param blocks: block-level map of shape (h, w, channels)
+    :param block_size: size of a block in pixels
+    :return: pixel-level map of shape (h*block_size, w*block_size, channels)
+    """
+    return np.repeat(np.repeat(blocks, block_size, axis=0), block_size, axis=1)
+
+
+def block_motion_vectors(
+        motion_vectors: np.ndarray,
+        reference_frames: np.ndarray,
         reference_dict: dict,
         frame_number: int
 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Get the motion vector map of a specific frame and the motion intensity map.
-    :param frame_data: dictionary containing the data of the frame
+    Build the motion vectors, projected motion vectors and reference frames maps of a frame at block resolution.
+
+    The last row and the last column of blocks are left empty.
+    :param motion_vectors: (h, w, 2) motion vectors of the blocks, as (row, col) given by the inspection tool
+    :param reference_frames: (h, w) first reference frame of the blocks
     :param reference_dict: dictionary containing the mapping of the reference frames
     :param frame_number: Frame number
-    :return: a 2-channels numpy array creating the vector motion field
+    :return: (h, w, 2) float32 motion field, (h, w, 2) float32 projected field and (h, w, 1) float32 reference map
     """
+    h, w = reference_frames.shape
 
-    motion_vectors = frame_data["motionVectors"]
-    reference_frames = frame_data["referenceFrame"]
+    motion_map = np.zeros((h, w, 2), dtype=np.float32)
+    motion_map_projection = np.zeros((h, w, 2), dtype=np.float32)
+    reference_map = np.zeros((h, w, 1), dtype=np.float32)
 
-    h = len(motion_vectors)
-    w = len(motion_vectors[0])
+    vectors = motion_vectors[:h-1, :w-1, ::-1] / 16
+    references = reference_frames[:h-1, :w-1]
+    distance = reference_distance_table(reference_dict, frame_number)[references]
 
-    motion_map = np.zeros((h*4, w*4, 2), dtype=np.float32)
-    motion_map_projection = np.zeros((h * 4, w * 4, 2), dtype=np.float32)
-    reference_map = np.zeros((h*4, w*4, 1), dtype=np.float32)
+    motion_map[:h-1, :w-1] = vectors
+    # The blocks of a keyframe reference the frame itself, their projection is left at 0.
+    np.divide(vectors, distance[..., np.newaxis], out=motion_map_projection[:h-1, :w-1],
+              where=distance[..., np.newaxis] != 0)
+    reference_map[:h-1, :w-1, 0] = references / 7
 
-    for i in range(0, h-1):
-        for j in range(0, w-1):
-
-            vector_h = motion_vectors[i][j][0]/16
-            vector_w = motion_vectors[i][j][1]/16
+    return motion_map, motion_map_projection, reference_map
 
-            motion_map[i*4:(i+1)*4, j*4:(j+1)*4, 0] = vector_w
-            motion_map[i*4:(i+1)*4, j*4:(j+1)*4, 1] = vector_h
 
-            reference_map[i * 4:(i + 1) * 4, j * 4:(j + 1) * 4, 0] = reference_frames[i][j][0] / 7
+def get_block_motion_vectors(
+        frame_data: dict,
+        reference_dict: dict,
+        frame_number: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the motion vectors, projected motion vectors and reference frames of a specific frame at block resolution.
+    :param frame_data: dictionary containing the data of the frame
+    :param reference_dict: dictionary containing the mapping of the reference frames
+    :param frame_number: Frame number
+    :return: (h, w, 2) float32 motion field, (h, w, 2) float32 projected field and (h, w, 1) float32 reference map
+    """
+    motion_vectors, reference_frames = frame_block_arrays(frame_data)
 
-            reference_frame = reference_frames[i][j][0]
-            reference_frame_number = reference_dict[reference_frame]
-            distance = frame_number - reference_frame_number
+    return block_motion_vectors(motion_vectors, reference_frames, reference_dict, frame_number)
 
-            motion_map_projection[i * 4:(i + 1) * 4, j * 4:(j + 1) * 4, 0] = vector_w / distance
-            motion_map_projection[i * 4:(i + 1) * 4, j * 4:(j + 1) * 4, 1] = vector_h / distance
 
-    reference_map = reference_map * 255
+def upsample_motion_vectors(
+        motion_map: np.ndarray,
+        motion_map_projection: np.ndarray,
+        reference_map: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Expand the block resolution maps of a frame to pixel resolution.
+    :param motion_map: (h, w, 2) motion field
+    :param motion_map_projection: (h, w, 2) projected motion field
+    :param reference_map: (h, w, 1) reference map, with values in [0, 1]
+    :return: the two motion fields and the uint8 reference map at pixel resolution
+    """
+    reference_map = upsample_blocks(reference_map) * 255
     reference_map = reference_map.astype(np.uint8)
 
-    return motion_map, motion_map_projection, reference_map
+    return upsample_blocks(motion_map), upsample_blocks(motion_map_projection), reference_map
+
+
+def get_frame_motion_vectors(
+        frame_data: dict,
+        reference_dict: dict,
+        frame_number: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the motion vector map of a specific frame and the motion intensity map.
+    :param frame_data: dictionary containing the data of the frame
+    :param reference_dict: dictionary containing the mapping of the reference frames
+    :param frame_number: Frame number
+    :return: a 2-channels numpy array creating the vector motion field
+    """
+
+    return upsample_motion_vectors(*get_block_motion_vectors(frame_data, reference_dict, frame_number))
 
 
 def get_frame_reference(frame_data: dict) -> np.ndarray:
@@ -90,19 +421,14 @@ def get_frame_reference(frame_data: dict) -> np.ndarray:
     :param frame_data: dictionary containing the data of the frame
     :return: numpy array containing the reference frame
     """
-    reference_frames = frame_data["referenceFrame"]
-
-    h = len(reference_frames)
-    w = len(reference_frames[0])
-
-    result = np.zeros((h*4, w*4, 1), dtype=np.float32)
+    _, reference_frames = frame_block_arrays(frame_data)
 
-    for i in range(0, h-1):
-        for j in range(0, w-1):
+    h, w = reference_frames.shape
 
-            result[i*4:(i+1)*4, j*4:(j+1)*4, 0] = reference_frames[i][j][0]/7
+    result = np.zeros((h, w, 1), dtype=np.float32)
+    result[:h-1, :w-1, 0] = reference_frames[:h-1, :w-1] / 7
 
-    result = result * 255
+    result = upsample_blocks(result) * 255
     result = result.astype(np.uint8)
 
     return result
@@ -0,0 +1,101 @@
+"""
+ block_field.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Maps stored at block resolution and upsampled to pixel resolution only when needed.
+
+The data extracted by AOM inspection tool is constant inside each 4x4 block. Keeping it at block resolution uses 16
+times less memory and disk, the pixel resolution map is only built, and cropped to the size of the video, the first
+time a consumer asks for it.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+class BlockField:
+    """
+    Lazy pixel resolution view over a block resolution map.
+    """
+
+    def __init__(self, blocks: np.ndarray, height: int, width: int, block_size: int = 4):
+        """
+        :param blocks: (h, w, channels) block resolution map
+        :param height: height of the video, in pixels
+        :param width: width of the video, in pixels
+        :param block_size: size of a block, in pixels
+        """
+        self.blocks = blocks
+        self.height = height
+        self.width = width
+        self.block_size = block_size
+        self._pixels = None
+
+    @property
+    def shape(self) -> tuple:
+        return (self.height, self.width) + self.blocks.shape[2:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.blocks.dtype
+
+    @property
+    def visible_blocks(self) -> np.ndarray:
+        """
+        :return: the blocks covering the video, without the blocks past its borders
+        """
+        rows = -(-self.height // self.block_size)
+        cols = -(-self.width // self.block_size)
+        return self.blocks[:rows, :cols]
+
+    def to_pixels(self) -> np.ndarray:
+        """
+        Upsample the blocks and crop the result to the size of the video, the result is kept for the next calls.
+        :return: (height, width, channels) pixel resolution map
+        """
+        if self._pixels is None:
+            pixels = self.visible_blocks
+            pixels = np.repeat(np.repeat(pixels, self.block_size, axis=0), self.block_size, axis=1)
+            self._pixels = pixels[0:self.height, 0:self.width]
+
+        return self._pixels
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        pixels = self.to_pixels()
+        if dtype is not None:
+            return pixels.astype(dtype)
+        return pixels
+
+    def __getitem__(self, item):
+        return self.to_pixels()[item]
+
+
+def block_fields(
+        motion_map: np.ndarray,
+        motion_map_projection: np.ndarray,
+        reference_map: np.ndarray,
+        height: int,
+        width: int
+) -> Tuple[BlockField, BlockField, BlockField]:
+    """
+    Wrap the block resolution maps of a frame into lazy views.
+    :param motion_map: (h, w, 2) motion field
+    :param motion_map_projection: (h, w, 2) projected motion field
+    :param reference_map: (h, w, 1) reference map, with values in [0, 1]
+    :param height: height of the video, in pixels
+    :param width: width of the video, in pixels
+    :return: views over the motion field, the projected motion field and the uint8 reference map
+    """
+    reference_map = reference_map * 255
+    reference_map = reference_map.astype(np.uint8)
+
+    return (
+        BlockField(motion_map, height, width),
+        BlockField(motion_map_projection, height, width),
+        BlockField(reference_map, height, width),
+    )
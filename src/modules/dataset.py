@@ -0,0 +1,295 @@
+"""
+ dataset.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Storage of the dataset stacks in large shards instead of one .npy file per frame.
+
+The layers of a stack are copied side by side into a buffer allocated once with the channel layout of the dataset. The
+shards are raw files holding shard_size stacks each, preallocated when the dataset is created: the stack of a frame has
+a fixed place, so it can be written by any process, directly into the memory-mapped shard. An index.json file gives
+the layout, the shards and, for every frame, its frame id and its place. The shards can be compressed once written,
+frame by frame, the uncompressed shards are read through memory maps.
+"""
+
+import json
+import os
+import zlib
+
+import cv2
+import numpy as np
+
+
+LAYERS = {
+    "curr_frame": (3, np.uint8),
+    "og_frame": (3, np.uint8),
+    "curr_frame_y": (1, np.uint8),
+    "og_frame_y": (1, np.uint8),
+    "mv": (2, np.float32),
+    "mv_proj": (2, np.float32),
+    "ref": (1, np.uint8),
+}
+
+COMPRESSIONS = ("none", "zlib")
+
+
+class DatasetLayout:
+    """
+    Channel layout of the stacks of a dataset, the unknown layers are ignored.
+    """
+
+    def __init__(self, layers: list, height: int, width: int):
+        """
+        :param layers: names of the layers, in stacking order
+        :param height: height of the frames
+        :param width: width of the frames
+        """
+        self.layers = [layer for layer in layers if layer in LAYERS]
+        self.height = height
+        self.width = width
+
+        # A layer can be listed several times, every copy has its own channels.
+        self.entries = []
+        channels = 0
+        for layer in self.layers:
+            self.entries.append((layer, channels, channels + LAYERS[layer][0]))
+            channels += LAYERS[layer][0]
+
+        self.channels = channels
+        self.dtype = np.result_type(*[LAYERS[layer][1] for layer in self.layers]) if self.layers else np.uint8
+
+    @property
+    def shape(self) -> tuple:
+        return self.height, self.width, self.channels
+
+    @property
+    def offsets(self) -> dict:
+        """
+        :return: dictionary of the first and last channels, excluded, of each layer. The first copy of a layer listed
+        several times is given
+        """
+        offsets = {}
+        for layer, start, stop in self.entries:
+            offsets.setdefault(layer, (start, stop))
+        return offsets
+
+    def assemble(self, frame, prev_frame, motion_field, motion_field_projection, reference_map, out=None) -> np.ndarray:
+        """
+        Copy the layers of a frame side by side, as np.dstack would, into a buffer.
+        :param frame: current frame, in YCrCb
+        :param prev_frame: previous frame, in YCrCb
+        :param motion_field: (h, w, 2) motion field
+        :param motion_field_projection: (h, w, 2) projected motion field
+        :param reference_map: (h, w, 1) uint8 reference map
+        :param out: (h, w, channels) buffer to fill, a new one is allocated if None
+        :return: the filled buffer
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+
+        for layer, start, stop in self.entries:
+            if layer == "curr_frame":
+                out[:, :, start:stop] = cv2.cvtColor(frame, cv2.COLOR_YCrCb2RGB)
+            elif layer == "og_frame":
+                out[:, :, start:stop] = cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB)
+            elif layer == "curr_frame_y":
+                out[:, :, start] = frame[:, :, 0]
+            elif layer == "og_frame_y":
+                out[:, :, start] = prev_frame[:, :, 0]
+            elif layer == "mv":
+                out[:, :, start:stop] = motion_field
+            elif layer == "mv_proj":
+                out[:, :, start:stop] = motion_field_projection
+            elif layer == "ref":
+                out[:, :, start:stop] = reference_map
+
+        return out
+
+
+class ShardedDataset:
+    """
+    Writer of the stacks of a video into preallocated shards.
+
+    The writer can be sent to worker processes: each process maps the shards it writes to.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        layout: DatasetLayout,
+        n_frames: int,
+        shard_size: int = 256,
+        compression: str = "none",
+        resume: bool = False
+    ):
+        """
+        :param directory: directory of the dataset of the video
+        :param layout: channel layout of the stacks
+        :param n_frames: number of stacks of the video
+        :param shard_size: number of stacks per shard
+        :param compression: "none" or "zlib", compression applied to the shards once they are written
+        :param resume: whether to keep the stacks already written in the shards by an interrupted run
+        """
+        self.directory = directory
+        self.layout = layout
+        self.n_frames = n_frames
+        self.shard_size = max(1, shard_size)
+        self.compression = compression
+        self.maps = {}
+
+        frame_bytes = int(np.prod(layout.shape)) * np.dtype(layout.dtype).itemsize
+
+        os.makedirs(directory, exist_ok=True)
+        for shard in range(self.shard_count):
+            keep = resume and os.path.exists(self.shard_path(shard))
+            with open(self.shard_path(shard), "r+b" if keep else "wb") as file:
+                file.truncate(self.shard_frames(shard) * frame_bytes)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["maps"] = {}
+        return state
+
+    @property
+    def shard_count(self) -> int:
+        return -(-self.n_frames // self.shard_size)
+
+    def shard_frames(self, shard: int) -> int:
+        """
+        :param shard: shard number
+        :return: number of stacks held by the shard
+        """
+        return min(self.shard_size, self.n_frames - shard * self.shard_size)
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(self.directory, f"shard_{str(shard).zfill(5)}.bin")
+
+    def slot(self, position: int) -> np.ndarray:
+        """
+        Get the place of a stack in its shard.
+        :param position: position of the frame in the video, from 0 to n_frames - 1
+        :return: (h, w, channels) memory-mapped buffer
+        """
+        shard, slot = divmod(position, self.shard_size)
+
+        if shard not in self.maps:
+            self.maps[shard] = np.memmap(
+                self.shard_path(shard),
+                dtype=self.layout.dtype,
+                mode="r+",
+                shape=(self.shard_frames(shard),) + self.layout.shape
+            )
+
+        return self.maps[shard][slot]
+
+    def close(self, video: str, frame_ids: list) -> dict:
+        """
+        Flush the shards, compress them if needed and write the index of the dataset.
+        :param video: name of the video
+        :param frame_ids: frame id of the stack at each position
+        :return: the index
+        """
+        for shard_map in self.maps.values():
+            shard_map.flush()
+        self.maps = {}
+
+        index = {
+            "version": 1,
+            "video": video,
+            "height": self.layout.height,
+            "width": self.layout.width,
+            "channels": self.layout.channels,
+            "dtype": np.dtype(self.layout.dtype).name,
+            "layers": self.layout.offsets,
+            "compression": self.compression,
+            "shards": [],
+            "frames": [],
+        }
+
+        for shard in range(self.shard_count):
+            shard_path = self.shard_path(shard)
+            count = self.shard_frames(shard)
+
+            if self.compression == "zlib":
+                stacks = np.memmap(shard_path, dtype=self.layout.dtype, mode="r", shape=(count,) + self.layout.shape)
+                offset = 0
+                with open(f"{shard_path}.zlib", "wb") as file:
+                    for slot in range(count):
+                        data = zlib.compress(stacks[slot].tobytes(), 1)
+                        file.write(data)
+                        index["frames"].append([shard, slot, offset, len(data)])
+                        offset += len(data)
+                del stacks
+                os.remove(shard_path)
+                shard_path = f"{shard_path}.zlib"
+            else:
+                index["frames"] += [[shard, slot, 0, 0] for slot in range(count)]
+
+            index["shards"].append(os.path.basename(shard_path))
+
+        for frame, frame_id in zip(index["frames"], frame_ids):
+            frame.insert(0, int(frame_id))
+
+        with open(os.path.join(self.directory, "index.json.tmp"), "w") as file:
+            json.dump(index, file)
+        os.replace(os.path.join(self.directory, "index.json.tmp"), os.path.join(self.directory, "index.json"))
+
+        return index
+
+
+class DatasetReader:
+    """
+    Random access to the stacks of a sharded dataset.
+    """
+
+    def __init__(self, directory: str):
+        """
+        :param directory: directory of the dataset of a video, containing index.json
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "index.json"), "r") as file:
+            self.index = json.load(file)
+
+        self.shape = (self.index["height"], self.index["width"], self.index["channels"])
+        self.dtype = np.dtype(self.index["dtype"])
+        self.maps = {}
+
+    def __len__(self) -> int:
+        return len(self.index["frames"])
+
+    @property
+    def frame_ids(self) -> list:
+        return [frame[0] for frame in self.index["frames"]]
+
+    def __getitem__(self, position: int) -> np.ndarray:
+        """
+        Read a stack.
+        :param position: position of the frame in the video
+        :return: (h, w, channels) stack, a read-only view on the shard when it is not compressed
+        """
+        _, shard, slot, offset, size = self.index["frames"][position]
+        shard_path = os.path.join(self.directory, self.index["shards"][shard])
+
+        if self.index["compression"] == "zlib":
+            with open(shard_path, "rb") as file:
+                file.seek(offset)
+                data = zlib.decompress(file.read(size))
+            return np.frombuffer(data, dtype=self.dtype).reshape(self.shape)
+
+        if shard not in self.maps:
+            self.maps[shard] = np.memmap(shard_path, dtype=self.dtype, mode="r").reshape((-1,) + self.shape)
+
+        return self.maps[shard][slot]
+
+    def layer(self, position: int, layer: str) -> np.ndarray:
+        """
+        Read one layer of a stack.
+        :param position: position of the frame in the video
+        :param layer: name of the layer
+        :return: (h, w, channels of the layer) array
+        """
+        start, stop = self.index["layers"][layer]
+        return self.__getitem__(position)[:, :, start:stop]
@@ -0,0 +1,89 @@
+"""
+ flow_color.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Colour rendering of the motion fields, as flowpy.flow_to_rgb with the bright background.
+
+The colour wheel is built once, the rendering works in float32 with arctan2 and hypot instead of complex numbers. The
+motion fields being constant over each block, they are coloured at block resolution and the colours are upsampled.
+A fixed flow_max_radius gives the same colour to the same motion on all the frames of a sequence. The colours are
+within 1 of flowpy.flow_to_rgb.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from .block_field import BlockField
+from ..third_party.flowpy.flowpy import DEFAULT_TRANSITIONS
+from ..third_party.flowpy.flowpy import make_colorwheel
+
+
+@lru_cache(maxsize=None)
+def colorwheel(transitions: tuple = DEFAULT_TRANSITIONS) -> np.ndarray:
+    """
+    Get the colour wheel, made cyclic by repeating its first hue.
+    :param transitions: lengths of the six hue transitions
+    :return: (ncols + 1, 3) read-only float32 wheel
+    """
+    wheel = make_colorwheel(transitions).astype(np.float32)
+    wheel = np.vstack((wheel, wheel[0]))
+    wheel.setflags(write=False)
+    return wheel
+
+
+def flow_to_rgb(flow: np.ndarray, flow_max_radius: float = None) -> np.ndarray:
+    """
+    Create the RGB representation of a flow.
+    :param flow: (h, w, 2) flow, x then y displacement
+    :param flow_max_radius: radius giving the maximum colour intensity, the largest radius of the flow if None or 0
+    :return: (h, w, 3) uint8 image
+    """
+    wheel = colorwheel()
+    ncols = len(wheel) - 1
+
+    flow_x = np.asarray(flow[..., 0], dtype=np.float32)
+    flow_y = np.asarray(flow[..., 1], dtype=np.float32)
+    invalid = np.isnan(flow_x) | np.isnan(flow_y)
+    if invalid.any():
+        flow_x = np.where(invalid, np.float32(0), flow_x)
+        flow_y = np.where(invalid, np.float32(0), flow_y)
+
+    radius = np.hypot(flow_x, flow_y)
+    angle = np.arctan2(flow_y, flow_x)
+
+    if not flow_max_radius:
+        flow_max_radius = radius.max(initial=0)
+    if flow_max_radius > 0:
+        radius /= np.float32(flow_max_radius)
+
+    # Map the angles from (-pi, pi] to [0, ncols - 1], then interpolate the hues of the wheel.
+    angle[angle < 0] += np.float32(2 * np.pi)
+    angle *= np.float32((ncols - 1) / (2 * np.pi))
+    angle_floor = np.floor(angle)
+    fraction = (angle - angle_floor)[..., np.newaxis]
+    angle_floor = angle_floor.astype(np.intp)
+    hue = wheel[angle_floor] + (wheel[angle_floor + (fraction[..., 0] > 0)] - wheel[angle_floor]) * fraction
+
+    # Inside the radius the hue fades to white towards the center, outside it fades to black.
+    oversized = radius > 1
+    factor = np.where(oversized, 1 / np.maximum(radius, np.float32(1)), radius)[..., np.newaxis]
+    colors = np.where(oversized[..., np.newaxis], hue * factor, 255 - factor * (255 - hue))
+    colors[invalid] = 0
+
+    return colors.astype(np.uint8)
+
+
+def field_to_rgb(field: BlockField, flow_max_radius: float = None) -> np.ndarray:
+    """
+    Create the RGB representation of a motion field, coloured at block resolution.
+    :param field: (h, w, 2) motion field
+    :param flow_max_radius: radius giving the maximum colour intensity, the largest radius of the field if None or 0
+    :return: (height, width, 3) uint8 image
+    """
+    colors = flow_to_rgb(field.visible_blocks, flow_max_radius)
+    return BlockField(colors, field.height, field.width, field.block_size).to_pixels()
@@ -0,0 +1,140 @@
+"""
+ flow_io.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Reading and writing of the ground truth optical flows, in the .flo (Middlebury) and 16-bit .png (KITTI) formats.
+
+The .flo files are memory-mapped: the flow is a view on the file, copied on write, so only the pixels used are read.
+The .png files are decoded by OpenCV. The invalid flows are set to NaN in one vectorized pass, as flowpy does. The
+flows of a ground truth directory are listed once and can be read ahead of the frame loop by a background thread.
+"""
+
+import os
+from functools import lru_cache
+from typing import Iterator
+from warnings import warn
+
+import cv2
+import numpy as np
+
+from .frame_source import prefetch
+
+
+FLOW_EXTENSIONS = (".flo", ".png")
+
+
+def read_flo(path: str) -> np.ndarray:
+    """
+    Map a .flo file.
+    :param path: path of the file
+    :return: (h, w, 2) float32 flow, copied on write, with the invalid flows set to NaN
+    """
+    header = np.fromfile(path, dtype=np.uint8, count=12)
+    if header[:4].tobytes() != b"PIEH":
+        warn(f"{path} does not have a .flo file signature")
+
+    width, height = header[4:].view("<u4").tolist()
+    flow = np.memmap(path, dtype="<f4", mode="c", offset=12, shape=(height, width, 2))
+
+    # NaN compares as False, the flows already invalid are left as they are.
+    invalid = np.abs(flow) > 1e9
+    if invalid.any():
+        # A flow is invalid if any of its two components is, read as one 16-bit value per pixel.
+        flow[invalid.view(np.uint16)[..., 0] != 0] = np.nan
+
+    return flow
+
+
+def write_flo(path: str, flow: np.ndarray) -> None:
+    """
+    Write a .flo file.
+    :param path: path of the file
+    :param flow: (h, w, 2) flow, NaN for the invalid flows
+    :return: None
+    """
+    height, width, _ = flow.shape
+    # Only here to look like the original Middlebury files.
+    flow = np.where(np.isnan(flow), np.float32(1666666800.0), flow).astype("<f4")
+
+    with open(path, "wb") as file:
+        file.write(b"PIEH")
+        file.write(np.array([width, height], dtype="<u4").tobytes())
+        flow.tofile(file)
+
+
+def read_png(path: str) -> np.ndarray:
+    """
+    Read a 16-bit KITTI .png flow.
+    :param path: path of the file
+    :return: (h, w, 2) float32 flow, with the invalid flows set to NaN
+    """
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None or image.dtype != np.uint16 or image.ndim != 3:
+        raise ValueError(f"{path} is not a 16-bit RGB png flow")
+
+    # OpenCV gives BGR, the flow is stored in the red and green channels and the validity in the blue one.
+    flow = image[..., 2:0:-1].astype(np.float32)
+    flow -= 2 ** 15
+    flow /= 64
+    flow[image[..., 0] == 0] = np.nan
+
+    return flow
+
+
+def write_png(path: str, flow: np.ndarray) -> None:
+    """
+    Write a 16-bit KITTI .png flow.
+    :param path: path of the file
+    :param flow: (h, w, 2) flow, NaN for the invalid flows
+    :return: None
+    """
+    valid = ~np.isnan(flow).any(axis=-1)
+
+    image = np.empty(flow.shape[:2] + (3,), dtype=np.uint16)
+    image[..., 2:0:-1] = np.where(valid[..., np.newaxis], flow * 64. + 2 ** 15, 0).astype(np.uint16)
+    image[..., 0] = valid
+
+    cv2.imwrite(path, image)
+
+
+def read_flow(path: str) -> np.ndarray:
+    """
+    Read a flow, in the format given by the extension of the file.
+    :param path: path of the .flo or .png file
+    :return: (h, w, 2) float32 flow, with the invalid flows set to NaN
+    """
+    if path.lower().endswith(".png"):
+        return read_png(path)
+    return read_flo(path)
+
+
+@lru_cache(maxsize=None)
+def flow_paths(directory: str) -> tuple:
+    """
+    List the flows of a ground truth directory, the directory is walked once per process.
+    :param directory: directory to look into
+    :return: sorted paths of the .flo and .png files
+    """
+    paths = []
+    for directory_path, _, filenames in os.walk(directory):
+        paths += [os.path.join(directory_path, file) for file in filenames if file.lower().endswith(FLOW_EXTENSIONS)]
+
+    return tuple(sorted(paths))
+
+
+def iter_flows(paths: list, prefetch_size: int = 0) -> Iterator[np.ndarray]:
+    """
+    Read flows in order.
+    :param paths: paths of the flows
+    :param prefetch_size: number of flows read ahead by a background thread (0 to read them on demand)
+    :return: iterator over the (h, w, 2) flows
+    """
+    if prefetch_size <= 0:
+        return (read_flow(path) for path in paths)
+
+    # The flows are copied out of their memory maps in the background thread, so that the reads happen there.
+    return prefetch((np.array(read_flow(path)) for path in paths), prefetch_size)
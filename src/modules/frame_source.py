@@ -0,0 +1,158 @@
+"""
+ frame_source.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Sequential sources of frames for the frame loop.
+
+Reading a frame by index reopens the video and decodes it again from the last keyframe, the sources defined here
+decode every frame once, in order, and can decode a few frames ahead in a background thread. The frames decoded by the
+pipeline before the encoding are kept in a raw frame store, read through a memory map instead of being decoded again.
+"""
+
+import os
+import threading
+from queue import Full
+from queue import Queue
+from typing import Iterable
+from typing import Iterator
+
+import cv2
+import imageio.v3 as iio
+import numpy as np
+
+
+def prefetch(iterable: Iterable, size: int) -> Iterator:
+    """
+    Consume an iterable in a background thread, keeping at most size items ahead of the caller.
+
+    Closing the iterator, or leaving it early, stops the thread and closes the iterable, so a decoder is not left open.
+    :param iterable: iterable to consume
+    :param size: maximum number of items waiting to be used
+    :return: iterator over the items of the iterable, in the same order
+    """
+    queue = Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry) -> bool:
+        # The queue is full while the caller does not read, the thread checks regularly whether it stopped reading.
+        while not stop.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def fill():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as error:
+            put((end, error))
+        else:
+            put((end, None))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    thread = threading.Thread(target=fill, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def iter_encoded_frames(encoded_video: str, prefetch_size: int = 0) -> Iterator[np.ndarray]:
+    """
+    Decode the frames of the encoded video once, in order.
+    :param encoded_video: path of the encoded video
+    :param prefetch_size: number of frames decoded ahead in a background thread (0 to decode on demand)
+    :return: iterator over the RGB frames
+    """
+    frames = iio.imiter(encoded_video, plugin="pyav")
+
+    if prefetch_size > 0:
+        return prefetch(frames, prefetch_size)
+
+    return frames
+
+
+class FrameStore:
+    """
+    Raw BGR frames stored one after the other in a file, read through a memory map.
+
+    The store has the reading interface of cv2.VideoCapture, so the frame loop reads it the same way.
+    """
+
+    def __init__(self, frame_store: str, width: int, height: int):
+        """
+        :param frame_store: path of the raw frame store
+        :param width: width of the frames
+        :param height: height of the frames
+        """
+        count = os.path.getsize(frame_store) // (width * height * 3)
+        self.frames = np.memmap(frame_store, dtype=np.uint8, mode="r", shape=(count, height, width, 3))
+        self.position = 0
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def isOpened(self) -> bool:
+        return True
+
+    def grab(self) -> bool:
+        """
+        Skip the next frame.
+        :return: whether there was a frame to skip
+        """
+        if self.position >= len(self.frames):
+            return False
+
+        self.position += 1
+
+        return True
+
+    def read(self) -> tuple:
+        """
+        Read the next frame.
+        :return: whether a frame was read and the (height, width, 3) BGR frame
+        """
+        if self.position >= len(self.frames):
+            return False, None
+
+        frame = self.frames[self.position]
+        self.position += 1
+
+        return True, frame
+
+    def release(self) -> None:
+        self.frames = self.frames[:0]
+
+
+def open_video(video: str, width: int, height: int):
+    """
+    Open the frames of a video, from a raw frame store (.bgr) or from any video file read by OpenCV.
+    :param video: path of the frame store or of the video
+    :param width: width of the frames
+    :param height: height of the frames
+    :return: FrameStore or cv2.VideoCapture
+    """
+    if video.endswith(".bgr"):
+        return FrameStore(video, width, height)
+
+    return cv2.VideoCapture(video)
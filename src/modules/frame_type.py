@@ -12,8 +12,15 @@ A set of functions used to generate a list of frame number for each type at a gi
 AV1 is using for each frame a lot of reference frames. Those frame are referred according to their type (LAST, LAST2,
 LAST3, GOLDEN, ...). We define a set of functions to retrieve the frame number for the referenced frames at a given
 time. Those functions are based on s3-scc-01 and s3-scc-02 encoding scenarios.
+
+reference_mapping follows the frames one after the other. reference_schedule runs it once over a whole video and
+stores the result in a table, so that the reference frames of any frame can then be looked up directly.
 """
 
+from typing import Tuple
+
+import numpy as np
+
 
 def golden_management(golden_list, golden_number, keyframe, reset=False):
     """ Generate the list of the golden frames to use for a given frame.
@@ -226,3 +233,28 @@ def reference_mapping(frame_number: int, gop_size: int, last_keyframe: int, gold
             }
 
     return dict_reference, golden_list
+
+
+def reference_schedule(gop_size: int, n_frames: int, keyframe: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """ Precompute the reference frames of every frame of a video.
+
+    The table is built with reference_mapping, so it matches it exactly. The frames before the keyframe have no known
+    reference, their row is filled with -1 and their distances with 0.
+
+    :param gop_size: The gop size used during encoding.
+    :param n_frames: Number of frames of the video.
+    :param keyframe: Number of the keyframe starting the GOP structure.
+    :return: (n_frames, 8) table of frame number for the reference frames and (n_frames, 8) table of distances between
+    each frame and its reference frames.
+    """
+    references = np.full((n_frames, 8), -1, dtype=np.int32)
+
+    golden_list = []
+    for frame_number in range(keyframe, n_frames):
+        dict_reference, golden_list = reference_mapping(frame_number, int(gop_size), keyframe, golden_list)
+        references[frame_number] = [dict_reference[reference] for reference in range(8)]
+
+    distances = np.arange(n_frames, dtype=np.int32)[:, np.newaxis] - references
+    distances[:keyframe] = 0
+
+    return references, distances
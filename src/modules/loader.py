@@ -0,0 +1,324 @@
+"""
+ loader.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Loader of the datasets generated by main.main, for training.
+
+The directory of a dataset is indexed once: the sharded datasets (index.json), the folders of {frame}_stack.npy files
+and the stack/{frame}_reference_map.npy folders of the results. The samples are then read through memory maps, only
+the requested layers are copied. The batches are assembled by a pool of worker processes directly into shared memory
+buffers, a few batches ahead of the training loop.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator
+
+import numpy as np
+
+from .dataset import DatasetLayout
+from .dataset import DatasetReader
+from .dataset import LAYERS
+from .frame_source import prefetch
+
+
+# Layers of the stack/{frame}_reference_map.npy files of the results.
+STACK_LAYERS = {"y": (0, 1), "mv_proj": (1, 3)}
+
+
+def parse_layers(name: str) -> list:
+    """
+    Get the layers of a dataset from the name of its folder, {preset}_{step}_{gop}_{layers}.
+    :param name: name of the folder
+    :return: names of the layers, None if the name does not give the layers
+    """
+    tokens = name.split("_")[3:]
+    layers = []
+
+    # Layer names contain underscores, the longest name matching the next tokens is taken.
+    while tokens:
+        for size in range(len(tokens), 0, -1):
+            if "_".join(tokens[:size]) in LAYERS:
+                layers.append("_".join(tokens[:size]))
+                tokens = tokens[size:]
+                break
+        else:
+            return None
+
+    return layers or None
+
+
+class MotionDataset:
+    """
+    Random access to the samples of a generated dataset.
+
+    The samples of all the videos found under the root are indexed, they must have the same shape to be batched.
+    """
+
+    def __init__(self, root: str, layers: list = None, npy_layers: list = None):
+        """
+        :param root: directory containing the datasets
+        :param layers: names of the layers to read, all the layers if None
+        :param npy_layers: layers of the {frame}_stack.npy files, read from the name of their dataset if None
+        """
+        self.layers = layers
+        self.sources = []
+        samples = []
+
+        for directory_path, _, filenames in sorted(os.walk(root)):
+            filenames = sorted(filenames)
+
+            if "index.json" in filenames:
+                reader = DatasetReader(directory_path)
+                source = {"reader": reader, "files": None, "layers": reader.index["layers"]}
+                count = len(reader)
+
+            else:
+                stacks = [file for file in filenames if file.endswith("_stack.npy")]
+                names = npy_layers or parse_layers(os.path.basename(os.path.dirname(directory_path)))
+                offsets = DatasetLayout(names, 0, 0).offsets if names else None
+
+                if not stacks:
+                    stacks = [file for file in filenames if file.endswith("_reference_map.npy")]
+                    offsets = STACK_LAYERS
+                if not stacks:
+                    continue
+
+                source = {"reader": None, "files": [os.path.join(directory_path, file) for file in stacks]}
+                source["layers"] = offsets
+                count = len(stacks)
+
+            source["channels"] = self._channels(source["layers"], directory_path)
+            samples.append(np.stack((np.full(count, len(self.sources)), np.arange(count)), axis=-1))
+            self.sources.append(source)
+
+        self.samples = np.concatenate(samples).astype(np.int32) if samples else np.zeros((0, 2), dtype=np.int32)
+
+    def _channels(self, offsets: dict, directory: str):
+        if self.layers is None:
+            return None
+
+        if offsets is None or any(layer not in offsets for layer in self.layers):
+            raise ValueError(f"{directory} does not contain the layers {self.layers}")
+
+        channels = [np.arange(*offsets[layer]) for layer in self.layers]
+        return np.concatenate(channels)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["sources"] = [dict(source) for source in self.sources]
+        for source in state["sources"]:
+            if source["reader"] is not None:
+                source["reader"] = source["reader"].directory
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        for source in self.sources:
+            if source["reader"] is not None:
+                source["reader"] = DatasetReader(source["reader"])
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """
+        Read a sample.
+        :param index: index of the sample
+        :return: (h, w, channels) array of the selected layers
+        """
+        source, position = self.samples[index]
+        source = self.sources[source]
+
+        if source["reader"] is not None:
+            sample = source["reader"][position]
+        else:
+            sample = np.load(source["files"][position], mmap_mode="r")
+            if sample.ndim == 2:
+                sample = sample[:, :, np.newaxis]
+
+        if source["channels"] is not None:
+            return sample[:, :, source["channels"]]
+
+        return sample
+
+    def read_batch(self, indices, out: np.ndarray = None) -> np.ndarray:
+        """
+        Read several samples into a batch.
+        :param indices: indices of the samples
+        :param out: (n, h, w, channels) buffer to fill, a new one is allocated if None
+        :return: the batch
+        """
+        for slot, index in enumerate(indices):
+            sample = self[index]
+            if out is None:
+                out = np.empty((len(indices),) + sample.shape, dtype=sample.dtype)
+            out[slot] = sample
+        return out
+
+
+_worker_dataset = None
+
+
+def _init_worker(dataset: MotionDataset) -> None:
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _load_batch(indices: np.ndarray, buffer_name: str, shape: tuple, dtype: str) -> int:
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    try:
+        _worker_dataset.read_batch(indices, np.ndarray(shape, dtype=dtype, buffer=buffer.buf))
+    finally:
+        buffer.close()
+    return len(indices)
+
+
+class DataLoader:
+    """
+    Iterator over the batches of a dataset, in order or shuffled.
+
+    With workers, the batches are read by a pool of processes into shared memory buffers, a batch yielded by the
+    iterator is only valid until the next one is requested. The pool is kept between the epochs, until close is called.
+    Without workers, the batches are read by a thread.
+    """
+
+    def __init__(
+        self,
+        dataset: MotionDataset,
+        batch_size: int = 32,
+        shuffle: bool = False,
+        seed: int = 0,
+        workers: int = 0,
+        prefetch_batches: int = 4,
+        drop_last: bool = False
+    ):
+        """
+        :param dataset: dataset to read
+        :param batch_size: number of samples per batch
+        :param shuffle: whether the samples are shuffled, with a new order at every epoch
+        :param seed: seed of the shuffling
+        :param workers: number of worker processes (0 to read in a thread of this process)
+        :param prefetch_batches: number of batches read ahead
+        :param drop_last: whether the last incomplete batch is skipped
+        """
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.workers = workers
+        self.prefetch_batches = max(1, prefetch_batches)
+        self.drop_last = drop_last
+        self.epoch = 0
+
+        self.executor = None
+        self.buffers = []
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return len(self.dataset) // self.batch_size
+        return -(-len(self.dataset) // self.batch_size)
+
+    def batches(self) -> list:
+        """
+        Split the samples of the next epoch into batches.
+        :return: list of arrays of sample indices
+        """
+        order = np.arange(len(self.dataset))
+        if self.shuffle:
+            order = np.random.default_rng(self.seed + self.epoch).permutation(order)
+        self.epoch += 1
+
+        return [order[start:start + self.batch_size] for start in range(0, len(self) * self.batch_size, self.batch_size)]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        batches = self.batches()
+
+        if self.workers > 0:
+            return self._shared_batches(batches)
+
+        return prefetch((self.dataset.read_batch(indices) for indices in batches), self.prefetch_batches)
+
+    def _start_workers(self, sample: np.ndarray) -> None:
+        """
+        Start the worker processes and allocate the shared buffers, once for all the epochs.
+        :param sample: a sample of the dataset, giving the shape and type of the batches
+        :return: None
+        """
+        self.shape = (self.batch_size,) + sample.shape
+        self.dtype = sample.dtype
+        self.buffers = [
+            shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * sample.dtype.itemsize)
+            for _ in range(self.prefetch_batches + 1)
+        ]
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.dataset,))
+
+    def close(self) -> None:
+        """
+        Stop the worker processes and free the shared buffers.
+        :return: None
+        """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            for buffer in self.buffers:
+                buffer.close()
+                buffer.unlink()
+        self.executor = None
+        self.buffers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _shared_batches(self, batches: list) -> Iterator[np.ndarray]:
+        """
+        Read the batches in the worker processes.
+
+        There is one shared buffer per batch in flight plus the one used by the caller, a buffer is reused once the
+        caller asks for the next batch.
+        :param batches: list of arrays of sample indices
+        :return: iterator over the batches
+        """
+        if not batches:
+            return
+
+        if self.executor is None:
+            self._start_workers(self.dataset[0])
+
+        pending = []
+        try:
+            for number, indices in enumerate(batches):
+                buffer = self.buffers[number % len(self.buffers)]
+                pending.append(self.executor.submit(_load_batch, indices, buffer.name, self.shape, self.dtype.str))
+
+                if len(pending) > self.prefetch_batches:
+                    yield self._wait(pending.pop(0), number - self.prefetch_batches)
+
+            for number in range(len(batches) - len(pending), len(batches)):
+                yield self._wait(pending.pop(0), number)
+
+        finally:
+            # An epoch left early must not have workers writing in the buffers of the next one.
+            for future in pending:
+                future.cancel()
+            for future in pending:
+                if not future.cancelled():
+                    future.exception()
+
+    def _wait(self, future, number: int) -> np.ndarray:
+        """
+        Wait for a batch read by the workers.
+        :param future: future of the batch
+        :param number: number of the batch in the epoch
+        :return: view of the batch in its shared buffer
+        """
+        count = future.result()
+        buffer = self.buffers[number % len(self.buffers)]
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=buffer.buf)[:count]
@@ -7,12 +7,20 @@
 ----------------------------------------------------------------------------
 
 Python file used to define all the metrics used to evaluate the quality of the extracted motion vectors.
+
+The metrics are computed with TensorFlow by default, the "numpy" backend is opt-in. TensorFlow is only imported when a
+metric needs it, as importing it takes several seconds: the numpy backend never imports it unless ms_ssim is computed.
+The two backends give the same values, up to float rounding, except the total variation: TensorFlow computes it on the
+pixel values cast to int8, which wrap around, numpy on the pixel values.
+
+Every metric accepts a single frame or a batch of frames stacked on a leading axis, and returns one value per frame.
+MetricsBatch collects the inputs of several frames and evaluates each metric once on the whole batch.
 """
 
 import sys
 
+import cv2
 import numpy as np
-import tensorflow as tf
 
 from ..third_party.flowpy.flowpy import forward_warp
 
@@ -20,43 +28,105 @@ from ..third_party.flowpy.flowpy import forward_warp
 this_module = sys.modules[__name__]
 
 
-def cosine_similarity(original_mv: np.array, mv: np.array) -> np.array:
-    """ Cosine similarity call, based on tensorflow implementation.
+def _tensorflow():
+    """
+    Import TensorFlow on first use.
+    :return: the tensorflow module.
+    """
+    import tensorflow as tf
+    return tf
 
-    :param original_mv: Original motion vector.
-    :param mv: Motion vectors out of AV1.
-    :return: Tensor with the value of the cosine similarity (mean of the values on a batch).
+
+def _frame_mean(array: np.ndarray, frame_axes: int = 2) -> np.ndarray:
     """
+    Mean over the last axes of an array, the frame axes, giving one value per frame of a batch.
 
-    cosine_similarity_value = tf.reduce_mean(tf.keras.losses.cosine_similarity(original_mv, mv)).numpy()
-    return cosine_similarity_value
+    The frame axes are flattened so that a frame of a batch is reduced exactly as the same frame on its own.
+    :param array: array of one frame or of a batch of frames.
+    :param frame_axes: number of trailing axes of a frame.
+    :return: mean of each frame.
+    """
+    array = array.reshape(array.shape[:array.ndim - frame_axes] + (-1,))
+    return array.mean(axis=-1, dtype=array.dtype)
+
+
+def cosine_similarity(original_mv: np.array, mv: np.array, backend: str = "tensorflow") -> np.array:
+    """ Cosine similarity call, based on tensorflow implementation.
 
+    As in tf.keras.losses.cosine_similarity, the value is negated: -1 means that the vectors have the same direction.
 
-def end_point_error(motion_vectors: np.ndarray, ground_truth: np.ndarray) -> float:
+    :param original_mv: Original motion vector.
+    :param mv: Motion vectors out of AV1.
+    :param backend: "numpy" or "tensorflow".
+    :return: Tensor with the value of the cosine similarity (mean of the values on each frame).
+    """
+    if backend == "tensorflow":
+        tf = _tensorflow()
+        return tf.reduce_mean(tf.keras.losses.cosine_similarity(original_mv, mv), axis=[-2, -1]).numpy()
+
+    original_mv = np.asarray(original_mv, dtype=np.float32)
+    mv = np.asarray(mv, dtype=np.float32)
+
+    # The two components are handled separately and the temporaries reused, the norms are bounded as in
+    # tf.math.l2_normalize.
+    epsilon = np.float32(1e-12)
+    dot = original_mv[..., 0] * mv[..., 0]
+    dot += original_mv[..., 1] * mv[..., 1]
+    norm = original_mv[..., 0] * original_mv[..., 0]
+    norm += original_mv[..., 1] * original_mv[..., 1]
+    np.maximum(norm, epsilon, out=norm)
+    other_norm = mv[..., 0] * mv[..., 0]
+    other_norm += mv[..., 1] * mv[..., 1]
+    np.maximum(other_norm, epsilon, out=other_norm)
+    norm *= other_norm
+    np.sqrt(norm, out=norm)
+    np.divide(dot, norm, out=dot)
+    np.negative(dot, out=dot)
+
+    return _frame_mean(dot)
+
+
+def end_point_error(motion_vectors: np.ndarray, ground_truth: np.ndarray, backend: str = "tensorflow") -> float:
     """
     Compute the end-point error between the motion vectors and the ground truth.
     :param motion_vectors: motion vectors to evaluate.
     :param ground_truth: ground truth motion vectors.
+    :param backend: "numpy" or "tensorflow".
     :return: end-point error.
     """
-    epe = (tf.sqrt(tf.reduce_sum((motion_vectors - ground_truth) ** 2, axis=-1)))
-    px1 = tf.cast(epe < 1, dtype=tf.float32).numpy().mean()
-    px3 = tf.cast(epe < 3, dtype=tf.float32).numpy().mean()
-    px5 = tf.cast(epe < 5, dtype=tf.float32).numpy().mean()
-    epe = tf.reduce_mean(epe).numpy()
+    if backend == "tensorflow":
+        tf = _tensorflow()
+        epe = (tf.sqrt(tf.reduce_sum((motion_vectors - ground_truth) ** 2, axis=-1)))
+        px1 = tf.cast(epe < 1, dtype=tf.float32).numpy().mean(axis=(-2, -1))
+        px3 = tf.cast(epe < 3, dtype=tf.float32).numpy().mean(axis=(-2, -1))
+        px5 = tf.cast(epe < 5, dtype=tf.float32).numpy().mean(axis=(-2, -1))
+        epe = tf.reduce_mean(epe, axis=[-2, -1]).numpy()
+        return epe, px1, px3, px5
+
+    epe = np.sqrt(np.sum((motion_vectors - ground_truth) ** 2, axis=-1))
+    px1 = _frame_mean((epe < 1).astype(np.float32))
+    px3 = _frame_mean((epe < 3).astype(np.float32))
+    px5 = _frame_mean((epe < 5).astype(np.float32))
+    epe = _frame_mean(epe)
     return epe, px1, px3, px5
 
 
-def interpolation_error(motion_vectors: np.ndarray, current_frame: np.ndarray, next_frame: np.ndarray) -> float:
+def interpolation_error(
+    motion_vectors: np.ndarray,
+    current_frame: np.ndarray,
+    next_frame: np.ndarray,
+    warp_method: str = "kdtree"
+) -> float:
     """
     Compute the interpolation error between the motion vectors and the ground truth.
     :param motion_vectors: motion vectors to evaluate.
     :param current_frame: current frame.
     :param next_frame: next frame.
+    :param warp_method: forward warp method, "kdtree", "bilinear" or "gaussian" (see flowpy.forward_warp).
     :return: interpolation error.
     """
 
-    interpolated_frame = forward_warp(current_frame, motion_vectors)
+    interpolated_frame = forward_warp(current_frame, motion_vectors, method=warp_method)
 
     return np.square(np.subtract(next_frame, interpolated_frame)).mean()
 
@@ -68,31 +138,113 @@ def ms_ssim(original_frame: np.ndarray, encoded_frame: np.ndarray) -> float:
     :param encoded_frame: Frame encoded in AV1.
     :return: ms-ssim.
     """
-    return tf.image.ssim_multiscale(original_frame, encoded_frame, max_val=255).numpy()
+    return _tensorflow().image.ssim_multiscale(original_frame, encoded_frame, max_val=255).numpy()
 
 
-def psnr(original_frame: np.ndarray, encoded_frame: np.ndarray) -> float:
+def psnr(original_frame: np.ndarray, encoded_frame: np.ndarray, backend: str = "tensorflow") -> float:
     """
     Compute the peak signal-to-noise ratio between the current frame and the next frame.
     :param original_frame: Original Frame.
     :param encoded_frame: Frame encoded in AV1.
+    :param backend: "numpy" or "tensorflow".
     :return: psnr.
     """
-    return tf.image.psnr(original_frame, encoded_frame, max_val=255).numpy()
+    if backend == "tensorflow":
+        return _tensorflow().image.psnr(original_frame, encoded_frame, max_val=255).numpy()
+
+    difference = original_frame.astype(np.float32) - encoded_frame.astype(np.float32)
+    mse = _frame_mean(np.square(difference), frame_axes=3)
+    with np.errstate(divide="ignore"):
+        return np.float32(20 * np.log10(255.) - 10 * np.log10(mse))
 
 
-def total_variation(frame: np.ndarray) -> float:
+def total_variation(frame: np.ndarray, backend: str = "tensorflow") -> float:
     """
     Compute the total variation of the motion vectors.
 
     Total Variation can be used as a metric to compute the complexity of a frame. It measures the amount of variation in
      pixel intensity, which can be an indicator of texture or edge complexity.
 
+    The tensorflow backend computes it on int8 tensors, the numpy backend computes it on the pixel values without
+    overflow.
+
     :param frame: motion vectors to evaluate.
+    :param backend: "numpy" or "tensorflow".
     :return: total variation.
     """
-    tensor = tf.convert_to_tensor(frame, dtype="int8")
-    return tf.image.total_variation(tensor).numpy()
+    if backend == "tensorflow":
+        tf = _tensorflow()
+        tensor = tf.convert_to_tensor(frame, dtype="int8")
+        return tf.image.total_variation(tensor).numpy()
+
+    frame = np.asarray(frame)
+    if frame.dtype != np.uint8:
+        frame = frame.astype(np.float64)
+
+    # Each frame is seen as one image of its rows, its channels interleaved: a pixel and its right neighbour are
+    # channels apart. cv2 gives the absolute differences without widening the pixels, and sums them exactly.
+    height, width, channels = frame.shape[-3:]
+    images = np.ascontiguousarray(frame).reshape(-1, height, width * channels)
+    values = np.empty(len(images), dtype=np.int64 if frame.dtype == np.uint8 else np.float64)
+    for index, image in enumerate(images):
+        vertical = cv2.sumElems(cv2.absdiff(image[1:], image[:-1]))[0]
+        horizontal = cv2.sumElems(cv2.absdiff(image[:, channels:], image[:, :-channels]))[0]
+        values[index] = vertical + horizontal
+
+    return values.reshape(frame.shape[:-3])
+
+
+def compute_batch_metrics(
+    list_metrics: list,
+    original: np.ndarray,
+    previous: np.ndarray,
+    tested: np.ndarray,
+    mv_original: np.ndarray,
+    mv: np.ndarray,
+    warp_method: str = "kdtree",
+    backend: str = "tensorflow"
+) -> list:
+    """
+    Compute metrics on a batch of frames, each metric is evaluated once on the whole batch.
+
+    :param list_metrics: list of metrics to compute.
+    :param original: (n, h, w, 3) original frames, from the original video.
+    :param previous: (n, h, w, 3) previous frames from the original video.
+    :param tested: (n, h, w, 3) encoded frames.
+    :param mv_original: (n, h, w, 2) ground truth motion vectors.
+    :param mv: (n, h, w, 2) motion vectors out of AV1.
+    :param warp_method: forward warp method used by the interpolation error.
+    :param backend: "numpy" or "tensorflow", backend of the metrics having both implementations.
+    :return: list of columns, each holding the n values of a csv column.
+    """
+    columns = []
+
+    for metric in list_metrics:
+
+        metric_func = getattr(this_module, metric)
+
+        if metric == "total_variation":
+            value = [metric_func(original, backend)]
+
+        elif metric == "end_point_error":
+            value = metric_func(mv, mv_original, backend)
+
+        elif metric == "cosine_similarity":
+            value = [metric_func(mv, mv_original, backend)]
+
+        elif metric == "interpolation_error":
+            # The forward warp works on one frame at a time.
+            value = [[metric_func(*frame, warp_method) for frame in zip(mv, original, previous)]]
+
+        elif metric == "ms_ssim":
+            value = [metric_func(original, tested)]
+
+        else:
+            value = [metric_func(original, tested, backend)]
+
+        columns += value
+
+    return columns
 
 
 def compute_metrics(
@@ -102,7 +254,9 @@ def compute_metrics(
     tested: np.array,
     mv_original: np.array,
     mv: np.array,
-    row: list
+    row: list,
+    warp_method: str = "kdtree",
+    backend: str = "tensorflow"
 ) -> list:
     """
     Compute metrics based on a list of metrics
@@ -114,29 +268,109 @@ def compute_metrics(
     :param mv_original: motion vectors out of AV1.
     :param mv: ground truth motion vectors.
     :param row: the current csv row to complete.
+    :param warp_method: forward warp method used by the interpolation error.
+    :param backend: "numpy" or "tensorflow", backend of the metrics having both implementations.
     :return: list of values out of the computed metrics.
 
     """
+    inputs = (original, previous, tested, mv_original, mv)
+    batch = [None if array is None else np.asarray(array)[None] for array in inputs]
+    columns = compute_batch_metrics(list_metrics, *batch, warp_method, backend)
 
-    for metric in list_metrics:
-
-        metric_func = getattr(this_module, metric)
-
-        if metric == "total_variation":
-            value = [metric_func(original)]
-
-        elif metric == "end_point_error":
-            value = metric_func(mv, mv_original)
+    row += [column[0] for column in columns]
 
-        elif metric == "cosine_similarity":
-            value = [metric_func(mv, mv_original)]
+    return row
 
-        elif metric == "interpolation_error":
-            value = [metric_func(mv, original, previous)]
 
-        else:
-            value = [metric_func(original, tested)]
+class MetricsBatch:
+    """
+    Collect the inputs of the metrics frame by frame and evaluate them by batches.
 
-        row += value
+    The inputs are copied in buffers allocated once for batch_size frames, so the memory used does not grow with the
+    length of the video. The rows are returned in the order the frames were added.
+    """
 
-    return row
+    def __init__(
+        self,
+        list_metrics: list,
+        batch_size: int = 4,
+        warp_method: str = "kdtree",
+        backend: str = "tensorflow"
+    ):
+        """
+        :param list_metrics: list of metrics to compute.
+        :param batch_size: number of frames evaluated at once.
+        :param warp_method: forward warp method used by the interpolation error.
+        :param backend: "numpy" or "tensorflow", backend of the metrics having both implementations.
+        """
+        self.list_metrics = list_metrics
+        self.batch_size = max(1, batch_size)
+        self.warp_method = warp_method
+        self.backend = backend
+        self.buffers = None
+        self.frame_numbers = []
+
+    def __len__(self) -> int:
+        return len(self.frame_numbers)
+
+    def add(
+        self,
+        frame_number: int,
+        original: np.ndarray,
+        previous: np.ndarray,
+        tested: np.ndarray,
+        mv_original: np.ndarray,
+        mv: np.ndarray
+    ) -> list:
+        """
+        Add the inputs of a frame to the batch, the batch is evaluated once it is full.
+        :param frame_number: frame number, first column of the csv row.
+        :param original: original frame, from the original video.
+        :param previous: previous frame from the original video.
+        :param tested: encoded frame.
+        :param mv_original: ground truth motion vectors.
+        :param mv: motion vectors out of AV1.
+        :return: list of the csv rows of the batch if it was evaluated, empty list otherwise.
+        """
+        inputs = (original, previous, tested, mv_original, mv)
+
+        if self.buffers is None:
+            self.buffers = [
+                None if array is None else np.empty((self.batch_size,) + np.shape(array), dtype=np.asarray(array).dtype)
+                for array in inputs
+            ]
+
+        index = len(self.frame_numbers)
+        for buffer, array in zip(self.buffers, inputs):
+            if buffer is not None:
+                buffer[index] = array
+        self.frame_numbers.append(frame_number)
+
+        if len(self.frame_numbers) == self.batch_size:
+            return self.flush()
+
+        return []
+
+    def flush(self) -> list:
+        """
+        Evaluate the frames waiting in the batch.
+        :return: list of the csv rows of the frames, in the order they were added.
+        """
+        count = len(self.frame_numbers)
+        if count == 0:
+            return []
+
+        columns = compute_batch_metrics(
+            self.list_metrics,
+            *[None if buffer is None else buffer[:count] for buffer in self.buffers],
+            self.warp_method,
+            self.backend
+        )
+
+        rows = [
+            [frame_number] + [column[index] for column in columns]
+            for index, frame_number in enumerate(self.frame_numbers)
+        ]
+        self.frame_numbers = []
+
+        return rows
@@ -0,0 +1,211 @@
+"""
+ profiling.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Instrumentation of the stages of the pipeline and of the steps of the frame loop.
+
+A Profiler accumulates, for every named stage, the number of calls, the wall time, the CPU time and the peak RSS of
+the process, as well as named counters such as the bytes written. The CPU time is the one of the calling thread plus
+the one of the child processes that ended during the stage, such as the encoder. The child processes and the peak RSS
+are measured for the whole process: the CPU time counts the children of all its threads that ended during the stage,
+and the peak RSS is the largest since the process started, not the one of the stage. The report states it.
+
+When the profiler is off, a stage is a shared no-op context manager, so the instrumentation can stay in the frame
+loop. The "cprofile" and "tracemalloc" modes also profile the python functions, or the memory allocations, of the
+process between start and stop.
+
+The report of a video is written as a json file and a csv file, next to the .prof file of cProfile.
+"""
+
+import cProfile
+import csv
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+
+PROFILE_MODES = ("off", "time", "cprofile", "tracemalloc")
+
+_NO_STAGE = nullcontext()
+
+# Description of the measures of a stage, written with the report.
+COLUMNS = {
+    "calls": "number of times the stage ran",
+    "wall": "wall time of the stage, in seconds",
+    "cpu": "CPU time of the calling thread during the stage, plus the CPU time of the child processes of the whole "
+           "process that ended during the stage (RUSAGE_CHILDREN), in seconds",
+    "peak_rss": "largest peak RSS of the whole process since it started (ru_maxrss of RUSAGE_SELF) at the end of a "
+                "call of the stage, in bytes",
+}
+
+
+def _children_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss() -> int:
+    # ru_maxrss is in kilobytes on linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """
+    Named timers and counters, shared by the threads of a video.
+
+    A profiler sent to another process starts empty there, its measures are brought back with snapshot and merge.
+    """
+
+    def __init__(self, mode: str = "off"):
+        """
+        :param mode: "off", "time" for the timers and counters, "cprofile" or "tracemalloc" to also profile the
+        functions or the allocations
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode should be one of {PROFILE_MODES}, not {mode}")
+
+        self.mode = mode
+        self.enabled = mode != "off"
+        self.stages = {}
+        self.counters = {}
+        self.allocations = []
+        self.lock = threading.Lock()
+        self._profile = None
+
+    def __getstate__(self) -> dict:
+        return {"mode": self.mode}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["mode"])
+
+    def stage(self, name: str):
+        """
+        Measure a stage, used as a context manager.
+        :param name: name of the stage
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NO_STAGE
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        children_cpu = _children_cpu_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu + _children_cpu_time() - children_cpu
+            self._add(name, 1, wall, cpu, _peak_rss())
+
+    def _add(self, name: str, calls: int, wall: float, cpu: float, peak_rss: int) -> None:
+        with self.lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "wall": 0., "cpu": 0., "peak_rss": 0})
+            stage["calls"] += calls
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+            stage["peak_rss"] = max(stage["peak_rss"], peak_rss)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increase a counter.
+        :param name: name of the counter
+        :param value: increment
+        :return: None
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+        :return: copy of the measures, to merge into another profiler
+        """
+        with self.lock:
+            return {
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """
+        Add the measures of another profiler, such as the one of a worker process.
+        :param snapshot: result of snapshot
+        :return: None
+        """
+        for name, stage in snapshot["stages"].items():
+            self._add(name, stage["calls"], stage["wall"], stage["cpu"], stage["peak_rss"])
+        for name, value in snapshot["counters"].items():
+            self.count(name, value)
+
+    def start(self) -> None:
+        """
+        Start profiling the functions or the allocations of the process, depending on the mode.
+        :return: None
+        """
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "tracemalloc":
+            tracemalloc.start()
+
+    def stop(self, top: int = 20) -> None:
+        """
+        Stop profiling, the largest allocation sites are kept for the report.
+        :param top: number of allocation sites kept
+        :return: None
+        """
+        if self._profile is not None:
+            self._profile.disable()
+        elif self.mode == "tracemalloc" and tracemalloc.is_tracing():
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            self.allocations = [
+                {"site": str(statistic.traceback), "size": statistic.size, "count": statistic.count}
+                for statistic in statistics[:top]
+            ]
+            self.counters["tracemalloc_peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def write(self, directory: str, name: str) -> None:
+        """
+        Write the report, as {name}.json and {name}.csv, and {name}.prof in cprofile mode.
+        :param directory: directory of the report
+        :param name: base name of the files
+        :return: None
+        """
+        if not self.enabled:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+
+        with open(os.path.join(directory, f"{name}.json"), "w") as file:
+            json.dump(dict(mode=self.mode, columns=COLUMNS, allocations=self.allocations, **snapshot), file, indent=2)
+
+        # The process-wide measures are named as such in the csv, whose columns have no description.
+        with open(os.path.join(directory, f"{name}.csv"), "w") as file:
+            csv_writer = csv.writer(file, delimiter=",")
+            csv_writer.writerow(
+                ["kind", "name", "calls", "wall", "thread_and_process_children_cpu", "process_peak_rss", "value"]
+            )
+            for stage_name, stage in snapshot["stages"].items():
+                csv_writer.writerow(
+                    ["stage", stage_name, stage["calls"], stage["wall"], stage["cpu"], stage["peak_rss"], ""]
+                )
+            for counter_name, value in snapshot["counters"].items():
+                csv_writer.writerow(["counter", counter_name, "", "", "", "", value])
+
+        if self._profile is not None:
+            self._profile.dump_stats(os.path.join(directory, f"{name}.prof"))
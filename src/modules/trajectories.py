@@ -0,0 +1,155 @@
+"""
+ trajectories.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Accumulation of the projected motion fields of consecutive frames into long range displacement fields.
+
+The projected field of a frame gives, for every pixel, its displacement to the previous frame. The displacement of a
+pixel k frames back is the displacement to the previous frame, plus the displacement of the previous frame k-1 frames
+back, sampled where the pixel lands: the accumulated fields of the previous frame are backward warped by the new field.
+
+The accumulated fields of the last frames are kept in a window allocated once. The field leading back to a frame
+stays in the same slot of the window while the frames go by, so a new frame costs one cv2.remap over all the slots at
+once, one addition, and the reuse of the slot of the frame leaving the window. The memory does not depend on the
+length of the video.
+
+The fields stay finite, the pixels whose trajectory leaves the frame are tracked by a validity map warped with them
+and are only set to NaN in the fields given out. A NaN in the warped fields would spread to all the pixels sampling
+it, even with a weight of 0, and the invalid regions would grow by a pixel at every frame.
+"""
+
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+
+# cv2.remap interpolates with weights in steps of 1/32 along each axis: a pixel with an invalid sample has a validity
+# of at most 1 - 1/1024, a pixel with only valid samples a validity of 1 up to rounding.
+VALID = 1 - 1 / 2048
+
+
+class TrajectoryAccumulator:
+    """
+    Rolling window of the displacement fields from the last frame to each of the window frames before it.
+
+    The frames are added in the order of the frame loop, the fields lead back to the frames added before.
+    """
+
+    def __init__(self, height: int, width: int, window: int = 8):
+        """
+        :param height: height of the fields
+        :param width: width of the fields
+        :param window: number of frames the fields lead back to
+        """
+        self.height = height
+        self.width = width
+        self.window = max(1, window)
+        self.frames = 0
+
+        # Two windows used in turn, the warped fields are written into the one not read. The validity of each field is
+        # 1 where its trajectory stays in the frame.
+        self.slots = np.zeros((height, width, self.window, 2), dtype=np.float32)
+        self.valid = np.zeros((height, width, self.window), dtype=np.float32)
+        self._warped = np.zeros_like(self.slots)
+        self._warped_valid = np.zeros_like(self.valid)
+
+        self._grid_x = np.arange(width, dtype=np.float32)[np.newaxis, :]
+        self._grid_y = np.arange(height, dtype=np.float32)[:, np.newaxis]
+        self._map_x = np.empty((height, width), dtype=np.float32)
+        self._map_y = np.empty((height, width), dtype=np.float32)
+
+    @property
+    def depth(self) -> int:
+        """
+        :return: number of frames the fields currently lead back to
+        """
+        return min(self.frames, self.window)
+
+    def reset(self) -> None:
+        """
+        Forget the previous frames, for instance after a scene cut.
+        :return: None
+        """
+        self.frames = 0
+        self.valid.fill(0)
+
+    def update(self, projection: np.ndarray) -> None:
+        """
+        Add the projected field of the next frame.
+        :param projection: (height, width, 2) displacement of the pixels of the frame to the previous frame, x then y
+        :return: None
+        """
+        projection = np.ascontiguousarray(projection, dtype=np.float32)
+
+        if self.frames > 0:
+            np.add(self._grid_x, projection[..., 0], out=self._map_x)
+            np.add(self._grid_y, projection[..., 1], out=self._map_y)
+
+            # The channels of all the slots are warped at once, then their validity, which is 0 outside of the frame.
+            for source, destination in ((self.slots, self._warped), (self.valid, self._warped_valid)):
+                cv2.remap(
+                    source.reshape(self.height, self.width, -1),
+                    self._map_x,
+                    self._map_y,
+                    cv2.INTER_LINEAR,
+                    dst=destination.reshape(self.height, self.width, -1),
+                    borderMode=cv2.BORDER_CONSTANT,
+                    borderValue=0
+                )
+            # Seen as complex numbers, the displacements are added to all the slots with one broadcast over the slots.
+            self._warped.view(np.complex64)[..., 0] += projection.view(np.complex64)
+            self.slots, self._warped = self._warped, self.slots
+            self.valid, self._warped_valid = self._warped_valid, self.valid
+
+        # The slot of the frame leaving the window now leads to the previous frame.
+        slot = self.frames % self.window
+        finite = np.isfinite(projection).all(axis=-1)
+        self.slots[:, :, slot] = np.where(finite[..., np.newaxis], projection, 0)
+        self.valid[:, :, slot] = finite
+        self.frames += 1
+
+    def field(self, distance: int = None) -> np.ndarray:
+        """
+        Get the displacement field from the last frame to a previous frame.
+        :param distance: number of frames back, from 1 to depth, depth if None
+        :return: (height, width, 2) field, NaN where the trajectory leaves the frame
+        """
+        if distance is None:
+            distance = self.depth
+        if not 1 <= distance <= self.depth:
+            raise ValueError(f"distance should be between 1 and {self.depth}, not {distance}")
+
+        slot = (self.frames - distance) % self.window
+        return np.where(self.valid[:, :, slot, np.newaxis] >= VALID, self.slots[:, :, slot], np.float32(np.nan))
+
+    def fields(self) -> np.ndarray:
+        """
+        Get all the displacement fields, from the previous frame to the furthest one.
+        :return: (depth, height, width, 2) fields, NaN where the trajectories leave the frame
+        """
+        order = (self.frames - np.arange(1, self.depth + 1)) % self.window
+        fields = np.where(self.valid[:, :, order, np.newaxis] >= VALID, self.slots[:, :, order], np.float32(np.nan))
+        return np.moveaxis(fields, 2, 0)
+
+
+def trajectories(fields: Iterator[tuple], window: int = 8) -> Iterator[tuple]:
+    """
+    Accumulate the projected fields given by motion_fields.motion_fields, one frame at a time.
+    :param fields: iterator over (frame id, motion field, projected motion field, reference map)
+    :param window: number of frames the fields lead back to
+    :return: iterator over (frame id, accumulator), the accumulator being updated in place for each frame
+    """
+    accumulator = None
+
+    for frame_id, _, projection, _ in fields:
+        if accumulator is None:
+            accumulator = TrajectoryAccumulator(projection.shape[0], projection.shape[1], window)
+
+        accumulator.update(projection)
+
+        yield frame_id, accumulator
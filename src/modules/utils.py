@@ -15,7 +15,7 @@ import os
 import csv
 import numpy as np
 
-from ..third_party import flowpy
+from .flow_io import read_flow
 
 
 def get_paths(directory: str) -> list:
@@ -69,7 +69,7 @@ def read_flo(flo_path) -> np.array:
     :return: a numpy array
     """
 
-    flo_map = flowpy.flow_read(flo_path)
+    flo_map = read_flow(flo_path)
     return flo_map
 
 
@@ -91,3 +91,49 @@ def write_csv(output_path: str, row: list) -> None:
     with open(f"{output_path}/log_metrics.csv", 'a') as csv_file:
         csv_writer = csv.writer(csv_file, delimiter=',')
         csv_writer.writerow(row)
+
+
+def frame_range(total_frames: int, start: int = 0, end: int = None, shard: str = None, forward: bool = False) -> tuple:
+    """
+    Get the frames of a run, as a range of cursors.
+
+    The frames are selected by frame id, their number in the original video, so a range gives the same frames with
+    and without forward. The first frame has no motion, it is never processed.
+    :param total_frames: number of frames in the json file
+    :param start: first frame id
+    :param end: frame id after the last one, the end of the video if None
+    :param shard: "i/N" to only keep the i-th of N contiguous parts of the range, counted from 0, None to keep it all
+    :param forward: whether the video was reversed to get the forward motion vectors
+    :return: first cursor and cursor after the last one
+    """
+    low = max(start, 1)
+    high = total_frames - 1 if end is None else min(end, total_frames - 1)
+    high = max(high, low)
+
+    if shard is not None:
+        index, count = (int(value) for value in shard.split("/"))
+        if not 0 <= index < count:
+            raise ValueError(f"shard should be i/N with 0 <= i < N, not {shard}")
+        size = high - low
+        low, high = low + size * index // count, low + size * (index + 1) // count
+
+    if forward:
+        return total_frames - high, total_frames - low
+
+    return low, high
+
+
+def range_suffix(total_frames: int, first: int, stop: int, forward: bool = False) -> str:
+    """
+    Get the suffix naming the outputs of a part of a video, after its first and last frame ids.
+    :param total_frames: number of frames in the json file
+    :param first: first cursor of the range
+    :param stop: cursor after the last one
+    :param forward: whether the video was reversed to get the forward motion vectors
+    :return: "_{first id}_{last id}", empty for the whole video
+    """
+    if (first, stop) == (1, total_frames - 1):
+        return ""
+
+    low, high = (total_frames - stop, total_frames - 1 - first) if forward else (first, stop - 1)
+    return f"_{low:06d}_{high:06d}"
@@ -0,0 +1,159 @@
+"""
+ writer.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Writers for the PNG and NPY outputs of the frame loop.
+
+Every write is tagged with the kind of output it belongs to, so that outputs can be switched off. The asynchronous
+writer hands the writes to a pool of threads through a bounded queue: the frame loop only waits when the queue is
+full, and the errors are reported when the writer is closed.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .profiling import Profiler
+
+
+OUTPUTS = ("png", "npy", "stack", "dataset")
+
+
+def _imwrite(path: str, image: np.ndarray) -> None:
+    if not cv2.imwrite(path, image):
+        raise OSError(f"Could not write {path}")
+
+
+class OutputWriter:
+    """
+    Synchronous writer, the disabled outputs are skipped.
+    """
+
+    def __init__(self, outputs=OUTPUTS, profiler: Profiler = None):
+        """
+        :param outputs: kinds of output to write, among OUTPUTS
+        :param profiler: profiler measuring the writes and the bytes written, none if None
+        """
+        self.outputs = set(outputs)
+        self.profiler = profiler if profiler is not None else Profiler()
+
+    def enabled(self, output: str) -> bool:
+        """
+        Check if a kind of output is written.
+        :param output: kind of output
+        :return: whether the output is written
+        """
+        return output in self.outputs
+
+    def imwrite(self, output: str, path: str, image: np.ndarray) -> None:
+        """
+        Write an image.
+        :param output: kind of output
+        :param path: path of the image
+        :param image: image to write
+        :return: None
+        """
+        if self.enabled(output):
+            self._write(_imwrite, path, image)
+
+    def save(self, output: str, path: str, array: np.ndarray) -> None:
+        """
+        Save an array in a .npy file.
+        :param output: kind of output
+        :param path: path of the .npy file
+        :param array: array to save
+        :return: None
+        """
+        if self.enabled(output):
+            self._write(np.save, path, array)
+
+    def _write(self, function, path: str, data: np.ndarray) -> None:
+        self._run(function, path, data)
+
+    def _run(self, function, path: str, data: np.ndarray) -> None:
+        if not self.profiler.enabled:
+            function(path, data)
+            return
+
+        with self.profiler.stage("write"):
+            function(path, data)
+        self.profiler.count("bytes_written", os.path.getsize(path))
+        self.profiler.count("files_written")
+
+    def flush(self) -> None:
+        """
+        Wait for the pending writes, the writer can still be used.
+        :return: None
+        """
+
+    def close(self) -> None:
+        """
+        Wait for the pending writes.
+        :return: None
+        """
+
+
+class AsyncOutputWriter(OutputWriter):
+    """
+    Writer running the writes in a pool of threads.
+
+    The arrays given to the writer must not be modified afterwards, they are written later.
+    """
+
+    def __init__(self, outputs=OUTPUTS, workers: int = 4, max_pending: int = 64, profiler: Profiler = None):
+        """
+        :param outputs: kinds of output to write, among OUTPUTS
+        :param workers: number of writing threads
+        :param max_pending: maximum number of writes waiting in the queue before the caller is blocked
+        :param profiler: profiler measuring the writes and the bytes written, none if None
+        """
+        super().__init__(outputs, profiler)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.errors = []
+
+    def _write(self, function, path: str, data: np.ndarray) -> None:
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self._run, function, path, data)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._done)
+
+    def _done(self, future) -> None:
+        # The error is recorded before the slot is released, so that flush sees it.
+        if future.exception() is not None:
+            self.errors.append(future.exception())
+        self.slots.release()
+
+    def flush(self) -> None:
+        """
+        Wait for the pending writes and raise an error if some of them failed, the writer can still be used.
+        :return: None
+        """
+        for _ in range(self.max_pending):
+            self.slots.acquire()
+        for _ in range(self.max_pending):
+            self.slots.release()
+
+        if self.errors:
+            raise OSError(f"{len(self.errors)} outputs could not be written, first error: {self.errors[0]}")
+
+    def close(self) -> None:
+        """
+        Wait for the pending writes and raise an error if some of them failed.
+        :return: None
+        """
+        self.executor.shutdown(wait=True)
+
+        if self.errors:
+            raise OSError(f"{len(self.errors)} outputs could not be written, first error: {self.errors[0]}")
@@ -0,0 +1,282 @@
+"""
+ motion_container.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Compact binary container for the data extracted by AOM inspection tool.
+
+The json file is converted once into a columnar file holding, for every frame, the motion vectors of the blocks as
+int16, the reference frames of the blocks as uint8 and the reference frame numbers (read from the bitstream or
+simulated, see json_processing.FrameReferences). The projected motion field is not stored, the frame loop recomputes
+it from these arrays with block_motion_vectors. The file starts with a magic number and a json header giving the
+number of frames, the size of the block grid, the GOP parameters and the position of every array. The arrays are aligned so that they can be memory-mapped and read without any copy.
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+from .json_processing import FrameReferences
+from .json_processing import block_motion_vectors
+from .json_processing import count_json_frames
+from .json_processing import frame_block_arrays
+from .json_processing import iter_json_frames
+from .json_processing import upsample_motion_vectors
+
+
+MAGIC = b"AV1MVC01"
+ALIGNMENT = 64
+VERSION = 2
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _layout(frame_count: int, block_rows: int, block_cols: int) -> dict:
+    """
+    Describe the arrays stored in the container.
+    :param frame_count: number of frames
+    :param block_rows: number of rows of blocks
+    :param block_cols: number of columns of blocks
+    :return: dictionary giving the dtype and the shape of each array
+    """
+    return {
+        "valid": ("uint8", (frame_count,)),
+        "motion_vectors": ("int16", (frame_count, block_rows, block_cols, 2)),
+        "reference_frames": ("uint8", (frame_count, block_rows, block_cols)),
+        "reference_numbers": ("int32", (frame_count, 8)),
+    }
+
+
+def _write_header(file, header: dict) -> None:
+    """
+    Compute the offsets of the arrays and write the header at the beginning of the file.
+    :param file: file opened in binary mode
+    :param header: header of the container, without the offsets
+    :return: None
+    """
+    arrays = _layout(header["frame_count"], header["block_rows"], header["block_cols"])
+
+    # The header size depends on the offsets it contains, reserve enough space for the offset digits.
+    header["arrays"] = {name: {"dtype": dtype, "shape": shape, "offset": 0} for name, (dtype, shape) in arrays.items()}
+    offset = _align(len(MAGIC) + 4 + len(json.dumps(header)) + 32 * len(arrays))
+
+    for name, (dtype, shape) in arrays.items():
+        header["arrays"][name]["offset"] = offset
+        offset = _align(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+    encoded_header = json.dumps(header).encode("utf-8")
+
+    file.write(MAGIC)
+    file.write(struct.pack("<I", len(encoded_header)))
+    file.write(encoded_header)
+    file.truncate(offset)
+
+
+def read_header(container_file: str) -> dict:
+    """
+    Read the header of a container.
+    :param container_file: path of the container
+    :return: dictionary containing the header
+    """
+    with open(container_file, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{container_file} is not a motion vector container")
+        header_size, = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(header_size).decode("utf-8"))
+    return header
+
+
+def convert_json(json_file: str, container_file: str, gop: int) -> dict:
+    """
+    Convert the json file generated by AOM inspection tool into a container.
+
+    The json file is streamed, so only one frame is decoded at a time. The container is written to a temporary file
+    and renamed at the end, an interrupted conversion never leaves a partial container behind.
+    :param json_file: json file to convert
+    :param container_file: path of the container to create
+    :param gop: gop size used during encoding
+    :return: header of the created container
+    """
+    frame_count = count_json_frames(json_file)
+
+    block_rows, block_cols = 0, 0
+    for frame_data in iter_json_frames(json_file):
+        if frame_data is not None:
+            block_rows, block_cols = len(frame_data["referenceFrame"]), len(frame_data["referenceFrame"][0])
+            break
+
+    header = {
+        "version": VERSION,
+        "frame_count": frame_count,
+        "block_rows": block_rows,
+        "block_cols": block_cols,
+        "block_size": 4,
+        "gop": int(gop),
+        "keyframe": 0,
+    }
+
+    tmp_file = f"{container_file}.tmp"
+    with open(tmp_file, "wb") as file:
+        _write_header(file, header)
+
+    arrays = _map_arrays(tmp_file, header, mode="r+")
+
+    frame_references = FrameReferences(gop, frame_count)
+
+    for cursor, frame_data in enumerate(iter_json_frames(json_file)):
+
+        if frame_data is None:
+            continue
+
+        references = frame_references.resolve(frame_data, cursor)
+        arrays["reference_numbers"][cursor] = references
+
+        motion_vectors, reference_frames = frame_block_arrays(frame_data)
+        arrays["valid"][cursor] = 1
+        arrays["motion_vectors"][cursor] = motion_vectors
+        arrays["reference_frames"][cursor] = reference_frames
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    os.replace(tmp_file, container_file)
+
+    return header
+
+
+def _map_arrays(container_file: str, header: dict, mode: str = "r") -> dict:
+    """
+    Memory-map all the arrays of a container.
+    :param container_file: path of the container
+    :param header: header of the container
+    :param mode: mode used to open the file
+    :return: dictionary of memory-mapped arrays
+    """
+    return {
+        name: np.memmap(
+            container_file,
+            dtype=array["dtype"],
+            mode=mode,
+            offset=array["offset"],
+            shape=tuple(array["shape"])
+        )
+        for name, array in header["arrays"].items()
+    }
+
+
+class MotionContainer:
+    """
+    Read-only access to a motion vector container.
+
+    The arrays are memory-mapped, the block level data of a frame is returned as views on the file.
+    """
+
+    def __init__(self, container_file: str):
+        self.header = read_header(container_file)
+        self.arrays = _map_arrays(container_file, self.header)
+
+    def __len__(self) -> int:
+        return self.header["frame_count"]
+
+    def frame(self, frame_number: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the block level data of a frame.
+        :param frame_number: Frame number
+        :return: the (h, w, 2) motion vectors and the (h, w) reference frames of the blocks
+        """
+        return self.arrays["motion_vectors"][frame_number], self.arrays["reference_frames"][frame_number]
+
+    def reference_dict(self, frame_number: int) -> dict:
+        """
+        Get the mapping of the reference frames of a frame.
+        :param frame_number: Frame number
+        :return: dictionary of frame number for the reference frames
+        """
+        return dict(enumerate(self.arrays["reference_numbers"][frame_number].tolist()))
+
+    def get_block_motion_vectors(self, frame_number: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the motion vectors, projected motion vectors and reference frames of a frame at block resolution.
+        :param frame_number: Frame number
+        :return: (h, w, 2) motion field, (h, w, 2) projected field and (h, w, 1) reference map
+        """
+        motion_vectors, reference_frames = self.frame(frame_number)
+        return block_motion_vectors(motion_vectors, reference_frames, self.reference_dict(frame_number), frame_number)
+
+    def get_frame_motion_vectors(self, frame_number: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the motion vector maps of a frame at pixel resolution, same as json_processing.get_frame_motion_vectors.
+        :param frame_number: Frame number
+        :return: motion field, projected motion field and reference map
+        """
+        return upsample_motion_vectors(*self.get_block_motion_vectors(frame_number))
+
+
+def _directory_size(directory: str) -> int:
+    size = 0
+    for directory_path, _, filenames in os.walk(directory):
+        size += sum(os.path.getsize(os.path.join(directory_path, filename)) for filename in filenames)
+    return size
+
+
+def compare_layouts(json_file: str, container_file: str, results_directory: str = None) -> dict:
+    """
+    Compare the size and the loading time of the container against the json file and the .npy files.
+    :param json_file: json file generated by AOM inspection tool
+    :param container_file: container converted from the json file
+    :param results_directory: optional output/results/{name} folder holding the .npy files
+    :return: dictionary of sizes in bytes and loading times in seconds
+    """
+    report = {
+        "json_size": os.path.getsize(json_file),
+        "container_size": os.path.getsize(container_file),
+    }
+
+    start = time.perf_counter()
+    for _ in iter_json_frames(json_file):
+        pass
+    report["json_load_time"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    container = MotionContainer(container_file)
+    for cursor in range(len(container)):
+        motion_vectors, reference_frames = container.frame(cursor)
+        motion_vectors.sum(), reference_frames.sum()
+    report["container_load_time"] = time.perf_counter() - start
+
+    if results_directory is not None:
+        npy_files = []
+        for folder in ("npy/mv", "npy/mv_proj", "stack"):
+            folder = os.path.join(results_directory, folder)
+            npy_files += [os.path.join(folder, file) for file in sorted(os.listdir(folder))]
+
+        report["npy_size"] = _directory_size(os.path.join(results_directory, "npy"))
+        report["npy_size"] += _directory_size(os.path.join(results_directory, "stack"))
+
+        start = time.perf_counter()
+        for npy_file in npy_files:
+            np.load(npy_file)
+        report["npy_load_time"] = time.perf_counter() - start
+
+    return report
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 3:
+        print("usage: python -m src.motion_container <json_file> <container_file> [results_directory]")
+        exit()
+
+    for key, value in compare_layouts(*sys.argv[1:4]).items():
+        print(f"{key}: {value}")
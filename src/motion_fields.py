@@ -0,0 +1,152 @@
+"""
+ motion_fields.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Library access to the motion fields of a video, without going through main nor the filesystem.
+
+motion_fields takes the output of AOM inspection tool already in memory, the list given by json.load or any iterable
+of frame dictionaries such as iter_json_frames, or a MotionContainer, and yields the motion field, the projected
+motion field and the reference map of every frame, as main computes them. The maps are BlockField views: np.asarray
+gives the pixel resolution array, .blocks the block resolution one, and nothing is upsampled until it is asked for.
+
+The outputs of main are optional consumers of this iterator, write_fields writes the pngs and the npy files of main
+and yields the fields on, so that the consumers can be chained.
+"""
+
+import os
+from typing import Iterator
+
+from .json_processing import FrameReferences
+from .json_processing import block_motion_vectors
+from .json_processing import frame_block_arrays
+from .modules.block_field import block_fields
+from .modules.flow_color import field_to_rgb
+from .modules.writer import OutputWriter
+from .motion_container import MotionContainer
+
+
+def _total_frames(frames, total_frames: int = None) -> int:
+    if total_frames is not None:
+        return total_frames
+    if not hasattr(frames, "__len__"):
+        raise ValueError("total_frames is needed when the frames are given by an iterator")
+    if isinstance(frames, MotionContainer):
+        return len(frames)
+    # The inspector ends its array with null, an in-memory list of frames may not.
+    return len(frames) + (len(frames) > 0 and frames[-1] is not None)
+
+
+def block_motion(frames, gop, total_frames: int = None, first: int = 1) -> Iterator[tuple]:
+    """
+    Read the block level motion of the frames in order and resolve their reference frames.
+    :param frames: frames of the inspector from the first one, as frame dictionaries, or a MotionContainer
+    :param gop: gop size used during encoding
+    :param total_frames: number of elements of the inspector output, the trailing null included. Only needed when
+    frames has no length
+    :param first: first frame to read. The json frames before it are still decoded, to follow the keyframes
+    :return: iterator over (cursor, motion vectors, reference frames, reference dictionary) of the frames from first
+    """
+    total_frames = _total_frames(frames, total_frames)
+    first = max(first, 1)
+
+    if isinstance(frames, MotionContainer):
+        for cursor in range(first, total_frames-1):
+            yield (cursor, *frames.frame(cursor), frames.reference_dict(cursor))
+        return
+
+    frames = iter(frames)
+    # The first frame is a key frame, it has no motion.
+    next(frames, None)
+
+    frame_references = FrameReferences(gop, max(total_frames-1, 0))
+
+    for cursor in range(1, total_frames-1):
+        frame_data = next(frames)
+        if cursor < first:
+            frame_references.resolve(frame_data, cursor)
+            continue
+
+        motion_vectors, reference_frames = frame_block_arrays(frame_data)
+        references = frame_references.resolve(frame_data, cursor)
+
+        yield cursor, motion_vectors, reference_frames, dict(enumerate(references.tolist()))
+
+
+def motion_fields(
+        frames,
+        gop,
+        height: int = None,
+        width: int = None,
+        total_frames: int = None,
+        forward: bool = False
+) -> Iterator[tuple]:
+    """
+    Compute the motion fields of the frames of a video, in order.
+    :param frames: frames of the inspector from the first one, as frame dictionaries, or a MotionContainer
+    :param gop: gop size used during encoding
+    :param height: height of the video, the height of the block grid if None
+    :param width: width of the video, the width of the block grid if None
+    :param total_frames: number of elements of the inspector output, the trailing null included. Only needed when
+    frames has no length
+    :param forward: whether the video was reversed to get the forward motion vectors, the frame ids are then the ones
+    of the original video
+    :return: iterator over (frame id, motion field, projected motion field, reference map), the maps being BlockField
+    views of the (h, w, 2) float32 fields and of the (h, w, 1) uint8 reference map
+    """
+    total_frames = _total_frames(frames, total_frames)
+
+    for cursor, motion_vectors, reference_frames, reference_dict in block_motion(frames, gop, total_frames):
+
+        blocks = block_motion_vectors(motion_vectors, reference_frames, reference_dict, cursor)
+        rows, cols = reference_frames.shape
+        motion_field, projection, reference_map = block_fields(*blocks, height or 4 * rows, width or 4 * cols)
+
+        frame_id = total_frames - 1 - cursor if forward else cursor
+
+        yield frame_id, motion_field, projection, reference_map
+
+
+def write_fields(
+        fields: Iterator[tuple],
+        directory: str,
+        writer: OutputWriter = None,
+        block_resolution: bool = False,
+        flow_max_radius: float = 0
+) -> Iterator[tuple]:
+    """
+    Write the motion fields as main does, in the pngs and npy folders of a directory, and yield them on.
+    :param fields: iterator over (frame id, motion field, projected motion field, reference map), as motion_fields
+    :param directory: directory receiving the outputs
+    :param writer: writer of the outputs, its enabled outputs among "png" and "npy" are written. Synchronous if None
+    :param block_resolution: whether to save the npy files at block resolution
+    :param flow_max_radius: radius giving the maximum colour intensity in the pngs, the largest radius of a field if 0
+    :return: iterator over the fields
+    """
+    if writer is None:
+        writer = OutputWriter(("png", "npy"))
+
+    for folder in ("pngs/projection", "pngs/reference", "pngs/mv", "npy/mv", "npy/mv_proj"):
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    for frame_id, motion_field, projection, reference_map in fields:
+        name = str(frame_id).zfill(6)
+
+        if writer.enabled("png"):
+            proj_rgb = field_to_rgb(projection, flow_max_radius)
+            mv_rgb = field_to_rgb(motion_field, flow_max_radius)
+            writer.imwrite("png", f"{directory}/pngs/projection/{name}_motion_projection.png", proj_rgb)
+            writer.imwrite("png", f"{directory}/pngs/reference/{name}_reference_map.png", reference_map.to_pixels())
+            writer.imwrite("png", f"{directory}/pngs/mv/{name}_motion_field.png", mv_rgb)
+
+        if block_resolution:
+            writer.save("npy", f"{directory}/npy/mv/{name}_motion_field.npy", motion_field.blocks)
+            writer.save("npy", f"{directory}/npy/mv_proj/{name}_motion_field_projection.npy", projection.blocks)
+        else:
+            writer.save("npy", f"{directory}/npy/mv/{name}_motion_field.npy", motion_field.to_pixels())
+            writer.save("npy", f"{directory}/npy/mv_proj/{name}_motion_field_projection.npy", projection.to_pixels())
+
+        yield frame_id, motion_field, projection, reference_map
@@ -0,0 +1,548 @@
+"""
+ pipeline.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Stages used to process a video, from the original frames to the analysis of the motion vectors, and a scheduler
+running several videos at once.
+
+Every video gets its own scratch directory, so the videos are independent. The scheduler runs each video through the
+stages in order and bounds the number of videos inside each stage, so the encoding of a video overlaps the analysis
+of the previous one without oversubscribing the machine. The outputs of the stages are kept in a StageCache, a stage
+whose inputs did not change is restored instead of being run again.
+
+The selected frames are linked into the scratch directory, not copied, and decoded once by ffmpeg: the y4m stream is
+piped to the encoder while the same frames are written to a raw frame store that the analysis memory-maps.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .cache import StageCache
+from .cache import cache_key
+from .cache import copy_links
+from .cache import hash_command
+from .cache import hash_files
+from .cache import hash_sources
+from .modules.flow_io import flow_paths
+from .modules.profiling import Profiler
+from .modules.utils import frame_range
+from .modules.utils import get_paths
+from .modules.utils import range_suffix
+from .modules.writer import OUTPUTS
+from .motion_container import convert_json
+
+
+DEFAULT_ENCODER = "./src/enc_scenario/{encoding_preset}.sh {input} {name} {width} {height} {fps} {gop} {cpu}"
+DEFAULT_INSPECTOR = "./aom_build/examples/inspect {ivf} -mv -r"
+SOURCES = os.path.dirname(os.path.abspath(__file__))
+
+
+def video_name(file_path: str, arg_flags) -> str:
+    """
+    Build the name of the outputs of a video from its folder and the encoding parameters.
+    :param file_path: folder containing the frames of the video
+    :param arg_flags: parsed arguments of run.py
+    :return: name of the video
+    """
+    name = file_path.split("/")[-1]
+    if not name:
+        name = file_path.split("/")[-2]
+
+    if arg_flags.forward:
+        name += "_forward"
+
+    else:
+        name += "_backward"
+
+    name += f"_{arg_flags.gop}"
+    name += f"_{arg_flags.frame_step}"
+    name += f"_{arg_flags.encoding_preset}"
+    name += f"_{arg_flags.cpu}"
+
+    return name
+
+
+def select_frames(file_path: str, frame_step: int, forward: bool) -> list:
+    """
+    List the frames of a video that are encoded, in encoding order.
+    :param file_path: folder containing the frames of the video
+    :param frame_step: step between frames
+    :param forward: whether the frames are reversed
+    :return: list of paths of the frames
+    """
+    if forward:
+        direction = -1
+        start = -1
+    else:
+        direction = 1
+        start = 0
+
+    frame_list = get_paths(file_path)
+
+    return [frame_list[start + (cursor * direction)] for cursor in range(0, len(frame_list), frame_step)]
+
+
+def link_frames(frames: list, scratch: str, frame_step: int) -> None:
+    """
+    Link the selected frames of a video in the scratch directory, in encoding order, without copying them.
+    :param frames: paths of the frames, in encoding order
+    :param scratch: scratch directory of the video
+    :param frame_step: step between frames
+    :return: None
+    """
+    for cursor, frame_path in enumerate(frames):
+
+        link = f"./{scratch}/frame_{str(cursor * frame_step).zfill(6)}.png"
+        try:
+            os.symlink(os.path.abspath(frame_path), link)
+        except OSError:
+            shutil.copyfile(frame_path, link)
+
+
+def frames_command(scratch: str, fps: int, y4m: bool, frame_store: str = None) -> str:
+    """
+    Build the ffmpeg command decoding the frames of the scratch directory once.
+
+    The frames are converted to yuv444p, then written as a y4m stream on stdout for the encoder and, in the same pass,
+    converted back to BGR in a raw frame store for the analysis. These BGR frames are the ones cv2.VideoCapture would
+    decode from the y4m.
+    :param scratch: scratch directory of the video
+    :param fps: fps of the input video
+    :param y4m: whether the y4m stream is written on stdout
+    :param frame_store: path of the raw BGR frame store, None to skip it
+    :return: command line
+    """
+    command = f"ffmpeg -nostdin -y -framerate {fps} -pattern_type glob -i './{scratch}/*.png' "
+
+    if y4m and frame_store is not None:
+        command += "-filter_complex 'format=yuv444p,split[y4m][frames];[frames]format=bgr24[bgr]' " \
+                   f"-map '[y4m]' -f yuv4mpegpipe pipe:1 -map '[bgr]' -f rawvideo {frame_store}"
+    elif y4m:
+        command += "-pix_fmt yuv444p -f yuv4mpegpipe pipe:1"
+    else:
+        command += f"-vf format=yuv444p,format=bgr24 -f rawvideo {frame_store}"
+
+    return command
+
+
+def decode_frames(scratch: str, fps: int, frame_store: str) -> None:
+    """
+    Decode the frames of the scratch directory into a raw BGR frame store.
+    :param scratch: scratch directory of the video
+    :param fps: fps of the input video
+    :param frame_store: path of the frame store
+    :return: None
+    """
+    subprocess.run(frames_command(scratch, fps, False, frame_store), shell=True, check=True)
+
+
+def encode(scratch: str, name: str, width: int, height: int, arg_flags, frame_store: str = None) -> None:
+    """
+    Stream the frames to the encoder command, which writes output/ivf/{name}.ivf.
+
+    The y4m video is piped to the encoder, its input is "-", and never written to disk.
+    :param scratch: scratch directory of the video
+    :param name: name of the video
+    :param width: width of the video
+    :param height: height of the video
+    :param arg_flags: parsed arguments of run.py
+    :param frame_store: path of a raw BGR frame store filled in the same pass, None to skip it
+    :return: None
+    """
+    command = arg_flags.encoder.format(
+        encoding_preset=arg_flags.encoding_preset,
+        input="-",
+        name=name,
+        width=width,
+        height=height,
+        fps=arg_flags.fps*1000,
+        gop=arg_flags.gop,
+        cpu=arg_flags.cpu,
+    )
+
+    source = subprocess.Popen(frames_command(scratch, arg_flags.fps, True, frame_store), shell=True,
+                              stdout=subprocess.PIPE)
+    encoder = subprocess.Popen(command, shell=True, stdin=source.stdout)
+    source.stdout.close()
+
+    if encoder.wait() != 0:
+        source.kill()
+        source.wait()
+        raise subprocess.CalledProcessError(encoder.returncode, command)
+
+    if source.wait() != 0:
+        raise subprocess.CalledProcessError(source.returncode, source.args)
+
+
+def inspect(name: str, arg_flags) -> None:
+    """
+    Run the inspector command on output/ivf/{name}.ivf and save its output in output/json/{name}.json.
+    :param name: name of the video
+    :param arg_flags: parsed arguments of run.py
+    :return: None
+    """
+    command = arg_flags.inspector.format(ivf=f"./output/ivf/{name}.ivf", name=name)
+
+    with open(f"./output/json/{name}.json.tmp", "w") as json_file:
+        subprocess.run(command, shell=True, check=True, stdout=json_file)
+    os.replace(f"./output/json/{name}.json.tmp", f"./output/json/{name}.json")
+
+
+def analyse(analysis, name: str, scratch: str, width: int, height: int, arg_flags, stream: bool = False) -> None:
+    """
+    Run the analysis of the motion vectors of a video.
+    :param analysis: function analysing the motion vectors, main.main
+    :param name: name of the video
+    :param scratch: scratch directory of the video
+    :param width: width of the video
+    :param height: height of the video
+    :param arg_flags: parsed arguments of run.py
+    :param stream: whether to run the inspector during the analysis, its output being analysed as it is written
+    :return: None
+    """
+    inspector = None
+    if stream:
+        inspector = arg_flags.inspector.format(ivf=f"./output/ivf/{name}.ivf", name=name)
+
+    analysis(
+        arg_flags.gop,
+        name,
+        f"./{scratch}/frames.bgr",
+        width,
+        height,
+        arg_flags.forward,
+        arg_flags.dataset,
+        arg_flags.layers,
+        arg_flags.frame_step,
+        arg_flags.encoding_preset,
+        arg_flags.display,
+        arg_flags.iqa,
+        arg_flags.motion_metrics,
+        arg_flags.complexity_metrics,
+        arg_flags.original_mv,
+        arg_flags.block_resolution,
+        arg_flags.workers,
+        [output for output in OUTPUTS if output not in arg_flags.skip_output],
+        arg_flags.writer_threads,
+        arg_flags.prefetch,
+        arg_flags.forward_warp,
+        arg_flags.metrics_backend,
+        arg_flags.metrics_batch,
+        arg_flags.dataset_shard_size,
+        arg_flags.dataset_compression,
+        arg_flags.flow_max_radius,
+        arg_flags.profile,
+        inspector,
+        not arg_flags.no_inspector_tee,
+        arg_flags.start,
+        arg_flags.end,
+        arg_flags.shard,
+        arg_flags.resume,
+        arg_flags.trajectory_window
+    )
+
+
+class StageScheduler:
+    """
+    Run several videos at once, bounding the number of videos inside each stage.
+
+    Each video runs in its own thread and goes through the stages in order, a stage is entered only when one of its
+    slots is free. The analysis is CPU bound python, so it runs in a pool of processes when several videos are
+    processed at once.
+    """
+
+    def __init__(self, jobs: int, limits: dict):
+        """
+        :param jobs: number of videos processed at once
+        :param limits: maximum number of videos inside each stage
+        """
+        self.jobs = jobs
+        self.semaphores = {stage: threading.BoundedSemaphore(max(1, limit)) for stage, limit in limits.items()}
+        self.analysis_executor = None
+        if jobs > 1:
+            self.analysis_executor = ProcessPoolExecutor(max_workers=max(1, limits["analysis"]))
+            # The processes are started now, before the stages open the pipes of their commands: a process forked
+            # while a pipe is open keeps its end open, and the command at the other end would wait for it forever.
+            self.analysis_executor.submit(int).result()
+
+    def stage(self, stage: str, function, *args, profiler: Profiler = None, name: str = None):
+        """
+        Run a stage of a video once a slot of the stage is free.
+        :param stage: name of the stage
+        :param function: function running the stage
+        :param args: arguments of the function
+        :param profiler: profiler measuring the stage, and the wait for its slot, none if None
+        :param name: name of the measure, the name of the stage if None
+        :return: the result of the function
+        """
+        profiler = profiler or Profiler()
+        name = name or stage
+
+        with profiler.stage(f"{name}_wait"):
+            self.semaphores[stage].acquire()
+        try:
+            with profiler.stage(name):
+                if stage == "analysis" and self.analysis_executor is not None:
+                    return self.analysis_executor.submit(function, *args).result()
+                return function(*args)
+        finally:
+            self.semaphores[stage].release()
+
+    def run(self, function, items: list) -> list:
+        """
+        Run a function on every item, jobs items at a time.
+        :param function: function processing an item, it receives the scheduler as second argument
+        :param items: items to process
+        :return: list of (item, error message) for the items that failed
+        """
+        failures = []
+
+        def run_item(item):
+            try:
+                function(item, self)
+            except Exception:
+                failures.append((item, traceback.format_exc()))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                list(executor.map(run_item, items))
+        finally:
+            if self.analysis_executor is not None:
+                self.analysis_executor.shutdown()
+
+        return failures
+
+
+def stage_limits(arg_flags) -> dict:
+    """
+    Get the maximum number of videos inside each stage.
+
+    The encoder and the inspector are single threaded, so by default there are as many of them as cores. The analysis
+    uses arg_flags.workers processes per video.
+    :param arg_flags: parsed arguments of run.py
+    :return: dictionary of limits per stage
+    """
+    cores = os.cpu_count() or 1
+
+    limits = {
+        "prepare": arg_flags.jobs,
+        "encode": arg_flags.encode_jobs or cores,
+        "inspect": arg_flags.inspect_jobs or cores,
+        "analysis": arg_flags.analysis_jobs or max(1, cores // max(1, arg_flags.workers)),
+    }
+
+    return {stage: min(limit, arg_flags.jobs) for stage, limit in limits.items()}
+
+
+def stage_keys(frames: list, width: int, height: int, arg_flags) -> dict:
+    """
+    Compute the cache key of every stage of a video.
+
+    Each key covers the key of the previous stage, so a change propagates to all the following stages. The sources of
+    the project only enter the keys of the outputs they derive, the converted container and the analysis, so a change
+    of the code never runs the inspector again. The analysis key also covers the ground truth motion.
+    :param frames: paths of the encoded frames, in encoding order
+    :param width: width of the video
+    :param height: height of the video
+    :param arg_flags: parsed arguments of run.py
+    :return: dictionary of keys per stage
+    """
+    sources = hash_sources([SOURCES, os.path.join(os.path.dirname(SOURCES), "main.py")])
+
+    encoder = arg_flags.encoder.format(
+        encoding_preset=arg_flags.encoding_preset,
+        input="",
+        name="",
+        width=width,
+        height=height,
+        fps=arg_flags.fps*1000,
+        gop=arg_flags.gop,
+        cpu=arg_flags.cpu,
+    )
+    inspector = arg_flags.inspector.format(ivf="", name="")
+
+    keys = {"frames": cache_key("frames", hash_files(frames))}
+    keys["ivf"] = cache_key("ivf", keys["frames"], arg_flags.fps, hash_command(encoder))
+    keys["inspect"] = cache_key("inspect", keys["ivf"], hash_command(inspector), int(arg_flags.gop))
+    keys["mvc"] = cache_key("mvc", keys["inspect"], sources)
+
+    original_motion = ""
+    if arg_flags.original_mv and (arg_flags.iqa or arg_flags.motion_metrics or arg_flags.complexity_metrics):
+        original_motion = hash_files(flow_paths(arg_flags.original_mv))
+
+    keys["analysis"] = cache_key(
+        "analysis",
+        keys["inspect"],
+        sources,
+        original_motion,
+        int(arg_flags.gop),
+        arg_flags.forward,
+        arg_flags.frame_step,
+        arg_flags.iqa,
+        arg_flags.motion_metrics,
+        arg_flags.complexity_metrics,
+        arg_flags.block_resolution,
+        [output for output in OUTPUTS if output not in arg_flags.skip_output],
+        arg_flags.forward_warp,
+        arg_flags.metrics_backend,
+        arg_flags.flow_max_radius,
+        arg_flags.start,
+        arg_flags.end,
+        arg_flags.shard,
+        arg_flags.trajectory_window,
+    )
+
+    return keys
+
+
+def process_video(file_path: str, scheduler: StageScheduler, cache: StageCache, arg_flags, analysis) -> None:
+    """
+    Run all the stages on a video, the stages found in the cache are restored instead.
+    :param file_path: folder containing the frames of the video
+    :param scheduler: scheduler running the stages
+    :param cache: cache of the outputs of the stages
+    :param arg_flags: parsed arguments of run.py
+    :param analysis: function analysing the motion vectors, main.main
+    :return: None
+    """
+    name = video_name(file_path, arg_flags)
+
+    scratch = f"tmp_{name}"
+    os.makedirs(scratch, exist_ok=True)
+
+    frame_store = f"./{scratch}/frames.bgr"
+    ivf_file = f"./output/ivf/{name}.ivf"
+    json_file = f"./output/json/{name}.json"
+    mvc_file = f"./output/mvc/{name}.mvc"
+
+    # The dataset is written outside of the results and the display is interactive, these runs are not cached.
+    cache_analysis = not (arg_flags.dataset or arg_flags.display)
+    metrics = arg_flags.iqa or arg_flags.motion_metrics or arg_flags.complexity_metrics
+
+    # Only the wall time of the stages, the wait for their slots and the sizes of their outputs are reliable here: the
+    # CPU time of the encoders and inspectors of the videos processed at once is shared. main writes the detailed
+    # report of the analysis.
+    profiler = Profiler("off" if arg_flags.profile == "off" else "time")
+    suffix = ""
+
+    try:
+        frames = select_frames(file_path, arg_flags.frame_step, arg_flags.forward)
+        h, w, _ = cv2.imread(frames[0]).shape
+        keys = stage_keys(frames, w, h, arg_flags)
+
+        # The inspector gives one frame per encoded frame, followed by null. A part of the video has its own results.
+        total_frames = len(frames) + 1
+        first, stop = frame_range(total_frames, arg_flags.start, arg_flags.end, arg_flags.shard, arg_flags.forward)
+        suffix = range_suffix(total_frames, first, stop, arg_flags.forward)
+        results = {"results": f"./output/results/{name}{suffix}"}
+
+        if cache.enabled:
+            inspected = cache.fetch("inspect", keys["inspect"], {"video.json": json_file})
+            converted = inspected and cache.fetch("mvc", keys["mvc"], {"video.mvc": mvc_file})
+            encoded = cache.fetch("ivf", keys["ivf"], {"video.ivf": ivf_file})
+        else:
+            # Without a cache, the outputs of a previous run are reused as long as they exist.
+            inspected = os.path.exists(json_file)
+            converted = os.path.exists(mvc_file)
+            encoded = os.path.exists(ivf_file)
+
+        if cache_analysis and cache.fetch("analysis", keys["analysis"], results):
+            return
+
+        # The raw frames take the size of the uncompressed video, they are decoded again at every run rather than
+        # cached: they would evict every other entry.
+        scheduler.stage("prepare", link_frames, frames, scratch, arg_flags.frame_step, profiler=profiler)
+
+        if not encoded and (not inspected or metrics):
+            # A restored file is a link to the cache, it must not be overwritten in place.
+            if os.path.lexists(ivf_file):
+                os.remove(ivf_file)
+            scheduler.stage("encode", encode, scratch, name, w, h, arg_flags, frame_store, profiler=profiler)
+            cache.store("ivf", keys["ivf"], {"video.ivf": ivf_file})
+        else:
+            scheduler.stage(
+                "prepare", decode_frames, scratch, arg_flags.fps, frame_store, profiler=profiler, name="decode"
+            )
+
+        def convert():
+            # The container left is not the one of this json file, or of these sources.
+            if os.path.lexists(mvc_file):
+                os.remove(mvc_file)
+            scheduler.stage(
+                "inspect", convert_json, json_file, mvc_file, int(arg_flags.gop), profiler=profiler, name="convert"
+            )
+            cache.store("mvc", keys["mvc"], {"video.mvc": mvc_file})
+
+        # A streamed inspection runs inside the analysis, it is converted and cached afterwards if it was saved.
+        stream = arg_flags.stream_inspector and not inspected
+        if stream and os.path.lexists(json_file):
+            # The json file left is not the one of these inputs, only the output of the streamed inspector is kept.
+            os.remove(json_file)
+
+        if not inspected and not stream:
+            scheduler.stage("inspect", inspect, name, arg_flags, profiler=profiler)
+            cache.store("inspect", keys["inspect"], {"video.json": json_file})
+            convert()
+        elif inspected and not converted:
+            convert()
+
+        if cache.enabled and not arg_flags.resume:
+            shutil.rmtree(results["results"], ignore_errors=True)
+        else:
+            # The results kept, without a cache or to resume a run, are modified in place: the files restored from the
+            # cache must stop sharing its entries.
+            copy_links(results["results"])
+
+        scheduler.stage("analysis", analyse, analysis, name, scratch, w, h, arg_flags, stream, profiler=profiler)
+
+        # The output is not saved with --no_inspector_tee, nor when the analysis of a range already processed returns
+        # without running the inspector.
+        if stream and os.path.exists(json_file):
+            cache.store("inspect", keys["inspect"], {"video.json": json_file})
+            convert()
+
+        if cache_analysis:
+            cache.store("analysis", keys["analysis"], results)
+
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+        if profiler.enabled:
+            sizes = {"ivf": ivf_file, "json": json_file, "mvc": mvc_file}
+            for output, path in sizes.items():
+                if os.path.exists(path):
+                    profiler.count(f"{output}_bytes", os.path.getsize(path))
+            profiler.write(f"./output/profile/{name}", f"pipeline{suffix}")
+
+
+def run_batch(files: list, arg_flags, analysis) -> list:
+    """
+    Process a list of videos.
+    :param files: folders containing the frames of the videos
+    :param arg_flags: parsed arguments of run.py
+    :param analysis: function analysing the motion vectors of a video, main.main. It runs in the processes of the
+    analysis when several videos are processed at once, so it must be importable
+    :return: list of (folder, error message) for the videos that failed
+    """
+    os.makedirs("./output/ivf", exist_ok=True)
+    os.makedirs("./output/json", exist_ok=True)
+    os.makedirs("./output/mvc", exist_ok=True)
+
+    scheduler = StageScheduler(arg_flags.jobs, stage_limits(arg_flags))
+    cache = StageCache(arg_flags.cache_dir, arg_flags.cache_size)
+
+    def run_video(file_path, stage_scheduler):
+        process_video(file_path, stage_scheduler, cache, arg_flags, analysis)
+
+    return scheduler.run(run_video, files)
@@ -16,5 +16,6 @@
 
 from .flowpy import (flow_to_rgb, make_colorwheel, calibration_pattern,
                      attach_arrows, attach_coord, attach_calibration_pattern,
-                     get_flow_max_radius, backward_warp, forward_warp)
+                     get_flow_max_radius, backward_warp, forward_warp,
+                     splat_forward_warp)
 from .flow_io import flow_read, flow_write
\ No newline at end of file
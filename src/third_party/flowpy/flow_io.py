@@ -99,7 +99,7 @@ def flow_read_flo(f):
     mask_u = np.greater(np.abs(result[..., 0]), 1e9, where=(~np.isnan(result[..., 0])))
     mask_v = np.greater(np.abs(result[..., 1]), 1e9, where=(~np.isnan(result[..., 1])))
 
-    result[mask_u | mask_v] = np.NaN
+    result[mask_u | mask_v] = np.nan
 
     return result
 
@@ -122,9 +122,9 @@ def flow_read_png(f):
     file_content = np.concatenate(list(stream)).reshape((height, width, 3))
     flow, valid = file_content[..., 0:2], file_content[..., 2]
 
-    flow = (flow.astype(np.float) - 2 ** 15) / 64.
+    flow = (flow.astype(np.float64) - 2 ** 15) / 64.
 
-    flow[~valid.astype(np.bool)] = np.NaN
+    flow[~valid.astype(bool)] = np.nan
 
     return flow
 
@@ -0,0 +1,96 @@
+"""
+ test_cache.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the cache of the outputs of the stages.
+"""
+
+import json
+import os
+
+from src.cache import StageCache
+from src.cache import copy_links
+
+
+def write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def read(path: str) -> str:
+    with open(path) as file:
+        return file.read()
+
+
+def test_restored_tree_modified_in_place(tmp_path):
+    """
+    Once its links are copied, a restored tree can be modified in place without changing the cache.
+    """
+    cache = StageCache(str(tmp_path / "cache"), 1)
+    results = str(tmp_path / "results")
+    write(f"{results}/npy/000001.npy", "first")
+    write(f"{results}/log_metrics.csv", "header\n")
+
+    cache.store("analysis", "key", {"results": results})
+    assert cache.fetch("analysis", "key", {"results": results})
+
+    copy_links(results)
+    write(f"{results}/npy/000001.npy", "second")
+    with open(f"{results}/log_metrics.csv", "a") as file:
+        file.write("row\n")
+
+    restored = str(tmp_path / "restored")
+    assert cache.fetch("analysis", "key", {"results": restored})
+    assert read(f"{restored}/npy/000001.npy") == "first"
+    assert read(f"{restored}/log_metrics.csv") == "header\n"
+    assert os.stat(f"{results}/npy/000001.npy").st_nlink == 1
+
+
+def test_disabled_cache(tmp_path):
+    """
+    A cache of size 0 stores nothing and finds nothing.
+    """
+    cache = StageCache(str(tmp_path / "cache"), 0)
+    write(str(tmp_path / "video.ivf"), "ivf")
+
+    cache.store("ivf", "key", {"video.ivf": str(tmp_path / "video.ivf")})
+
+    assert not cache.fetch("ivf", "key", {"video.ivf": str(tmp_path / "restored.ivf")})
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_eviction(tmp_path):
+    """
+    Once the cache exceeds its size the least recently used entries are removed, the index follows the entries.
+    """
+    cache = StageCache(str(tmp_path / "cache"), 25e-9)
+    for number in range(2):
+        write(str(tmp_path / f"{number}.ivf"), "0123456789")
+        cache.store("ivf", f"key{number}", {"video.ivf": str(tmp_path / f"{number}.ivf")})
+        os.utime(tmp_path / "cache" / "ivf" / f"key{number}", (number, number))
+
+    assert cache.fetch("ivf", "key0", {"video.ivf": str(tmp_path / "restored.ivf")})
+    write(str(tmp_path / "2.ivf"), "0123456789")
+    cache.store("ivf", "key2", {"video.ivf": str(tmp_path / "2.ivf")})
+
+    assert sorted(os.listdir(tmp_path / "cache" / "ivf")) == ["key0", "key2"]
+    with open(tmp_path / "cache" / "index.json") as file:
+        assert json.load(file) == {os.path.join("ivf", "key0"): 10, os.path.join("ivf", "key2"): 10}
+
+def test_index_rebuilt(tmp_path):
+    """
+    A cache without index, written by an older version, gets its index from its entries.
+    """
+    cache = StageCache(str(tmp_path / "cache"), 1)
+    write(str(tmp_path / "cache" / "ivf" / "old" / "video.ivf"), "01234")
+    write(str(tmp_path / "video.ivf"), "0123456789")
+
+    cache.store("ivf", "new", {"video.ivf": str(tmp_path / "video.ivf")})
+
+    with open(tmp_path / "cache" / "index.json") as file:
+        assert json.load(file) == {os.path.join("ivf", "old"): 5, os.path.join("ivf", "new"): 10}
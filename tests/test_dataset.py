@@ -0,0 +1,39 @@
+"""
+ test_dataset.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the channel layout of the dataset stacks.
+"""
+
+import cv2
+import numpy as np
+
+from src.modules.dataset import DatasetLayout
+
+
+def test_assemble_repeated_layer():
+    """
+    A layer listed twice fills both of its places, the stack is the one np.dstack gives.
+    """
+    rng = np.random.default_rng(0)
+    frame, prev_frame = rng.integers(0, 255, (2, 8, 12, 3), dtype=np.uint8)
+    motion_field, projection = rng.normal(0, 4, (2, 8, 12, 2)).astype(np.float32)
+    reference_map = rng.integers(0, 8, (8, 12, 1), dtype=np.uint8)
+
+    layout = DatasetLayout(["og_frame", "curr_frame", "mv_proj", "og_frame", "og_frame_y"], 8, 12)
+    stack = layout.assemble(frame, prev_frame, motion_field, projection, reference_map)
+
+    expected = np.dstack((
+        cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB),
+        cv2.cvtColor(frame, cv2.COLOR_YCrCb2RGB),
+        projection,
+        cv2.cvtColor(prev_frame, cv2.COLOR_YCrCb2RGB),
+        prev_frame[:, :, 0],
+    ))
+    assert layout.channels == 12
+    np.testing.assert_array_equal(stack, expected)
+    assert layout.offsets["og_frame"] == (0, 3)
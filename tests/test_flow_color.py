@@ -0,0 +1,56 @@
+"""
+ test_flow_color.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the colour rendering of the motion fields against flowpy.flow_to_rgb.
+"""
+
+import numpy as np
+import pytest
+
+from src.modules.block_field import BlockField
+from src.modules.flow_color import field_to_rgb
+from src.modules.flow_color import flow_to_rgb
+from src.third_party.flowpy import flowpy
+
+
+def random_flow(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """
+    Flow with small, large, null and NaN vectors, and vectors along the axes where the angle wraps around.
+    """
+    rng = np.random.default_rng(seed)
+    flow = (rng.normal(size=(height, width, 2)) * rng.choice([0.1, 2, 30], size=(height, width, 1))).astype(np.float32)
+    flow[0, :4] = [[0, 0], [-3, 0], [0, -3], [5, 0]]
+    flow[1, :2] = np.nan
+    return flow
+
+
+@pytest.mark.parametrize("flow_max_radius", [None, 4.0, 100.0])
+def test_flow_to_rgb(flow_max_radius):
+    """
+    The colours stay within 1 of flowpy, the invalid vectors are black.
+    """
+    flow = random_flow(48, 64)
+
+    colors = flow_to_rgb(flow, flow_max_radius)
+    expected = flowpy.flow_to_rgb(flow.astype(np.float64), flow_max_radius)
+
+    assert colors.dtype == np.uint8
+    assert np.abs(colors.astype(np.int16) - expected).max() <= 1
+    assert (colors[1, :2] == 0).all()
+
+
+def test_field_to_rgb():
+    """
+    Colouring the blocks then upsampling them gives the colours of flowpy on the pixel resolution field.
+    """
+    blocks = random_flow(12, 16, seed=1)
+    field = BlockField(blocks, 45, 62)
+
+    expected = flowpy.flow_to_rgb(field.to_pixels().astype(np.float64))
+
+    assert np.abs(field_to_rgb(field).astype(np.int16) - expected).max() <= 1
@@ -0,0 +1,82 @@
+"""
+ test_flow_io.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the reading and writing of the .flo and .png flows, against the files read and written by flowpy.
+"""
+
+import numpy as np
+import pytest
+
+from src.modules.flow_io import iter_flows
+from src.modules.flow_io import read_flow
+from src.modules.flow_io import write_flo
+from src.modules.flow_io import write_png
+from src.third_party.flowpy import flow_read
+from src.third_party.flowpy import flow_write
+
+# flowpy masks the invalid .flo flows with a `where` and no `out`, the sentinels written in place of NaN are masked.
+pytestmark = pytest.mark.filterwarnings("ignore:'where' used without 'out'")
+
+
+def random_flow(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """
+    Flow quantised to 1/64 of a pixel, as stored in the .png files, with invalid pixels on one and both components.
+    """
+    rng = np.random.default_rng(seed)
+    flow = (np.round(rng.normal(scale=20, size=(height, width, 2)) * 64) / 64).astype(np.float32)
+    flow[0, 0] = np.nan
+    flow[1, 2, 0] = np.nan
+    flow[2, 1, 1] = np.nan
+    return flow
+
+
+@pytest.mark.parametrize("extension", ["flo", "png"])
+def test_read_flowpy(tmp_path, extension):
+    """
+    The flows written by flowpy are read as flowpy reads them, any invalid component invalidating the pixel.
+    """
+    flow = random_flow(13, 17)
+    path = str(tmp_path / f"flow.{extension}")
+    flow_write(path, flow)
+
+    read = read_flow(path)
+
+    assert read.dtype == np.float32
+    np.testing.assert_array_equal(read, flow_read(path))
+    assert np.isnan(read[[0, 1, 2], [0, 2, 1]]).all()
+
+
+@pytest.mark.parametrize("extension, write", [("flo", write_flo), ("png", write_png)])
+def test_write_flowpy(tmp_path, extension, write):
+    """
+    The flows written are read back by flowpy as they were given.
+    """
+    flow = random_flow(13, 17, seed=1)
+    path = str(tmp_path / f"flow.{extension}")
+    write(path, flow)
+
+    expected = flow.copy()
+    expected[np.isnan(flow).any(axis=-1)] = np.nan
+
+    np.testing.assert_array_equal(flow_read(path), expected)
+    np.testing.assert_array_equal(read_flow(path), expected)
+
+
+@pytest.mark.parametrize("prefetch_size", [0, 2])
+def test_iter_flows(tmp_path, prefetch_size):
+    """
+    The flows are read in order, with or without reading them ahead.
+    """
+    flows = [random_flow(5, 7, seed=seed) for seed in range(4)]
+    paths = []
+    for index, flow in enumerate(flows):
+        paths.append(str(tmp_path / f"{index}.{'png' if index % 2 else 'flo'}"))
+        flow_write(paths[-1], flow)
+
+    for read, path in zip(iter_flows(paths, prefetch_size), paths, strict=True):
+        np.testing.assert_array_equal(read, flow_read(path))
@@ -0,0 +1,68 @@
+"""
+ test_frame_source.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the prefetching of the frame sources in a background thread.
+"""
+
+import threading
+
+import pytest
+
+from src.modules.frame_source import prefetch
+
+
+def source(count: int, closed: threading.Event, fail_at: int = None):
+    """
+    Generator of numbers, as a decoder, recording when it is closed.
+    """
+    try:
+        for number in range(count):
+            if number == fail_at:
+                raise RuntimeError("decoder")
+            yield number
+    finally:
+        closed.set()
+
+
+def test_prefetch_order():
+    """
+    All the items are given in order, and the source is closed at its end.
+    """
+    closed = threading.Event()
+
+    assert list(prefetch(source(20, closed), 2)) == list(range(20))
+    assert closed.is_set()
+
+
+def test_prefetch_early_close():
+    """
+    Closing the iterator before the end of the source stops the thread, blocked on the full queue, and closes the
+    source.
+    """
+    closed = threading.Event()
+    threads = threading.active_count()
+    items = prefetch(source(1000, closed), 2)
+
+    assert next(items) == 0
+    items.close()
+
+    assert closed.is_set()
+    assert threading.active_count() == threads
+
+
+def test_prefetch_error():
+    """
+    An error of the source is raised by the iterator once the items before it are used.
+    """
+    closed = threading.Event()
+    items = prefetch(source(10, closed, fail_at=3), 2)
+
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        next(items)
+    assert closed.is_set()
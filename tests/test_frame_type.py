@@ -0,0 +1,79 @@
+"""
+ test_frame_type.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the reference frame schedule against tables of references written by hand.
+"""
+
+import numpy as np
+
+from src.modules.frame_type import reference_schedule
+
+
+# References LAST to ALTREF, after the intra reference, of the 20 first frames with a GOP of 16 from a keyframe at 0.
+# The first half GOP references the previous frames. From then on a golden frame is added every 8 frames, the frame
+# before the half GOP, and the previous frames skip the golden frames.
+GOP_16 = [
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 0, 0, 0, 0, 0, 0],
+    [0, 2, 1, 0, 0, 0, 0, 0],
+    [0, 3, 2, 1, 0, 0, 0, 0],
+    [0, 4, 3, 2, 0, 1, 0, 0],
+    [0, 5, 4, 3, 0, 2, 1, 0],
+    [0, 6, 5, 4, 0, 3, 2, 1],
+    [0, 7, 6, 5, 0, 4, 3, 2],
+    [0, 7, 6, 5, 8, 0, 4, 3],
+    [0, 9, 7, 6, 8, 0, 5, 4],
+    [0, 10, 9, 7, 8, 0, 6, 5],
+    [0, 11, 10, 9, 8, 0, 7, 6],
+    [0, 12, 11, 10, 8, 0, 9, 7],
+    [0, 13, 12, 11, 8, 0, 10, 9],
+    [0, 14, 13, 12, 8, 0, 11, 10],
+    [0, 15, 14, 13, 8, 0, 12, 11],
+    [0, 15, 14, 13, 16, 0, 12, 8],
+    [0, 17, 15, 14, 16, 0, 13, 8],
+    [0, 18, 17, 15, 16, 0, 14, 8],
+]
+
+# The same GOP from a keyframe at 8, the frames before it have no reference.
+GOP_16_KEYFRAME_8 = [[-1] * 8] * 8 + [
+    [8, 8, 8, 8, 8, 8, 8, 8],
+    [8, 8, 8, 8, 8, 8, 8, 8],
+    [8, 9, 8, 8, 8, 8, 8, 8],
+    [8, 10, 9, 8, 8, 8, 8, 8],
+    [8, 11, 10, 9, 8, 8, 8, 8],
+    [8, 12, 11, 10, 8, 9, 8, 8],
+    [8, 13, 12, 11, 8, 10, 9, 8],
+    [8, 14, 13, 12, 8, 11, 10, 9],
+    [8, 15, 14, 13, 8, 12, 11, 10],
+    [8, 15, 14, 13, 16, 8, 12, 11],
+    [8, 17, 15, 14, 16, 8, 13, 12],
+    [8, 18, 17, 15, 16, 8, 14, 13],
+]
+
+
+def test_schedule():
+    """
+    The schedule gives the references of every frame, and their distance to the frame.
+    """
+    references, distances = reference_schedule(16, 20)
+
+    np.testing.assert_array_equal(references, GOP_16)
+    np.testing.assert_array_equal(distances, np.arange(20)[:, np.newaxis] - np.array(GOP_16))
+
+
+def test_schedule_after_keyframe():
+    """
+    The frames before the keyframe have no reference and a distance of 0, the following ones follow the GOP from the
+    keyframe.
+    """
+    references, distances = reference_schedule(16, 20, keyframe=8)
+
+    np.testing.assert_array_equal(references, GOP_16_KEYFRAME_8)
+    assert (distances[:9] == 0).all()
+    np.testing.assert_array_equal(distances[8:], np.arange(8, 20)[:, np.newaxis] - np.array(GOP_16_KEYFRAME_8[8:]))
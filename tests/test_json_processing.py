@@ -0,0 +1,336 @@
+"""
+ test_json_processing.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the streaming parser of the json files, of the streaming of the output of the inspector, with a stub
+inspector, of the reference frames read from the order hints of synthetic inspector frames, of the projected fields
+of a stream with a keyframe, and of the vectorized motion maps against the block by block rasterization.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+import pytest
+
+from src.json_processing import FrameReferences
+from src.json_processing import KEY_FRAME
+from src.json_processing import bitstream_references
+from src.json_processing import count_json_frames
+from src.json_processing import get_block_motion_vectors
+from src.json_processing import get_frame_motion_vectors
+from src.json_processing import iter_json_frames
+from src.json_processing import stream_inspector
+from src.modules.block_field import block_fields
+from src.modules.frame_type import reference_schedule
+from src.motion_fields import motion_fields
+
+
+# Writes a json array of frames as the inspector does, one frame at a time, then sleeps and exits with the given code.
+STUB_INSPECTOR = """
+import json, sys, time
+frames, sleep, code = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+sys.stdout.write("[")
+for number in range(frames):
+    sys.stdout.write(json.dumps({"frame": number, "motionVectors": [[number] * 4]}) + ",")
+    sys.stdout.flush()
+sys.stdout.write("null]\\n")
+sys.stdout.flush()
+time.sleep(sleep)
+sys.exit(code)
+"""
+
+
+def stub_command(directory, frames: int, sleep: float = 0, code: int = 0) -> str:
+    script = os.path.join(directory, "inspector.py")
+    with open(script, "w") as file:
+        file.write(STUB_INSPECTOR)
+    return f"{sys.executable} {script} {frames} {sleep} {code}"
+
+
+def test_stream_inspector(tmp_path):
+    """
+    The frames are streamed in order, and the copy of the output is renamed once the inspector succeeded.
+    """
+    tee = str(tmp_path / "video.json")
+
+    frames = list(stream_inspector(stub_command(tmp_path, 5), tee, chunk_size=16))
+
+    assert [frame["frame"] for frame in frames[:-1]] == list(range(5))
+    assert frames[-1] is None
+    with open(tee) as file:
+        assert json.load(file) == frames
+    assert not os.path.exists(f"{tee}.tmp")
+
+
+def test_stream_inspector_early_close(tmp_path):
+    """
+    Closing the iterator early kills the inspector and removes the partial copy.
+    """
+    tee = str(tmp_path / "video.json")
+    frames = stream_inspector(stub_command(tmp_path, 5, sleep=60), tee, chunk_size=16)
+
+    assert next(frames)["frame"] == 0
+    start = time.perf_counter()
+    frames.close()
+
+    assert time.perf_counter() - start < 10
+    assert os.listdir(tmp_path) == ["inspector.py"]
+
+
+def test_stream_inspector_failure(tmp_path):
+    """
+    An inspector exiting with an error raises once its output is read, and its copy is removed.
+    """
+    tee = str(tmp_path / "video.json")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        list(stream_inspector(stub_command(tmp_path, 3, code=2), tee))
+
+    assert os.listdir(tmp_path) == ["inspector.py"]
+
+
+# Top-level values of all kinds, with brackets, commas and escaped quotes inside strings, ending with null as the
+# output of the inspector.
+DOCUMENT = [
+    {"frame": 0, "motionVectors": [[[1, -2], [3, 4]]], "name": "a]b,c[{"},
+    12345.5,
+    "quote \\\" ] , [ backslash \\\\",
+    [[], {}, [1, [2, [3]]]],
+    {"path": "C:\\\\dir\\\\", "next": "}],"},
+    -7,
+    None,
+]
+
+
+def write_document(tmp_path, text: str) -> str:
+    path = str(tmp_path / "video.json")
+    with open(path, "w") as file:
+        file.write(text)
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 1 << 20])
+def test_iter_json_frames_chunks(tmp_path, chunk_size):
+    """
+    The values split across the chunks, numbers included, are decoded whole, the trailing null is the last element.
+    """
+    path = write_document(tmp_path, "\n [ " + ",\n".join(json.dumps(value) for value in DOCUMENT) + " ]\n")
+
+    frames = list(iter_json_frames(path, chunk_size))
+
+    assert frames == DOCUMENT
+    assert frames[-1] is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 1 << 24])
+def test_count_json_frames(tmp_path, chunk_size):
+    """
+    The brackets and commas inside strings, escaped quotes included, are not counted, the trailing null is.
+    """
+    path = write_document(tmp_path, json.dumps(DOCUMENT))
+
+    assert count_json_frames(path, chunk_size) == len(DOCUMENT)
+
+
+def test_empty_array(tmp_path):
+    """
+    An empty array has no element.
+    """
+    path = write_document(tmp_path, " [ ] ")
+
+    assert list(iter_json_frames(path, 1)) == []
+    assert count_json_frames(path, 1) == 0
+
+
+def test_truncated_file(tmp_path):
+    """
+    A file cut in the middle of a value raises once the complete values before it are given.
+    """
+    text = json.dumps(DOCUMENT)
+    path = write_document(tmp_path, text[:text.index('"name"')])
+
+    with pytest.raises(ValueError):
+        list(iter_json_frames(path, 4))
+
+    path = write_document(tmp_path, "[" + json.dumps(DOCUMENT[0]) + ", 12")
+    frames = iter_json_frames(path, 4)
+    assert next(frames) == DOCUMENT[0]
+    assert next(frames) == 12
+
+
+def inter_frame(frame_number: int, references: list, slots: list, bits: int = 7) -> dict:
+    """
+    Build the inspector data of an inter frame whose references LAST to ALTREF are the given frames, held in the given
+    buffer slots.
+    """
+    modulo = 1 << bits
+    ref_order_hint = [(frame_number - 100) % modulo] * 8
+    for reference, slot in zip(references, slots):
+        ref_order_hint[slot] = reference % modulo
+
+    return {
+        "frameType": 1,
+        "orderHint": frame_number % modulo,
+        "orderHintBits": bits,
+        "refFrameIdx": slots,
+        "refOrderHint": ref_order_hint,
+    }
+
+
+def test_order_hint_wraparound():
+    """
+    The order hints wrap around, the references before and after the wrap, and the future ones, are found back.
+    """
+    references = [129, 128, 127, 120, 126, 134, 131]
+    frame_data = inter_frame(130, references, list(range(7)))
+
+    np.testing.assert_array_equal(bitstream_references(frame_data, 130, keyframe=64), [64] + references)
+
+
+def test_order_hint_bits():
+    """
+    The number of bits of the order hints gives the wrap around, a distance of half the range is in the future as in
+    the AV1 specification.
+    """
+    references = [39, 38, 37, 36, 33, 41, 32]
+    frame_data = inter_frame(40, references, list(range(7)), bits=4)
+
+    np.testing.assert_array_equal(bitstream_references(frame_data, 40), [0, 39, 38, 37, 36, 33, 41, 48])
+
+
+def test_ref_frame_idx():
+    """
+    Each reference reads the order hint of its own buffer slot.
+    """
+    references = [19, 18, 17, 16, 12, 24, 8]
+    slots = [3, 0, 5, 1, 7, 2, 6]
+    frame_data = inter_frame(20, references, slots)
+
+    np.testing.assert_array_equal(bitstream_references(frame_data, 20), [0] + references)
+
+
+def test_keyframe_and_missing_hints():
+    """
+    A keyframe references itself, a frame without the order hints of its slots has no bitstream references.
+    """
+    assert (bitstream_references({"frameType": 0, "orderHint": 5}, 5) == 5).all()
+    assert bitstream_references({"frameType": 1, "orderHint": 5}, 5) is None
+    assert bitstream_references({"frameType": 1}, 5) is None
+
+
+def test_fallback_to_schedule():
+    """
+    The frames without order hints take the simulated schedule, the others their bitstream references, the intra
+    reference following the last keyframe.
+    """
+    schedule, _ = reference_schedule(16, 40)
+    frame_references = FrameReferences(16, 40)
+
+    for frame_number in range(1, 20):
+        np.testing.assert_array_equal(frame_references.resolve({"frameType": 1}, frame_number), schedule[frame_number])
+    np.testing.assert_array_equal(frame_references.resolve(None, 20), schedule[20])
+
+    references = [21, 20, 19, 18, 16, 24, 12]
+    np.testing.assert_array_equal(frame_references.resolve(inter_frame(22, references, list(range(7))), 22),
+                                  [0] + references)
+
+    np.testing.assert_array_equal(frame_references.resolve({"frameType": 0, "orderHint": 23}, 23), [23] * 8)
+    np.testing.assert_array_equal(frame_references.resolve(inter_frame(24, references, list(range(7))), 24),
+                                  [23] + references)
+    np.testing.assert_array_equal(frame_references.resolve({"frameType": 1}, 25), schedule[25])
+
+
+def block_frame(frame_type: int, order_hint: int, rows: int = 3, cols: int = 4) -> dict:
+    """
+    Build the inspector data of a frame whose blocks all move by (8, -16) in 1/8 pixel, from its LAST reference.
+    """
+    return {
+        "frameType": frame_type,
+        "orderHint": order_hint,
+        "refFrameIdx": list(range(7)),
+        "refOrderHint": [order_hint - 1] * 8,
+        "motionVectors": [[[8, -16, 0, 0]] * cols] * rows,
+        "referenceFrame": [[[1, -1]] * cols] * rows,
+    }
+
+
+def test_keyframe_in_stream():
+    """
+    The blocks of a keyframe in the middle of the stream reference the frame itself, their projection is 0 and not
+    NaN, the frames around it are projected on their reference.
+    """
+    frames = [None, block_frame(1, 1), block_frame(KEY_FRAME, 2), block_frame(1, 3), None]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        fields = {frame_id: np.asarray(projection) for frame_id, _, projection, _ in motion_fields(frames, 16)}
+
+    assert list(fields) == [1, 2, 3]
+    assert (fields[2] == 0).all()
+    for frame_id in (1, 3):
+        np.testing.assert_array_equal(fields[frame_id][:8, :12], np.broadcast_to([-1, 0.5], (8, 12, 2)))
+
+
+def loop_motion_vectors(frame_data: dict, reference_dict: dict, frame_number: int) -> tuple:
+    """
+    Rasterize the motion vectors block by block, as get_frame_motion_vectors did before its vectorization.
+    """
+    motion_vectors = frame_data["motionVectors"]
+    reference_frames = frame_data["referenceFrame"]
+    h, w = len(motion_vectors), len(motion_vectors[0])
+
+    motion_map = np.zeros((h * 4, w * 4, 2), dtype=np.float32)
+    motion_map_projection = np.zeros((h * 4, w * 4, 2), dtype=np.float32)
+    reference_map = np.zeros((h * 4, w * 4, 1), dtype=np.float32)
+
+    for i in range(0, h - 1):
+        for j in range(0, w - 1):
+            vector_h = motion_vectors[i][j][0] / 16
+            vector_w = motion_vectors[i][j][1] / 16
+            block = (slice(i * 4, (i + 1) * 4), slice(j * 4, (j + 1) * 4))
+
+            motion_map[block + (0,)] = vector_w
+            motion_map[block + (1,)] = vector_h
+            reference_map[block + (0,)] = reference_frames[i][j][0] / 7
+
+            distance = frame_number - reference_dict[reference_frames[i][j][0]]
+            motion_map_projection[block + (0,)] = vector_w / distance
+            motion_map_projection[block + (1,)] = vector_h / distance
+
+    return motion_map, motion_map_projection, (reference_map * 255).astype(np.uint8)
+
+
+def test_motion_vectors_match_loop():
+    """
+    The vectorized motion maps, at pixel resolution and through the block fields of the frame loop, match the block by
+    block rasterization exactly.
+    """
+    rng = np.random.default_rng(0)
+    rows, cols = 9, 13
+    frame_data = {
+        "motionVectors": rng.integers(-512, 512, (rows, cols, 4)).tolist(),
+        "referenceFrame": np.stack([rng.integers(0, 8, (rows, cols)), np.full((rows, cols), -1)], axis=-1).tolist(),
+    }
+    references, _ = reference_schedule(16, 40)
+    reference_dict = dict(enumerate(references[22].tolist()))
+
+    expected = loop_motion_vectors(frame_data, reference_dict, 22)
+
+    for array, expected_array in zip(get_frame_motion_vectors(frame_data, reference_dict, 22), expected):
+        assert array.dtype == expected_array.dtype
+        np.testing.assert_array_equal(array, expected_array)
+
+    height, width = 4 * rows - 3, 4 * cols - 2
+    blocks = get_block_motion_vectors(frame_data, reference_dict, 22)
+    for field, expected_array in zip(block_fields(*blocks, height, width), expected):
+        np.testing.assert_array_equal(field.to_pixels(), expected_array[:height, :width])
+
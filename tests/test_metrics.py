@@ -0,0 +1,60 @@
+"""
+ test_metrics.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the numpy backend of the metrics, against their direct formulas and against the tensorflow backend.
+"""
+
+import importlib.util
+
+import numpy as np
+import pytest
+
+from src.modules.metrics import cosine_similarity
+from src.modules.metrics import total_variation
+
+
+def test_total_variation_numpy():
+    """
+    The numpy total variation is the sum of the absolute differences of the neighbouring pixel values, per frame.
+    """
+    frames = np.random.default_rng(0).integers(0, 256, (3, 17, 23, 3), dtype=np.uint8)
+
+    wide = frames.astype(np.int64)
+    expected = (np.abs(np.diff(wide, axis=1)).sum(axis=(1, 2, 3)) + np.abs(np.diff(wide, axis=2)).sum(axis=(1, 2, 3)))
+
+    np.testing.assert_array_equal(total_variation(frames, "numpy"), expected)
+    assert total_variation(frames[1], "numpy") == expected[1]
+
+
+def test_cosine_similarity_numpy():
+    """
+    The numpy cosine similarity is the mean of the negated cosines, a zero vector giving 0.
+    """
+    rng = np.random.default_rng(0)
+    original_mv = rng.normal(size=(2, 9, 11, 2)).astype(np.float32)
+    mv = rng.normal(size=(2, 9, 11, 2)).astype(np.float32)
+    mv[0, 0, 0] = 0
+
+    norms = np.linalg.norm(original_mv, axis=-1) * np.linalg.norm(mv, axis=-1)
+    cosines = np.sum(original_mv * mv, axis=-1) / np.where(norms == 0, 1, norms)
+
+    np.testing.assert_allclose(cosine_similarity(original_mv, mv, "numpy"), -cosines.mean(axis=(1, 2)), atol=1e-6)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("tensorflow") is None, reason="tensorflow is needed for its backend")
+def test_cosine_similarity_backends():
+    """
+    Both backends give the same cosine similarity.
+    """
+    rng = np.random.default_rng(1)
+    original_mv = rng.normal(size=(2, 9, 11, 2)).astype(np.float32)
+    mv = rng.normal(size=(2, 9, 11, 2)).astype(np.float32)
+
+    np.testing.assert_allclose(
+        cosine_similarity(original_mv, mv, "numpy"), cosine_similarity(original_mv, mv, "tensorflow"), atol=1e-6
+    )
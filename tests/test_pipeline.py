@@ -0,0 +1,163 @@
+"""
+ test_pipeline.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the scheduler and of the encoder and inspector command templates, with stub commands.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from argparse import Namespace
+
+import cv2
+import numpy as np
+import pytest
+
+from src import pipeline
+from src.pipeline import StageScheduler
+from src.pipeline import encode
+from src.pipeline import inspect
+
+
+# Prints its arguments as a json list, fails if one of them is "fail".
+STUB_INSPECTOR = """
+import json, sys
+if "fail" in sys.argv:
+    sys.exit(3)
+print(json.dumps(sys.argv[1:]))
+"""
+
+# Writes its arguments and the number of frames of the y4m stream read on stdin in output/ivf/{name}.ivf.
+STUB_ENCODER = """
+import json, sys
+frames = sys.stdin.buffer.read().count(b"FRAME")
+with open(f"output/ivf/{sys.argv[2]}.ivf", "w") as file:
+    json.dump({"args": sys.argv[1:], "frames": frames}, file)
+"""
+
+
+def write_script(directory, name: str, source: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w") as file:
+        file.write(source)
+    return path
+
+
+def test_scheduler_bounds_stages():
+    """
+    The videos inside a stage never exceed its limit, and the failures are reported with their item.
+    """
+    scheduler = StageScheduler(4, {"prepare": 4, "encode": 2, "inspect": 1, "analysis": 1})
+    inside = {"encode": 0, "inspect": 0}
+    peak = {"encode": 0, "inspect": 0}
+    lock = threading.Lock()
+
+    def work(stage):
+        with lock:
+            inside[stage] += 1
+            peak[stage] = max(peak[stage], inside[stage])
+        time.sleep(0.02)
+        with lock:
+            inside[stage] -= 1
+
+    def process(item, stage_scheduler):
+        stage_scheduler.stage("encode", work, "encode")
+        stage_scheduler.stage("inspect", work, "inspect")
+        if item == 3:
+            raise RuntimeError("video 3")
+
+    failures = scheduler.run(process, list(range(8)))
+
+    assert peak == {"encode": 2, "inspect": 1}
+    assert [item for item, _ in failures] == [3]
+    assert "video 3" in failures[0][1]
+
+
+def test_inspector_template(tmp_path, monkeypatch):
+    """
+    The inspector command is formatted with the ivf file and the name, its output is saved as the json file.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output/json")
+    script = write_script(tmp_path, "inspector.py", STUB_INSPECTOR)
+
+    inspect("video", Namespace(inspector=f"{sys.executable} {script} {{ivf}} {{name}}"))
+
+    with open("output/json/video.json") as file:
+        assert json.load(file) == ["./output/ivf/video.ivf", "video"]
+    assert os.listdir("output/json") == ["video.json"]
+
+
+def test_inspector_failure(tmp_path, monkeypatch):
+    """
+    A failing inspector raises, and leaves no json file behind.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output/json")
+    script = write_script(tmp_path, "inspector.py", STUB_INSPECTOR)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        inspect("video", Namespace(inspector=f"{sys.executable} {script} {{ivf}} fail"))
+
+    assert not os.path.exists("output/json/video.json")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is needed to decode the frames")
+def test_encoder_template(tmp_path, monkeypatch):
+    """
+    The encoder command is formatted with the parameters of the video and reads the y4m stream on stdin, while the
+    frames are written to the frame store in the same pass.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output/ivf")
+    os.makedirs("tmp_video")
+    script = write_script(tmp_path, "encoder.py", STUB_ENCODER)
+
+    height, width, frames = 16, 24, 3
+    for cursor in range(frames):
+        cv2.imwrite(f"tmp_video/frame_{str(cursor).zfill(6)}.png", np.full((height, width, 3), 40 * cursor, np.uint8))
+
+    arg_flags = Namespace(
+        encoder=f"{sys.executable} {script} {{input}} {{name}} {{width}} {{height}} {{fps}} {{gop}} {{cpu}}",
+        encoding_preset="preset",
+        fps=30,
+        gop="16",
+        cpu=2,
+    )
+    encode("tmp_video", "video", width, height, arg_flags, "./tmp_video/frames.bgr")
+
+    with open("output/ivf/video.ivf") as file:
+        encoded = json.load(file)
+    assert encoded == {"args": ["-", "video", "24", "16", "30000", "16", "2"], "frames": frames}
+    assert os.path.getsize("tmp_video/frames.bgr") == frames * height * width * 3
+
+
+def test_stage_keys_sources(tmp_path, monkeypatch):
+    """
+    A change of the sources of the project changes the keys of the container and of the analysis, not the key of the
+    inspector output.
+    """
+    frame = tmp_path / "frame.png"
+    frame.write_bytes(b"frame")
+    arg_flags = Namespace(
+        encoder="encoder {input} {name}", encoding_preset="preset", fps=30, gop="16", cpu=2,
+        inspector="inspector {ivf}", original_mv=None, iqa=[], motion_metrics=[], complexity_metrics=[],
+        forward=False, frame_step=1, block_resolution=False, skip_output=[], forward_warp="kdtree",
+        metrics_backend="tensorflow", flow_max_radius=0, start=None, end=None, shard=None, trajectory_window=0,
+    )
+
+    monkeypatch.setattr(pipeline, "hash_sources", lambda paths: "before")
+    before = pipeline.stage_keys([str(frame)], 24, 16, arg_flags)
+    monkeypatch.setattr(pipeline, "hash_sources", lambda paths: "after")
+    after = pipeline.stage_keys([str(frame)], 24, 16, arg_flags)
+
+    assert [stage for stage in before if before[stage] != after[stage]] == ["mvc", "analysis"]
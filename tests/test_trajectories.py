@@ -0,0 +1,122 @@
+"""
+ test_trajectories.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the rolling window of trajectories on constant and translational synthetic fields.
+"""
+
+import numpy as np
+import pytest
+
+from src.modules.trajectories import TrajectoryAccumulator
+
+
+def constant_field(height: int, width: int, x: float, y: float) -> np.ndarray:
+    field = np.empty((height, width, 2), dtype=np.float32)
+    field[..., 0] = x
+    field[..., 1] = y
+    return field
+
+
+def translation(height: int, width: int, x: int, y: int, distance: int) -> np.ndarray:
+    """
+    Expected field after a constant integer translation over the given number of frames, NaN where the trajectory
+    leaves the frame before its last frame. As the field of the previous frame, the last step may lead out of it.
+    """
+    expected = constant_field(height, width, distance * x, distance * y)
+    column = np.arange(width) + (distance - 1) * x
+    row = np.arange(height)[:, np.newaxis] + (distance - 1) * y
+    outside = (column < 0) | (column > width - 1) | (row < 0) | (row > height - 1)
+    expected[outside] = np.nan
+    return expected
+
+
+def test_known_shift():
+    """
+    A shift of one pixel to the right leads the pixel 8 to the last column three frames back, the region left out of
+    the frame does not grow.
+    """
+    accumulator = TrajectoryAccumulator(6, 12, window=4)
+    for _ in range(3):
+        accumulator.update(constant_field(6, 12, 1, 0))
+
+    field = accumulator.field(3)
+
+    assert (field[:, 8] == [3, 0]).all()
+    assert (field[:, 9] == [3, 0]).all()
+    assert np.isnan(field[:, 10:]).all()
+    for distance in range(1, 4):
+        np.testing.assert_array_equal(accumulator.field(distance), translation(6, 12, 1, 0, distance))
+
+
+@pytest.mark.parametrize("x, y", [(1, -2), (-3, 1), (0, 2)])
+def test_translation(x, y):
+    """
+    The two components are added separately and the fields follow the translation once the window is full.
+    """
+    accumulator = TrajectoryAccumulator(10, 16, window=3)
+    for _ in range(7):
+        accumulator.update(constant_field(10, 16, x, y))
+
+    for distance in range(1, 4):
+        np.testing.assert_array_equal(accumulator.field(distance), translation(10, 16, x, y, distance))
+
+
+def test_window_rotation():
+    """
+    Each distance gives the sum of the last fields, from the previous frame to the furthest one, as the slots are
+    reused.
+    """
+    displacements = [(0.125 * frame, -0.0625 * frame) for frame in range(1, 8)]
+    accumulator = TrajectoryAccumulator(8, 8, window=3)
+
+    for count, (x, y) in enumerate(displacements, start=1):
+        accumulator.update(constant_field(8, 8, x, y))
+        assert accumulator.depth == min(count, 3)
+
+        expected = np.cumsum(displacements[count - accumulator.depth:count][::-1], axis=0)
+        fields = accumulator.fields()
+        assert fields.shape == (accumulator.depth, 8, 8, 2)
+        for distance, (sum_x, sum_y) in enumerate(expected, start=1):
+            # The center pixels stay in the frame whatever the distance.
+            np.testing.assert_allclose(accumulator.field(distance)[3:5, 3:5], constant_field(2, 2, sum_x, sum_y))
+            np.testing.assert_array_equal(fields[distance - 1], accumulator.field(distance))
+        np.testing.assert_array_equal(accumulator.field(), accumulator.field(accumulator.depth))
+
+
+def test_reset():
+    """
+    After a reset the window is empty, and the next fields ignore the frames before.
+    """
+    accumulator = TrajectoryAccumulator(8, 8, window=4)
+    for _ in range(5):
+        accumulator.update(constant_field(8, 8, 1, 1))
+
+    accumulator.reset()
+
+    assert accumulator.depth == 0
+    with pytest.raises(ValueError):
+        accumulator.field(1)
+
+    accumulator.update(constant_field(8, 8, -1, 0))
+    accumulator.update(constant_field(8, 8, -1, 0))
+    assert accumulator.depth == 2
+    np.testing.assert_array_equal(accumulator.field(2), translation(8, 8, -1, 0, 2))
+    with pytest.raises(ValueError):
+        accumulator.field(3)
+
+
+def test_single_frame_window():
+    """
+    A window of one frame gives the field of the last frame only.
+    """
+    accumulator = TrajectoryAccumulator(4, 6, window=1)
+    accumulator.update(constant_field(4, 6, 1, 0))
+    accumulator.update(constant_field(4, 6, 0, 2))
+
+    assert accumulator.depth == 1
+    np.testing.assert_array_equal(accumulator.field(1), constant_field(4, 6, 0, 2))
@@ -0,0 +1,51 @@
+"""
+ test_utils.py
+
+  Created by Julien Zouein on 18/10/2026.
+  Copyright © 2026 Sigmedia.tv. All rights reserved.
+  Copyright © 2026 Julien Zouein (zoueinj@tcd.ie)
+----------------------------------------------------------------------------
+
+Tests of the frame ranges of a run and of the names of their outputs.
+"""
+
+import pytest
+
+from src.modules.utils import frame_range
+from src.modules.utils import range_suffix
+
+
+def frame_ids(total_frames: int, first: int, stop: int, forward: bool) -> list:
+    return sorted(total_frames - 1 - cursor if forward else cursor for cursor in range(first, stop))
+
+
+@pytest.mark.parametrize("forward", [False, True])
+def test_shards_cover_the_range(forward):
+    """
+    The shards of a range are disjoint, cover it, and select the same frame ids with and without forward.
+    """
+    total_frames = 31
+    ids = []
+    for index in range(4):
+        first, stop = frame_range(total_frames, 3, 25, f"{index}/4", forward)
+        shard_ids = frame_ids(total_frames, first, stop, forward)
+        assert shard_ids == frame_ids(total_frames, *frame_range(total_frames, 3, 25, f"{index}/4"), False)
+        ids += shard_ids
+
+    assert sorted(ids) == list(range(3, 25))
+
+
+@pytest.mark.parametrize("forward", [False, True])
+def test_range_suffix(forward):
+    """
+    The whole video has no suffix, a part is named after its first and last frame ids, whatever the direction.
+    """
+    assert range_suffix(31, *frame_range(31, forward=forward), forward) == ""
+    assert range_suffix(31, *frame_range(31, 0, 1000, None, forward), forward) == ""
+    assert range_suffix(31, *frame_range(31, 3, 25, None, forward), forward) == "_000003_000024"
+    assert range_suffix(31, *frame_range(31, 0, None, "1/2", forward), forward) == "_000015_000029"
+
+
+def test_invalid_shard():
+    with pytest.raises(ValueError):
+        frame_range(31, shard="2/2")